@@ -0,0 +1,70 @@
+"""
+Conditional GET Support (ETag / If-None-Match)
+"""
+from typing import Any, Dict, Optional, Tuple
+from fastapi import Request, Response
+from app.core.supabase import supabase_client
+import hashlib
+import json
+
+# Clients may store responses but must revalidate before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag over the parts that determine a representation"""
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def collection_version(
+    table: str, user_id: str, filters: Optional[Dict[str, Any]] = None
+) -> Tuple[int, Optional[str]]:
+    """
+    Row count and latest updated_at of a user's filtered rows
+
+    One request that returns at most one narrow row; the count comes from the
+    same query. Any insert, update or delete changes at least one of the two.
+    """
+    query = (
+        supabase_client.table(table)
+        .select("updated_at", count="exact")
+        .eq("user_id", user_id)
+    )
+    for column, value in (filters or {}).items():
+        if value is not None:
+            query = query.eq(column, value)
+    response = query.order("updated_at", desc=True).limit(1).execute()
+    latest = response.data[0]["updated_at"] if response.data else None
+    return response.count or 0, latest
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match names etag (weak comparison, per RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for value in header.split(","):
+        value = value.strip()
+        if (value[2:] if value.startswith("W/") else value) == etag:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request, response: Response, etag: str
+) -> Optional[Response]:
+    """
+    Return a 304 if the client's copy is current, else tag the response
+
+    Compute etag before reading the payload: a write landing in between then
+    yields a newer payload under an older tag, which only costs the client a
+    refetch, never a stale 304.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
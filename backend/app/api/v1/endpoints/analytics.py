@@ -0,0 +1,68 @@
+"""
+Productivity Analytics Endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List
+from app.models.analytics import AdherenceSeries, CompletionSeries, PriorityTime
+from app.api.dependencies import get_current_user
+from app.services import analytics
+from app.services.analytics import Interval
+import structlog
+from datetime import date
+
+router = APIRouter()
+logger = structlog.get_logger()
+
+
+@router.get("/completions", response_model=CompletionSeries)
+async def get_completions(
+    range_start: date = Query(..., alias="from"),
+    range_end: date = Query(..., alias="to"),
+    interval: Interval = Query(Interval.DAY),
+    current_user: dict = Depends(get_current_user),
+):
+    """Tasks completed per day, week or month"""
+    try:
+        points = analytics.completions(
+            current_user["id"], range_start, range_end, interval
+        )
+        return CompletionSeries(
+            interval=interval.value,
+            points=points,
+            total=sum(point["completed"] for point in points),
+        )
+    except Exception as e:
+        logger.error("Failed to get completions", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/time-by-priority", response_model=List[PriorityTime])
+async def get_time_by_priority(
+    range_start: date = Query(..., alias="from"),
+    range_end: date = Query(..., alias="to"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Completed tasks and time spent on them per priority"""
+    try:
+        return analytics.time_by_priority(current_user["id"], range_start, range_end)
+    except Exception as e:
+        logger.error("Failed to get time by priority", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/adherence", response_model=AdherenceSeries)
+async def get_adherence(
+    range_start: date = Query(..., alias="from"),
+    range_end: date = Query(..., alias="to"),
+    interval: Interval = Query(Interval.WEEK),
+    current_user: dict = Depends(get_current_user),
+):
+    """How closely scheduled slots were followed, per day, week or month"""
+    try:
+        points = analytics.adherence(
+            current_user["id"], range_start, range_end, interval
+        )
+        return AdherenceSeries(interval=interval.value, points=points)
+    except Exception as e:
+        logger.error("Failed to get schedule adherence", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -2,17 +2,33 @@
 Multimodal Ingestion Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from app.api.dependencies import get_current_user
+from app.services.llm_gateway import LLMGatewayError
+from app.core.config import settings
 from app.services.ingestion import IngestionService
 from app.models.note import SourceType
 import structlog
+import json
 
 router = APIRouter()
 logger = structlog.get_logger()
 ingestion_service = IngestionService()
 
 
+class BatchTextNote(BaseModel):
+    content: str = Field(..., min_length=1)
+    title: Optional[str] = Field(None, max_length=200)
+
+
+class BatchTextRequest(BaseModel):
+    notes: List[BatchTextNote] = Field(
+        ..., min_length=1, max_length=settings.INGEST_BATCH_MAX_NOTES
+    )
+
+
 @router.post("/text")
 async def ingest_text(
     content: str = Form(...),
@@ -27,11 +43,35 @@ async def ingest_text(
 
         logger.info("Text ingested", user_id=current_user["id"])
         return result
+    except LLMGatewayError:
+        raise
     except Exception as e:
         logger.error("Failed to ingest text", error=str(e))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post("/text/batch")
+async def ingest_text_batch(
+    request: BatchTextRequest, current_user: dict = Depends(get_current_user)
+):
+    """
+    Process many text notes at once
+
+    Streams one JSON line per note (with its index in the request) as each
+    extraction completes.
+    """
+    notes = [note.model_dump() for note in request.notes]
+
+    async def stream_results():
+        async for result in ingestion_service.process_text_batch(
+            user_id=current_user["id"], notes=notes
+        ):
+            yield json.dumps(result, default=str) + "\n"
+
+    logger.info("Text batch ingestion started", user_id=current_user["id"], note_count=len(notes))
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @router.post("/voice")
 async def ingest_voice(
     file: UploadFile = File(...), current_user: dict = Depends(get_current_user)
@@ -44,6 +84,8 @@ async def ingest_voice(
 
         logger.info("Voice ingested", user_id=current_user["id"])
         return result
+    except LLMGatewayError:
+        raise
     except Exception as e:
         logger.error("Failed to ingest voice", error=str(e))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -61,6 +103,8 @@ async def ingest_image(
 
         logger.info("Image ingested", user_id=current_user["id"])
         return result
+    except LLMGatewayError:
+        raise
     except Exception as e:
         logger.error("Failed to ingest image", error=str(e))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -1,11 +1,15 @@
 """
 Note Management Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from typing import List, Optional
 from app.models.note import Note, NoteCreate, NoteUpdate
+from app.models.search import NoteSearchResults
 from app.api.dependencies import get_current_user
+from app.api.etag import collection_version, conditional_response, make_etag
 from app.core.supabase import supabase_client
+from app.services.audit import audit_log
+from app.services.search import search
 import structlog
 from datetime import datetime
 
@@ -14,7 +18,9 @@ logger = structlog.get_logger()
 
 
 @router.post("", response_model=Note, status_code=status.HTTP_201_CREATED)
-async def create_note(note: NoteCreate, current_user: dict = Depends(get_current_user)):
+async def create_note(
+    note: NoteCreate, request: Request, current_user: dict = Depends(get_current_user)
+):
     """Create a new note"""
     try:
         note_data = note.model_dump()
@@ -23,6 +29,14 @@ async def create_note(note: NoteCreate, current_user: dict = Depends(get_current
         note_data["updated_at"] = datetime.utcnow().isoformat()
 
         response = supabase_client.table("notes").insert(note_data).execute()
+        await audit_log.record(
+            "create",
+            "note",
+            current_user["id"],
+            response.data[0]["id"],
+            note.model_dump(mode="json"),
+            request,
+        )
 
         logger.info("Note created", note_id=response.data[0]["id"], user_id=current_user["id"])
         return Note(**response.data[0])
@@ -33,6 +47,8 @@ async def create_note(note: NoteCreate, current_user: dict = Depends(get_current
 
 @router.get("", response_model=List[Note])
 async def list_notes(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     source_type: Optional[str] = Query(None),
     limit: int = Query(100, le=500),
@@ -40,6 +56,14 @@ async def list_notes(
 ):
     """List user's notes with optional filters"""
     try:
+        version = collection_version(
+            "notes", current_user["id"], {"source_type": source_type}
+        )
+        etag = make_etag("notes", *version, source_type, limit, offset)
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+
         query = supabase_client.table("notes").select("*").eq("user_id", current_user["id"])
 
         if source_type:
@@ -53,6 +77,22 @@ async def list_notes(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.get("/search", response_model=NoteSearchResults)
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """Search notes by title, content and transcription, best matches first"""
+    try:
+        results, next_cursor = search("search_notes", current_user["id"], q, limit, cursor)
+        return NoteSearchResults(results=results, next_cursor=next_cursor)
+    except Exception as e:
+        logger.error("Failed to search notes", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/{note_id}", response_model=Note)
 async def get_note(note_id: str, current_user: dict = Depends(get_current_user)):
     """Get a specific note"""
@@ -80,12 +120,15 @@ async def get_note(note_id: str, current_user: dict = Depends(get_current_user))
 
 @router.patch("/{note_id}", response_model=Note)
 async def update_note(
-    note_id: str, note_update: NoteUpdate, current_user: dict = Depends(get_current_user)
+    note_id: str,
+    note_update: NoteUpdate,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
 ):
     """Update a note"""
     try:
-        update_data = note_update.model_dump(exclude_unset=True)
-        update_data["updated_at"] = datetime.utcnow().isoformat()
+        changes = note_update.model_dump(mode="json", exclude_unset=True)
+        update_data = {**changes, "updated_at": datetime.utcnow().isoformat()}
 
         response = (
             supabase_client.table("notes")
@@ -99,6 +142,9 @@ async def update_note(
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
             )
+        await audit_log.record(
+            "update", "note", current_user["id"], note_id, changes, request
+        )
 
         logger.info("Note updated", note_id=note_id, user_id=current_user["id"])
         return Note(**response.data[0])
@@ -110,7 +156,9 @@ async def update_note(
 
 
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_note(note_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_note(
+    note_id: str, request: Request, current_user: dict = Depends(get_current_user)
+):
     """Delete a note"""
     try:
         response = (
@@ -125,6 +173,9 @@ async def delete_note(note_id: str, current_user: dict = Depends(get_current_use
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
             )
+        await audit_log.record(
+            "delete", "note", current_user["id"], note_id, request=request
+        )
 
         logger.info("Note deleted", note_id=note_id, user_id=current_user["id"])
     except HTTPException:
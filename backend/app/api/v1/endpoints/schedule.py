@@ -1,10 +1,12 @@
 """
 Schedule Management Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from typing import List
 from pydantic import BaseModel
 from app.api.dependencies import get_current_user
+from app.api.etag import conditional_response, make_etag
+from app.services.llm_gateway import LLMGatewayError
 from app.services.ai_scheduler import AIScheduler
 import structlog
 from datetime import date, datetime
@@ -44,16 +46,30 @@ async def generate_schedule(
             date=str(request.date),
         )
         return schedule
+    except LLMGatewayError:
+        raise
     except Exception as e:
         logger.error("Failed to generate schedule", error=str(e))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/{date}", response_model=ScheduleResponse)
-async def get_schedule(date: str, current_user: dict = Depends(get_current_user)):
+async def get_schedule(
+    date: str,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+):
     """Get schedule for a specific date"""
     try:
         scheduler = AIScheduler(current_user["id"])
+        version = await scheduler.get_schedule_version(date)
+        if version:
+            etag = make_etag("schedule", version["id"], version["updated_at"])
+            not_modified = conditional_response(request, response, etag)
+            if not_modified:
+                return not_modified
+
         schedule = await scheduler.get_schedule(date)
 
         if not schedule:
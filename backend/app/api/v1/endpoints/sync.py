@@ -0,0 +1,27 @@
+"""
+Delta Sync Endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from app.models.sync import SyncChanges
+from app.api.dependencies import get_current_user
+from app.services.sync import CursorExpiredError, changes_since
+import structlog
+
+router = APIRouter()
+logger = structlog.get_logger()
+
+
+@router.get("/changes", response_model=SyncChanges)
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user),
+):
+    """Tasks, notes, schedules and notifications changed or deleted since a cursor"""
+    try:
+        return SyncChanges(**changes_since(current_user["id"], since, limit))
+    except CursorExpiredError as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to list changes", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
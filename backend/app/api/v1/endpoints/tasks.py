@@ -1,38 +1,146 @@
 """
 Task Management Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from typing import List, Optional
-from app.models.task import Task, TaskCreate, TaskUpdate
+from app.models.search import TaskSearchResults
+from app.models.task import (
+    CriticalPath,
+    Task,
+    TaskBulkItemResult,
+    TaskBulkOperation,
+    TaskBulkRequest,
+    TaskBulkResult,
+    TaskConflict,
+    TaskCreate,
+    TaskDependency,
+    TaskDependencyCreate,
+    TaskOccurrence,
+    TaskOccurrenceUpdate,
+    TaskUpdate,
+    TaskWriteResult,
+)
 from app.api.dependencies import get_current_user
-from app.core.supabase import supabase_client
+from app.api.etag import collection_version, conditional_response, make_etag
+from app.core.supabase import fetch_all, supabase_client
+from app.services.interval_index import load_user_zone, schedule_conflict_index
+from app.services import recurrence
+from app.services.audit import audit_log
+from app.services.schedule_cache import schedule_cache, scheduled_days
+from app.services.search import search
+from app.services.task_graph import DependencyCycleError, task_dependency_index
+from app.services.task_similarity import task_similarity_index
 import structlog
-from datetime import datetime
+from datetime import date, datetime
 
 router = APIRouter()
 logger = structlog.get_logger()
 
 
-@router.post("", response_model=Task, status_code=status.HTTP_201_CREATED)
-async def create_task(task: TaskCreate, current_user: dict = Depends(get_current_user)):
+@router.post("", response_model=TaskWriteResult, status_code=status.HTTP_201_CREATED)
+async def create_task(
+    task: TaskCreate, request: Request, current_user: dict = Depends(get_current_user)
+):
     """Create a new task"""
     try:
-        task_data = task.model_dump()
+        task_data = task.model_dump(mode="json")
         task_data["user_id"] = current_user["id"]
         task_data["created_at"] = datetime.utcnow().isoformat()
         task_data["updated_at"] = datetime.utcnow().isoformat()
 
         response = supabase_client.table("tasks").insert(task_data).execute()
+        conflicts = schedule_conflict_index.record(current_user["id"], response.data[0])
+        task_similarity_index.record(current_user["id"], response.data[0])
+        await audit_log.record(
+            "create",
+            "task",
+            current_user["id"],
+            response.data[0]["id"],
+            task.model_dump(mode="json"),
+            request,
+        )
 
-        logger.info("Task created", task_id=response.data[0]["id"], user_id=current_user["id"])
-        return Task(**response.data[0])
+        logger.info(
+            "Task created",
+            task_id=response.data[0]["id"],
+            user_id=current_user["id"],
+            conflict_count=len(conflicts),
+        )
+        return TaskWriteResult(**response.data[0], conflicts=conflicts)
     except Exception as e:
         logger.error("Failed to create task", error=str(e))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post("/bulk", response_model=TaskBulkResult)
+async def bulk_task_operations(
+    bulk: TaskBulkRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Create, update and delete many tasks in one round trip and one transaction"""
+    try:
+        user_id = current_user["id"]
+        rows = (
+            supabase_client.rpc(
+                "bulk_task_operations",
+                {
+                    "p_user_id": user_id,
+                    "p_operations": [_bulk_payload(op) for op in bulk.operations],
+                },
+            )
+            .execute()
+            .data
+        )
+
+        results, changed_ids, changed_days = [], [], []
+        for row in rows:
+            result = TaskBulkItemResult(
+                index=row["item"], op=row["op"], status=row["outcome"]
+            )
+            task = row.get("task")
+            if task is not None:
+                conflicts = []
+                if row["op"] == "delete":
+                    schedule_conflict_index.remove(user_id, task["id"])
+                    task_dependency_index.remove_task(user_id, task["id"])
+                    task_similarity_index.remove(user_id, task["id"])
+                else:
+                    conflicts = schedule_conflict_index.record(user_id, task)
+                    task_similarity_index.record(user_id, task)
+                if row["op"] != "create":
+                    changed_ids.append(task["id"])
+                    changed_days.extend(scheduled_days(task))
+                result.task = TaskWriteResult(**task, conflicts=conflicts)
+                await audit_log.record(
+                    row["op"],
+                    "task",
+                    user_id,
+                    task["id"],
+                    _bulk_payload(bulk.operations[row["item"]]).get("data"),
+                    request,
+                )
+            results.append(result)
+
+        if changed_ids:
+            await schedule_cache.invalidate_tasks(user_id, changed_ids, changed_days)
+
+        logger.info(
+            "Tasks written in bulk",
+            user_id=user_id,
+            operation_count=len(results),
+            not_found_count=sum(r.status == "not_found" for r in results),
+        )
+        return TaskBulkResult(results=results)
+    except Exception as e:
+        logger.error("Failed to apply bulk task operations", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("", response_model=List[Task])
 async def list_tasks(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
     status: Optional[str] = Query(None),
     priority: Optional[str] = Query(None),
@@ -41,6 +149,14 @@ async def list_tasks(
 ):
     """List user's tasks with optional filters"""
     try:
+        version = collection_version(
+            "tasks", current_user["id"], {"status": status, "priority": priority}
+        )
+        etag = make_etag("tasks", *version, status, priority, limit, offset)
+        not_modified = conditional_response(request, response, etag)
+        if not_modified:
+            return not_modified
+
         query = supabase_client.table("tasks").select("*").eq("user_id", current_user["id"])
 
         if status:
@@ -56,6 +172,97 @@ async def list_tasks(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.get("/conflicts", response_model=List[TaskConflict])
+async def list_task_conflicts(
+    current_user: dict = Depends(get_current_user),
+    range_start: datetime = Query(..., alias="from"),
+    range_end: datetime = Query(..., alias="to"),
+):
+    """List all pairs of scheduled tasks that overlap within a time range"""
+    try:
+        conflicts = schedule_conflict_index.conflicts_in_range(
+            current_user["id"], range_start, range_end
+        )
+        return [TaskConflict(**conflict) for conflict in conflicts]
+    except Exception as e:
+        logger.error("Failed to list task conflicts", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/search", response_model=TaskSearchResults)
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """Search tasks by title and description, best matches first"""
+    try:
+        results, next_cursor = search("search_tasks", current_user["id"], q, limit, cursor)
+        return TaskSearchResults(results=results, next_cursor=next_cursor)
+    except Exception as e:
+        logger.error("Failed to search tasks", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/occurrences", response_model=List[TaskOccurrence])
+async def list_task_occurrences(
+    current_user: dict = Depends(get_current_user),
+    range_start: date = Query(..., alias="from"),
+    range_end: date = Query(..., alias="to"),
+    occurrence_status: Optional[str] = Query(None, alias="status"),
+):
+    """Expand recurring tasks into their occurrences within a date range"""
+    try:
+        if range_end < range_start:
+            raise ValueError("'to' must not be before 'from'")
+        occurrences = recurrence.occurrences(
+            current_user["id"],
+            range_start,
+            range_end,
+            [occurrence_status] if occurrence_status else None,
+        )
+        return [TaskOccurrence(**occurrence) for occurrence in occurrences]
+    except Exception as e:
+        logger.error("Failed to list task occurrences", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/critical-path", response_model=CriticalPath)
+async def get_critical_path(
+    task_ids: Optional[List[str]] = Query(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """Longest chain of dependent tasks by estimated duration (default: open tasks)"""
+    try:
+        def query():
+            query = (
+                supabase_client.table("tasks")
+                .select("*")
+                .eq("user_id", current_user["id"])
+            )
+            if task_ids:
+                query = query.in_("id", task_ids)
+            else:
+                query = query.in_("status", ["pending", "in_progress"])
+            return query.order("id")
+
+        tasks = fetch_all(query)
+
+        path, total_duration = task_dependency_index.critical_path(
+            current_user["id"], tasks
+        )
+        by_id = {task["id"]: task for task in tasks}
+        return CriticalPath(
+            task_ids=path,
+            total_duration=total_duration,
+            tasks=[Task(**by_id[task_id]) for task_id in path],
+        )
+    except Exception as e:
+        logger.error("Failed to compute critical path", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/{task_id}", response_model=Task)
 async def get_task(task_id: str, current_user: dict = Depends(get_current_user)):
     """Get a specific task"""
@@ -81,14 +288,17 @@ async def get_task(task_id: str, current_user: dict = Depends(get_current_user))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.patch("/{task_id}", response_model=Task)
+@router.patch("/{task_id}", response_model=TaskWriteResult)
 async def update_task(
-    task_id: str, task_update: TaskUpdate, current_user: dict = Depends(get_current_user)
+    task_id: str,
+    task_update: TaskUpdate,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
 ):
     """Update a task"""
     try:
-        update_data = task_update.model_dump(exclude_unset=True)
-        update_data["updated_at"] = datetime.utcnow().isoformat()
+        changes = task_update.model_dump(mode="json", exclude_unset=True)
+        update_data = {**changes, "updated_at": datetime.utcnow().isoformat()}
 
         response = (
             supabase_client.table("tasks")
@@ -103,8 +313,22 @@ async def update_task(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
             )
 
-        logger.info("Task updated", task_id=task_id, user_id=current_user["id"])
-        return Task(**response.data[0])
+        conflicts = schedule_conflict_index.record(current_user["id"], response.data[0])
+        task_similarity_index.record(current_user["id"], response.data[0])
+        await schedule_cache.invalidate_task(
+            current_user["id"], task_id, scheduled_days(response.data[0])
+        )
+        await audit_log.record(
+            "update", "task", current_user["id"], task_id, changes, request
+        )
+
+        logger.info(
+            "Task updated",
+            task_id=task_id,
+            user_id=current_user["id"],
+            conflict_count=len(conflicts),
+        )
+        return TaskWriteResult(**response.data[0], conflicts=conflicts)
     except HTTPException:
         raise
     except Exception as e:
@@ -113,7 +337,9 @@ async def update_task(
 
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_task(task_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_task(
+    task_id: str, request: Request, current_user: dict = Depends(get_current_user)
+):
     """Delete a task"""
     try:
         response = (
@@ -129,9 +355,247 @@ async def delete_task(task_id: str, current_user: dict = Depends(get_current_use
                 status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
             )
 
+        schedule_conflict_index.remove(current_user["id"], task_id)
+        task_dependency_index.remove_task(current_user["id"], task_id)
+        await schedule_cache.invalidate_task(
+            current_user["id"], task_id, scheduled_days(response.data[0])
+        )
+        task_similarity_index.remove(current_user["id"], task_id)
+        await audit_log.record(
+            "delete", "task", current_user["id"], task_id, request=request
+        )
+
         logger.info("Task deleted", task_id=task_id, user_id=current_user["id"])
     except HTTPException:
         raise
     except Exception as e:
         logger.error("Failed to delete task", error=str(e))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/{task_id}/dependencies", response_model=List[TaskDependency])
+async def list_task_dependencies(
+    task_id: str, current_user: dict = Depends(get_current_user)
+):
+    """List the tasks a task depends on"""
+    try:
+        response = (
+            supabase_client.table("task_dependencies")
+            .select("task_id, depends_on_id, created_at")
+            .eq("task_id", task_id)
+            .eq("user_id", current_user["id"])
+            .execute()
+        )
+        return [TaskDependency(**dependency) for dependency in response.data]
+    except Exception as e:
+        logger.error("Failed to list task dependencies", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post(
+    "/{task_id}/dependencies",
+    response_model=TaskDependency,
+    status_code=status.HTTP_201_CREATED,
+)
+async def add_task_dependency(
+    task_id: str,
+    dependency: TaskDependencyCreate,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Make a task wait for another task"""
+    try:
+        user_id = current_user["id"]
+        found = (
+            supabase_client.table("tasks")
+            .select("id")
+            .eq("user_id", user_id)
+            .in_("id", list({task_id, dependency.depends_on_id}))
+            .execute()
+        )
+        requested = {task_id, dependency.depends_on_id}
+        if len({task["id"] for task in found.data}) < len(requested):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
+            )
+
+        try:
+            task_dependency_index.add(user_id, task_id, dependency.depends_on_id)
+        except DependencyCycleError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+        try:
+            response = (
+                supabase_client.table("task_dependencies")
+                .upsert(
+                    {
+                        "task_id": task_id,
+                        "depends_on_id": dependency.depends_on_id,
+                        "user_id": user_id,
+                    },
+                    on_conflict="task_id,depends_on_id",
+                )
+                .execute()
+            )
+        except Exception:
+            # Another worker may have added the other half of a cycle
+            task_dependency_index.evict(user_id)
+            raise
+        await audit_log.record(
+            "create",
+            "task_dependency",
+            user_id,
+            task_id,
+            {"depends_on_id": dependency.depends_on_id},
+            request,
+        )
+
+        logger.info(
+            "Task dependency added",
+            task_id=task_id,
+            depends_on_id=dependency.depends_on_id,
+            user_id=user_id,
+        )
+        return TaskDependency(**response.data[0])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to add task dependency", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.delete(
+    "/{task_id}/dependencies/{depends_on_id}", status_code=status.HTTP_204_NO_CONTENT
+)
+async def remove_task_dependency(
+    task_id: str,
+    depends_on_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Stop a task waiting for another task"""
+    try:
+        response = (
+            supabase_client.table("task_dependencies")
+            .delete()
+            .eq("task_id", task_id)
+            .eq("depends_on_id", depends_on_id)
+            .eq("user_id", current_user["id"])
+            .execute()
+        )
+
+        if not response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Dependency not found"
+            )
+
+        task_dependency_index.discard(current_user["id"], task_id, depends_on_id)
+        await audit_log.record(
+            "delete",
+            "task_dependency",
+            current_user["id"],
+            task_id,
+            {"depends_on_id": depends_on_id},
+            request,
+        )
+
+        logger.info(
+            "Task dependency removed",
+            task_id=task_id,
+            depends_on_id=depends_on_id,
+            user_id=current_user["id"],
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to remove task dependency", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.patch(
+    "/{task_id}/occurrences/{occurrence_date}", response_model=TaskOccurrence
+)
+async def update_task_occurrence(
+    task_id: str,
+    occurrence_date: date,
+    occurrence_update: TaskOccurrenceUpdate,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Override or complete one occurrence of a recurring task"""
+    try:
+        response = (
+            supabase_client.table("tasks")
+            .select("*")
+            .eq("id", task_id)
+            .eq("user_id", current_user["id"])
+            .not_.is_("recurrence_rule", "null")
+            .execute()
+        )
+        zone = load_user_zone(current_user["id"])
+        if not response.data or not recurrence.occurrence_dates(
+            response.data[0], occurrence_date, occurrence_date, zone
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Occurrence not found"
+            )
+
+        override = occurrence_update.model_dump(mode="json", exclude_unset=True)
+        override.update(
+            {
+                "task_id": task_id,
+                "occurrence_date": occurrence_date.isoformat(),
+                "user_id": current_user["id"],
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+        )
+        stored = (
+            supabase_client.table("task_occurrences")
+            .upsert(override, on_conflict="task_id,occurrence_date")
+            .execute()
+        )
+        await schedule_cache.invalidate_task(
+            current_user["id"],
+            recurrence.occurrence_id(task_id, occurrence_date),
+            [occurrence_date.isoformat()],
+        )
+        await audit_log.record(
+            "update",
+            "task_occurrence",
+            current_user["id"],
+            task_id,
+            {
+                **occurrence_update.model_dump(mode="json", exclude_unset=True),
+                "occurrence_date": occurrence_date.isoformat(),
+            },
+            request,
+        )
+
+        logger.info(
+            "Task occurrence updated",
+            task_id=task_id,
+            occurrence_date=str(occurrence_date),
+            user_id=current_user["id"],
+        )
+        return TaskOccurrence(
+            **recurrence.build_occurrence(
+                response.data[0], occurrence_date, stored.data[0], zone
+            )
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to update task occurrence", error=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _bulk_payload(operation: TaskBulkOperation) -> dict:
+    """One element of bulk_task_operations' p_operations"""
+    payload = {"op": operation.op.value}
+    if operation.id is not None:
+        payload["id"] = operation.id
+    if operation.task is not None:
+        payload["data"] = operation.task.model_dump(mode="json")
+    elif operation.changes is not None:
+        payload["data"] = operation.changes.model_dump(mode="json", exclude_unset=True)
+    return payload
@@ -1,10 +1,11 @@
 """
 User and Preferences Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from app.models.user import UserPreferences, UserPreferencesUpdate
 from app.api.dependencies import get_current_user
 from app.core.supabase import supabase_client
+from app.services.audit import audit_log
 import structlog
 from datetime import datetime
 
@@ -48,7 +49,9 @@ async def get_user_preferences(current_user: dict = Depends(get_current_user)):
 
 @router.patch("/preferences", response_model=UserPreferences)
 async def update_user_preferences(
-    preferences: UserPreferencesUpdate, current_user: dict = Depends(get_current_user)
+    preferences: UserPreferencesUpdate,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
 ):
     """Update user preferences"""
     try:
@@ -67,6 +70,14 @@ async def update_user_preferences(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User preferences not found",
             )
+        await audit_log.record(
+            "update",
+            "user_preferences",
+            current_user["id"],
+            response.data[0].get("id"),
+            preferences.model_dump(mode="json", exclude_unset=True),
+            request,
+        )
 
         logger.info("User preferences updated", user_id=current_user["id"])
         return UserPreferences(**response.data[0])
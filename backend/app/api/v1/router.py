@@ -2,7 +2,16 @@
 API v1 Router
 """
 from fastapi import APIRouter
-from app.api.v1.endpoints import tasks, notes, schedule, auth, users, ingestion
+from app.api.v1.endpoints import (
+    tasks,
+    notes,
+    schedule,
+    auth,
+    users,
+    ingestion,
+    sync,
+    analytics,
+)
 
 api_router = APIRouter()
 
@@ -12,3 +21,5 @@ api_router.include_router(tasks.router, prefix="/tasks", tags=["Tasks"])
 api_router.include_router(notes.router, prefix="/notes", tags=["Notes"])
 api_router.include_router(schedule.router, prefix="/schedule", tags=["Schedule"])
 api_router.include_router(ingestion.router, prefix="/ingestion", tags=["Ingestion"])
+api_router.include_router(sync.router, prefix="/sync", tags=["Sync"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
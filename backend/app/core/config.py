@@ -4,7 +4,6 @@ Application Configuration
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 from typing import List, Union
-import os
 
 
 class Settings(BaseSettings):
@@ -28,6 +27,7 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
     SUPABASE_ANON_KEY: str
+    DATABASE_URL: str = ""  # direct (session) connection for LISTEN; unset disables it
 
     # AI/LLM
     ANTHROPIC_API_KEY: str = ""
@@ -35,6 +35,30 @@ class Settings(BaseSettings):
     DEFAULT_LLM_PROVIDER: str = "anthropic"
     DEFAULT_MODEL: str = "claude-3-5-sonnet-20241022"
 
+    # LLM Gateway
+    LLM_MAX_CONCURRENCY: int = 16
+    ANTHROPIC_MAX_CONCURRENCY: int = 8
+    OPENAI_MAX_CONCURRENCY: int = 8
+    LLM_USER_RATE_PER_MINUTE: float = 20
+    LLM_USER_BURST: int = 5
+    LLM_MAX_QUEUE: int = 100
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 30
+    LLM_INTERACTIVE_WEIGHT: float = 4
+    LLM_BACKGROUND_WEIGHT: float = 1
+
+    # LLM HTTP Clients
+    LLM_HTTP2: bool = True
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60
+    LLM_TIMEOUT_SECONDS: float = 120
+    LLM_PROMPT_CACHING: bool = True
+    LLM_STRUCTURED_REPAIR_ATTEMPTS: int = 1
+
+    # Batch LLM Jobs
+    LLM_BATCH_BACKEND: str = "provider"  # provider | local
+    LLM_BATCH_POLL_SECONDS: float = 60
+    LLM_BATCH_TIMEOUT_SECONDS: float = 21600
+    LLM_BATCH_MAX_REQUESTS: int = 10000
+
     # Google Calendar
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
@@ -49,11 +73,56 @@ class Settings(BaseSettings):
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
+    SCHEDULE_LOCK_TTL_SECONDS: int = 120
+    SCHEDULE_LOCK_WAIT_SECONDS: int = 90  # shorter than the lock TTL
+
+    # Schedule Cache
+    SCHEDULE_CACHE_TTL_SECONDS: int = 3600  # Redis tier
+    SCHEDULE_CACHE_LOCAL_TTL_SECONDS: float = 60  # bounds staleness without Redis
+    SCHEDULE_CACHE_MAX_ENTRIES: int = 10000
+
+    # Per-User Indexes
+    USER_INDEX_MAX_USERS: int = 1000  # users whose in-process indexes a worker keeps
 
     # File Storage
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
 
+    # Media Processing
+    MEDIA_WORKERS: int = 2
+    SPEECH_ENGINE: str = "sphinx"
+    SPEECH_LANGUAGE: str = "en-US"
+    SPEECH_CHUNK_SECONDS: int = 30
+    IMAGE_TEXT_ENGINE: str = "vision"  # vision | tesseract
+    IMAGE_MAX_DIMENSION: int = 1600
+    THUMBNAIL_SIZE: int = 256
+    IMAGE_SIMILARITY_MAX_DISTANCE: int = 6  # bits of 64-bit perceptual hash
+
+    # Batch Ingestion
+    INGEST_BATCH_MAX_NOTES: int = 200
+    INGEST_BATCH_CONCURRENCY: int = 4
+    INGEST_MICROBATCH_SIZE: int = 5
+    INGEST_MICROBATCH_MAX_CHARS: int = 2000
+
+    # Task Deduplication
+    TASK_DEDUP_MODE: str = "merge"  # merge | flag | off
+    TASK_DEDUP_THRESHOLD: float = 0.6  # similarity of title trigrams and description words
+
+    # Bulk Task Operations
+    TASK_BULK_MAX_OPERATIONS: int = 200  # per request, all in one transaction
+
+    # Audit Log
+    AUDIT_BUFFER_SIZE: int = 10000  # events held in memory before record() pushes back
+    AUDIT_BATCH_SIZE: int = 500  # rows per insert
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1
+    AUDIT_ENQUEUE_TIMEOUT_SECONDS: float = 0.05  # then the event is dropped
+
+    # Learned Durations
+    DURATION_MIN_SAMPLES: int = 5  # completed tasks before a bucket corrects estimates
+
+    # Startup
+    WARMUP_ON_STARTUP: bool = False  # build SDK clients in lifespan, not on first request
+
     # Logging
     LOG_LEVEL: str = "INFO"
     SENTRY_DSN: str = ""
@@ -64,6 +133,3 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
-
-# Create upload directory if it doesn't exist
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
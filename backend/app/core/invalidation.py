@@ -0,0 +1,134 @@
+"""
+Cross-Worker Cache Invalidation over Postgres LISTEN/NOTIFY
+"""
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+import asyncio
+import json
+import structlog
+
+logger = structlog.get_logger()
+
+# Must match the channel the invalidation triggers notify on
+CHANNEL = "cache_invalidation"
+
+# Wait between connection attempts
+RETRY_INTERVAL_SECONDS = 5
+
+# An idle LISTEN connection can die silently; probe it this often
+KEEPALIVE_SECONDS = 30
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+class InvalidationBus:
+    """
+    Routes row-change notifications from Postgres to in-process caches
+
+    Triggers send one compact JSON payload per changed row (see the
+    invalidation bus migration); every worker listens on its own connection
+    and evicts what the change affects. Notifications sent while a worker is
+    disconnected are lost, so connect handlers run every time the listener
+    (re)connects and should drop everything they cache.
+
+    Handlers run on the event loop and must be quick and non-blocking.
+    """
+
+    def __init__(self, dsn: str, channel: str = CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._connect_handlers: List[Callable[[], None]] = []
+        self._listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, table: str, handler: Handler):
+        """Call handler with the payload of every change to table"""
+        handlers = self._handlers.setdefault(table, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def on_connect(self, handler: Callable[[], None]):
+        """Call handler whenever listening (re)starts"""
+        if handler not in self._connect_handlers:
+            self._connect_handlers.append(handler)
+
+    def dispatch(self, payload: str):
+        """Hand one notification payload to the table's handlers"""
+        try:
+            event = json.loads(payload)
+            handlers = self._handlers.get(event["table"], [])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Malformed invalidation payload", error=str(e))
+            return
+        metrics.increment(f"invalidation.{event['table']}")
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(
+                    "Invalidation handler failed", table=event["table"], error=str(e)
+                )
+
+    def _connected(self):
+        metrics.increment("invalidation.connect")
+        for handler in self._connect_handlers:
+            try:
+                handler()
+            except Exception as e:
+                logger.error("Invalidation connect handler failed", error=str(e))
+
+    def start(self):
+        """Start listening, unless no database URL is configured"""
+        if not self.dsn:
+            logger.info("Invalidation bus disabled: DATABASE_URL is not set")
+            return
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        import asyncpg
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                # None marks a lost connection
+                queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+                await connection.add_listener(
+                    self.channel, lambda *args: queue.put_nowait(args[-1])
+                )
+                connection.add_termination_listener(lambda _: queue.put_nowait(None))
+                logger.info("Invalidation bus listening", channel=self.channel)
+                self._connected()
+
+                while True:
+                    try:
+                        payload = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        await connection.execute("SELECT 1")
+                        continue
+                    if payload is None:
+                        break
+                    self.dispatch(payload)
+                logger.warning("Invalidation bus connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Invalidation bus listener failed", error=str(e))
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RETRY_INTERVAL_SECONDS)
+
+
+invalidation_bus = InvalidationBus(settings.DATABASE_URL)
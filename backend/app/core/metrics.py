@@ -0,0 +1,28 @@
+"""
+In-Process Metrics Registry
+"""
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Process-local counters, exposed as a JSON snapshot on /metrics"""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+
+    def increment(self, name: str, value: float = 1):
+        """Add to a counter"""
+        self._counters[name] += value
+
+    def get(self, name: str) -> float:
+        """Read a counter"""
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return all counters"""
+        return dict(sorted(self._counters.items()))
+
+
+# Global metrics instance
+metrics = Metrics()
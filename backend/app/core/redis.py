@@ -0,0 +1,65 @@
+"""
+Shared Redis Client
+"""
+from typing import TYPE_CHECKING, Optional
+from app.core.config import settings
+import time
+import structlog
+
+if TYPE_CHECKING:
+    import redis.asyncio as redis
+
+logger = structlog.get_logger()
+
+# After a failed connection, Redis is not retried for this many seconds
+RETRY_INTERVAL_SECONDS = 30
+
+_redis_client: Optional["redis.Redis"] = None
+_unavailable_until = 0.0
+
+
+async def get_redis() -> Optional["redis.Redis"]:
+    """
+    Return the shared Redis client, or None while Redis is unreachable
+
+    Callers treat None as "no shared state" and fall back to local behavior.
+    """
+    global _redis_client, _unavailable_until
+    if _redis_client is not None:
+        return _redis_client
+    if time.monotonic() < _unavailable_until:
+        return None
+
+    import redis.asyncio as redis
+
+    client = redis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        socket_connect_timeout=1,
+        socket_timeout=2,
+    )
+    try:
+        await client.ping()
+    except Exception as e:
+        logger.warning("Redis unavailable, using local fallback", error=str(e))
+        _unavailable_until = time.monotonic() + RETRY_INTERVAL_SECONDS
+        await client.aclose()
+        return None
+
+    _redis_client = client
+    return _redis_client
+
+
+def mark_redis_unavailable():
+    """Drop the shared client after a failed command so callers fall back"""
+    global _redis_client, _unavailable_until
+    _redis_client = None
+    _unavailable_until = time.monotonic() + RETRY_INTERVAL_SECONDS
+
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
@@ -0,0 +1,135 @@
+"""
+Single-Flight Coalescing of Duplicate Work
+"""
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from app.core.metrics import metrics
+from app.core.redis import get_redis, mark_redis_unavailable
+import asyncio
+import time
+import uuid
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Delete the lock only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time
+
+    Callers in the same process await the in-flight future. Across workers
+    and nodes, a Redis lock elects one leader; the others poll until the
+    lock is released and then read the leader's persisted result. Without
+    Redis, coalescing is per process only.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        lock_ttl: float,
+        wait_timeout: float,
+        poll_interval: float = 0.25,
+    ):
+        # Followers give up before a stuck leader's lock would expire,
+        # instead of holding their requests for the whole TTL
+        if wait_timeout >= lock_ttl:
+            raise ValueError("wait_timeout must be shorter than lock_ttl")
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[T]],
+        fetch_result: Callable[[], Awaitable[Optional[T]]],
+    ) -> T:
+        """
+        Run compute once for key and share its result
+
+        fetch_result reads what a leader elsewhere persisted; it is used by
+        callers that lose the distributed election.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.increment(f"singleflight.{self.namespace}.coalesced")
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        # Avoid "exception was never retrieved" when nobody else is waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            result = await self._run(key, compute, fetch_result)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def _run(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[T]],
+        fetch_result: Callable[[], Awaitable[Optional[T]]],
+    ) -> T:
+        client = await get_redis()
+        if client is None:
+            return await compute()
+
+        lock_key = f"singleflight:{self.namespace}:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            try:
+                acquired = await client.set(
+                    lock_key, token, nx=True, px=int(self.lock_ttl * 1000)
+                )
+                if not acquired:
+                    # Another node is computing: wait for it to finish
+                    metrics.increment(f"singleflight.{self.namespace}.remote_wait")
+                    while await client.exists(lock_key):
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(
+                                f"Timed out waiting for {self.namespace} {key}"
+                            )
+                        await asyncio.sleep(self.poll_interval)
+            except TimeoutError:
+                raise
+            except Exception as e:
+                logger.warning("Single-flight lock unavailable", key=lock_key, error=str(e))
+                mark_redis_unavailable()
+                return await compute()
+
+            if acquired:
+                break
+            result = await fetch_result()
+            if result is not None:
+                return result
+            # The leader produced nothing persistent; try to lead
+
+        try:
+            return await compute()
+        finally:
+            try:
+                await client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning("Failed to release single-flight lock", key=lock_key, error=str(e))
@@ -1,17 +1,24 @@
 """
 Supabase Client Configuration
 """
-from supabase import create_client, Client
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 from app.core.config import settings
+import threading
 import structlog
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 logger = structlog.get_logger()
 
 
-def get_supabase_client() -> Client:
+def get_supabase_client() -> "Client":
     """
     Create and return a Supabase client instance
     """
+    # Imported here: the SDK is a large share of cold-start time
+    from supabase import create_client
+
     try:
         supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
         return supabase
@@ -20,5 +27,49 @@ def get_supabase_client() -> Client:
         raise
 
 
-# Global client instance
-supabase_client = get_supabase_client()
+class LazySupabaseClient:
+    """Stands in for the Supabase client and creates it on first use"""
+
+    def __init__(self):
+        self._client: Optional["Client"] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> "Client":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = get_supabase_client()
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+
+# Global client instance, created on first use
+supabase_client = LazySupabaseClient()
+
+
+# Rows fetched per page: PostgREST's default max-rows
+PAGE_SIZE = 1000
+
+
+def fetch_all(
+    query: Callable[[], Any], page_size: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Every row a select matches, a page at a time
+
+    query builds a fresh, stably ordered request. PostgREST caps each
+    response at its max-rows setting (1000 by default), so an unpaged
+    select can silently come back short.
+    """
+    page_size = page_size or PAGE_SIZE
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        page = query().range(start, start + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
@@ -0,0 +1,48 @@
+"""
+Worker Pool for CPU-Bound Media Processing
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+from app.core.config import settings
+import asyncio
+import multiprocessing
+import structlog
+
+logger = structlog.get_logger()
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool, creating it on first use
+    """
+    global _process_pool
+    if _process_pool is None:
+        # Spawn rather than fork: the API process runs threads (event loop,
+        # HTTP clients) that are not safe to duplicate into a child.
+        _process_pool = ProcessPoolExecutor(
+            max_workers=max(1, settings.MEDIA_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info("Process pool started", workers=settings.MEDIA_WORKERS)
+    return _process_pool
+
+
+async def run_in_process(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a picklable function in the process pool without blocking the loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+def shutdown_process_pool():
+    """
+    Stop the process pool, cancelling work that has not started yet
+    """
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+        logger.info("Process pool stopped")
@@ -0,0 +1,3 @@
+"""
+Jobs Package
+"""
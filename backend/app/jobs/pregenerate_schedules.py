@@ -0,0 +1,240 @@
+"""
+Nightly Schedule Pre-Generation
+
+Finds users with ai_preferences.auto_schedule whose next work day has no
+schedule yet, generates those schedules through a discounted batch LLM API
+and writes them in bulk, so the morning's first read is a cache hit.
+
+Run nightly, e.g. from cron:
+    python -m app.jobs.pregenerate_schedules
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+from datetime import date, datetime, timedelta, timezone
+from app.core.config import settings
+from app.core.logging import setup_logging
+from app.core.redis import close_redis
+from app.core.supabase import fetch_all, supabase_client
+from app.models.llm_output import ScheduleOutput
+from app.services.ai_scheduler import SCHEDULE_SYSTEM_PROMPT, AIScheduler
+from app.services.interval_index import ACTIVE_STATUSES, user_zone
+from app.services.llm_batch import BaseBatchBackend, BatchRequest, get_batch_backend
+from app.services.llm_provider import Message, provider_registry
+from app.services.schedule_cache import schedule_cache
+from app.services import duration_stats, recurrence
+import argparse
+import asyncio
+import structlog
+
+logger = structlog.get_logger()
+
+# Rows fetched per page, and ids per IN (...) filter
+PAGE_SIZE = 1000
+IN_FILTER_SIZE = 200
+
+DEFAULT_WORK_DAYS = [1, 2, 3, 4, 5]
+
+
+def next_work_day(today: date, work_days: Optional[List[int]]) -> Optional[date]:
+    """First day after today on one of work_days (0=Sunday, 6=Saturday)"""
+    days = set(work_days or DEFAULT_WORK_DAYS)
+    for offset in range(1, 8):
+        day = today + timedelta(days=offset)
+        if day.isoweekday() % 7 in days:
+            return day
+    return None
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _auto_schedule_preferences() -> List[Dict[str, Any]]:
+    """Preferences of every user with auto-scheduling on"""
+    # auto_schedule defaults to on when ai_preferences is unset
+    return fetch_all(
+        lambda: supabase_client.table("user_preferences")
+        .select("*")
+        .or_(
+            "ai_preferences->>auto_schedule.is.null,"
+            "ai_preferences->>auto_schedule.neq.false"
+        )
+        .order("user_id"),
+        PAGE_SIZE,
+    )
+
+
+def _existing_schedules(user_ids: List[str], dates: List[str]) -> Set[Tuple[str, str]]:
+    existing = set()
+    for chunk in _chunks(user_ids, IN_FILTER_SIZE):
+        rows = fetch_all(
+            lambda: supabase_client.table("schedules")
+            .select("user_id, date")
+            .in_("user_id", chunk)
+            .in_("date", dates)
+            .order("user_id")
+            .order("date"),
+            PAGE_SIZE,
+        )
+        existing.update((row["user_id"], str(row["date"])) for row in rows)
+    return existing
+
+
+def _pending_tasks(user_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    tasks: Dict[str, List[Dict[str, Any]]] = {}
+    for chunk in _chunks(user_ids, IN_FILTER_SIZE):
+        rows = fetch_all(
+            lambda: supabase_client.table("tasks")
+            .select("*")
+            .in_("user_id", chunk)
+            .in_("status", ["pending", "in_progress"])
+            .order("user_id")
+            .order("id"),
+            PAGE_SIZE,
+        )
+        for task in rows:
+            tasks.setdefault(task["user_id"], []).append(task)
+    return tasks
+
+
+def _expand_recurring(
+    tasks_by_user: Dict[str, List[Dict[str, Any]]],
+    targets: Dict[str, Tuple[date, Dict[str, Any]]],
+):
+    """Replace recurring templates with their occurrences on each target date"""
+    templates_by_user = {}
+    for user_id, tasks in tasks_by_user.items():
+        one_off, templates = recurrence.split_templates(tasks)
+        tasks_by_user[user_id] = one_off
+        if templates:
+            templates_by_user[user_id] = templates
+    if not templates_by_user:
+        return
+
+    template_ids = [
+        template["id"]
+        for templates in templates_by_user.values()
+        for template in templates
+    ]
+
+    dates = [targets[user_id][0] for user_id in templates_by_user]
+    overrides = recurrence.fetch_overrides(template_ids, min(dates), max(dates))
+    for user_id, templates in templates_by_user.items():
+        target_date, preferences = targets[user_id]
+        tasks_by_user[user_id] += recurrence.expand(
+            templates,
+            target_date,
+            target_date,
+            overrides,
+            ACTIVE_STATUSES,
+            user_zone(preferences.get("timezone")),
+        )
+
+
+async def pregenerate_schedules(
+    today: Optional[date] = None,
+    backend: Optional[BaseBatchBackend] = None,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Pre-generate next-work-day schedules for auto_schedule users
+
+    The next work day follows each user's local date at now; today, if
+    given, stands in for every user's.
+    """
+    now = now or datetime.now(timezone.utc)
+    backend = backend or get_batch_backend()
+
+    targets: Dict[str, Tuple[date, Dict[str, Any]]] = {}
+    for preferences in _auto_schedule_preferences():
+        zone = user_zone(preferences.get("timezone"))
+        local_today = today or now.astimezone(zone).date()
+        target_date = next_work_day(local_today, preferences.get("work_days"))
+        if target_date:
+            targets[preferences["user_id"]] = (target_date, preferences)
+
+    user_ids = list(targets)
+    dates = sorted({str(target_date) for target_date, _ in targets.values()})
+    existing = _existing_schedules(user_ids, dates) if user_ids else set()
+    tasks_by_user = _pending_tasks(user_ids) if user_ids else {}
+    _expand_recurring(tasks_by_user, targets)
+
+    durations = {}
+    for chunk in _chunks(user_ids, IN_FILTER_SIZE):
+        durations.update(duration_stats.load_many(chunk))
+
+    jobs = []
+    for user_id, (target_date, preferences) in targets.items():
+        tasks = tasks_by_user.get(user_id)
+        if tasks and (user_id, str(target_date)) not in existing:
+            scheduler = AIScheduler(user_id, durations.get(user_id))
+            jobs.append((scheduler, target_date, preferences, tasks))
+
+    summary = {"candidates": len(targets), "submitted": len(jobs), "created": 0, "failed": 0}
+    logger.info("Pre-generating schedules", **summary)
+
+    for chunk in _chunks(jobs, settings.LLM_BATCH_MAX_REQUESTS):
+        requests = [
+            BatchRequest(
+                custom_id=f"schedule-{i}",
+                messages=[
+                    Message(
+                        role="user",
+                        content=scheduler.schedule_prompt(tasks, preferences, target_date),
+                    )
+                ],
+                system=SCHEDULE_SYSTEM_PROMPT,
+                max_tokens=2000,
+                temperature=0.3,
+                schema=ScheduleOutput,
+            )
+            for i, (scheduler, target_date, preferences, tasks) in enumerate(chunk)
+        ]
+        batch_id, results = await backend.run(requests, settings.LLM_BATCH_TIMEOUT_SECONDS)
+
+        records = []
+        for request, (scheduler, target_date, preferences, tasks) in zip(requests, chunk):
+            response = results.get(request.custom_id)
+            if response is None:
+                # Left for interactive generation in the morning
+                summary["failed"] += 1
+                continue
+            scheduled_tasks = scheduler.parse_schedule(response, tasks, preferences)
+            records.append(
+                scheduler.schedule_record(
+                    target_date,
+                    scheduled_tasks,
+                    {"pregenerated": True, "batch_id": batch_id},
+                )
+            )
+
+        # Users may have generated interactively while the batch ran
+        generated = _existing_schedules([r["user_id"] for r in records], dates)
+        records = [r for r in records if (r["user_id"], r["date"]) not in generated]
+        if records:
+            supabase_client.table("schedules").insert(records).execute()
+        # Drop cached "no schedule yet" answers for these days
+        for record in records:
+            await schedule_cache.invalidate(record["user_id"], record["date"])
+        summary["created"] += len(records)
+
+    logger.info("Schedules pre-generated", **summary)
+    return summary
+
+
+async def _main(today: Optional[date], backend_name: Optional[str]) -> Dict[str, int]:
+    try:
+        return await pregenerate_schedules(today, get_batch_backend(backend_name))
+    finally:
+        await provider_registry.aclose()
+        await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate next-work-day schedules")
+    parser.add_argument("--today", type=date.fromisoformat, help="run as if today were this date")
+    parser.add_argument("--backend", choices=["provider", "local"], help="batch backend")
+    args = parser.parse_args()
+
+    setup_logging()
+    asyncio.run(_main(args.today, args.backend))
@@ -0,0 +1,38 @@
+"""
+Productivity Analytics Models
+"""
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+from app.models.task import Priority
+
+
+class CompletionPoint(BaseModel):
+    period_start: date
+    completed: int
+
+
+class CompletionSeries(BaseModel):
+    interval: str
+    points: List[CompletionPoint]
+    total: int
+
+
+class PriorityTime(BaseModel):
+    priority: Priority
+    completed: int
+    minutes: float  # actual_end - actual_start of the completed tasks
+
+
+class AdherencePoint(BaseModel):
+    period_start: date
+    scheduled: int
+    completed: int
+    completion_rate: Optional[float] = None  # None when nothing was scheduled
+    on_time_rate: Optional[float] = None  # of started slots
+    average_start_delay_minutes: Optional[float] = None
+
+
+class AdherenceSeries(BaseModel):
+    interval: str
+    points: List[AdherencePoint]
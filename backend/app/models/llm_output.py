@@ -0,0 +1,51 @@
+"""
+Structured LLM Output Models
+"""
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List
+from app.models.task import Priority
+
+TIME_PATTERN = r"^([01]\d|2[0-3]):[0-5]\d$"
+
+
+class ScheduleSlot(BaseModel):
+    task_id: str
+    start_time: str = Field(..., pattern=TIME_PATTERN, description="HH:MM")
+    end_time: str = Field(..., pattern=TIME_PATTERN, description="HH:MM")
+    order: int = Field(..., ge=1)
+
+
+class ScheduleOutput(BaseModel):
+    """The day's schedule, one slot per scheduled task"""
+
+    slots: List[ScheduleSlot]
+
+
+class ExtractedTask(BaseModel):
+    title: str = Field(..., min_length=1, max_length=500)
+    description: Optional[str] = None
+    priority: Priority = Priority.MEDIUM
+    estimated_duration: Optional[int] = Field(None, ge=1, description="minutes")
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def default_priority(cls, v):
+        # Strict structured output answers null for fields it may omit
+        return Priority.MEDIUM if v is None else v
+
+
+class TaskExtractionOutput(BaseModel):
+    """Actionable tasks found in the text; empty if there are none"""
+
+    tasks: List[ExtractedTask]
+
+
+class NoteTasks(BaseModel):
+    index: int = Field(..., ge=0)
+    tasks: List[ExtractedTask]
+
+
+class BatchTaskExtractionOutput(BaseModel):
+    """Actionable tasks found in each note, keyed by note index"""
+
+    notes: List[NoteTasks]
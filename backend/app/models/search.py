@@ -0,0 +1,37 @@
+"""
+Search Result Models
+"""
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+from app.models.note import SourceType
+from app.models.task import Priority, TaskStatus
+
+
+class SearchHit(BaseModel):
+    id: str
+    title: Optional[str] = None
+    created_at: datetime
+    rank: float
+    highlight: str  # matches wrapped in <mark></mark>
+
+
+class TaskSearchHit(SearchHit):
+    description: Optional[str] = None
+    priority: Priority
+    status: TaskStatus
+    scheduled_start: Optional[datetime] = None
+
+
+class NoteSearchHit(SearchHit):
+    source_type: SourceType
+
+
+class TaskSearchResults(BaseModel):
+    results: List[TaskSearchHit]
+    next_cursor: Optional[str] = None
+
+
+class NoteSearchResults(BaseModel):
+    results: List[NoteSearchHit]
+    next_cursor: Optional[str] = None
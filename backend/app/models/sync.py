@@ -0,0 +1,31 @@
+"""
+Delta Sync Models
+"""
+from pydantic import BaseModel
+from typing import Any, Dict, List
+from app.models.note import Note
+from app.models.task import Task
+
+
+class SyncedTask(Task):
+    change_seq: int
+
+
+class SyncedNote(Note):
+    change_seq: int
+
+
+class Tombstone(BaseModel):
+    table: str
+    id: str
+    change_seq: int
+
+
+class SyncChanges(BaseModel):
+    tasks: List[SyncedTask] = []
+    notes: List[SyncedNote] = []
+    schedules: List[Dict[str, Any]] = []
+    notifications: List[Dict[str, Any]] = []
+    deleted: List[Tombstone] = []
+    cursor: int  # pass back as since; 0 starts a full sync
+    has_more: bool = False
@@ -1,10 +1,12 @@
 """
 Task Data Models
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime, timezone
+from dateutil.rrule import rrulestr
 from enum import Enum
+from app.core.config import settings
 
 
 class Priority(str, Enum):
@@ -31,6 +33,12 @@ class TaskBase(BaseModel):
     scheduled_end: Optional[datetime] = None
     tags: Optional[List[str]] = []
     metadata: Optional[Dict[str, Any]] = {}
+    recurrence_rule: Optional[str] = None  # RFC 5545 RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO"
+
+    @field_validator("recurrence_rule")
+    @classmethod
+    def validate_recurrence_rule(cls, v):
+        return _validate_recurrence_rule(v)
 
 
 class TaskCreate(TaskBase):
@@ -49,6 +57,12 @@ class TaskUpdate(BaseModel):
     actual_end: Optional[datetime] = None
     tags: Optional[List[str]] = None
     metadata: Optional[Dict[str, Any]] = None
+    recurrence_rule: Optional[str] = None
+
+    @field_validator("recurrence_rule")
+    @classmethod
+    def validate_recurrence_rule(cls, v):
+        return _validate_recurrence_rule(v)
 
 
 class Task(TaskBase):
@@ -61,3 +75,117 @@ class Task(TaskBase):
 
     class Config:
         from_attributes = True
+
+
+class TaskConflict(BaseModel):
+    task_id: str
+    conflicting_task_id: str
+    overlap_start: datetime
+    overlap_end: datetime
+
+
+class TaskWriteResult(Task):
+    conflicts: List[TaskConflict] = []
+
+
+class TaskDependencyCreate(BaseModel):
+    depends_on_id: str
+
+
+class TaskDependency(BaseModel):
+    task_id: str
+    depends_on_id: str
+    created_at: Optional[datetime] = None
+
+
+class CriticalPath(BaseModel):
+    task_ids: List[str]
+    total_duration: int  # in minutes
+    tasks: List[Task] = []
+
+
+class TaskOccurrence(Task):
+    """One expanded occurrence of a recurring task"""
+
+    series_id: str
+    occurrence_date: date
+
+
+class TaskOccurrenceUpdate(BaseModel):
+    status: Optional[TaskStatus] = None
+    title: Optional[str] = Field(None, min_length=1, max_length=500)
+    description: Optional[str] = None
+    priority: Optional[Priority] = None
+    estimated_duration: Optional[int] = None
+    scheduled_start: Optional[datetime] = None
+    scheduled_end: Optional[datetime] = None
+
+
+class BulkOperationType(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class TaskBulkOperation(BaseModel):
+    """One bulk write: create takes task, update id and changes, delete id"""
+
+    op: BulkOperationType
+    id: Optional[str] = None
+    task: Optional[TaskCreate] = None
+    changes: Optional[TaskUpdate] = None
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op == BulkOperationType.CREATE:
+            if self.task is None or self.id is not None:
+                raise ValueError("create takes a task and no id")
+        elif self.id is None:
+            raise ValueError(f"{self.op.value} requires an id")
+        elif self.op == BulkOperationType.UPDATE and self.changes is None:
+            raise ValueError("update requires changes")
+        return self
+
+
+class TaskBulkRequest(BaseModel):
+    operations: List[TaskBulkOperation] = Field(
+        ..., min_length=1, max_length=settings.TASK_BULK_MAX_OPERATIONS
+    )
+
+    @field_validator("operations")
+    @classmethod
+    def check_unique_ids(cls, v):
+        ids = [operation.id for operation in v if operation.id is not None]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Each task may appear in at most one operation")
+        return v
+
+
+class TaskBulkItemResult(BaseModel):
+    index: int
+    op: BulkOperationType
+    status: str  # created | updated | deleted | not_found
+    task: Optional[TaskWriteResult] = None
+
+
+class TaskBulkResult(BaseModel):
+    results: List[TaskBulkItemResult]
+
+
+def _validate_recurrence_rule(v: Optional[str]) -> Optional[str]:
+    if v is None:
+        return v
+    v = v.strip()
+    if v.upper().startswith("RRULE:"):
+        v = v[len("RRULE:") :]
+    if not v or "\n" in v:
+        raise ValueError("recurrence_rule must be a single RRULE")
+    try:
+        rrulestr(v, dtstart=datetime(2000, 1, 1, tzinfo=timezone.utc))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid recurrence_rule: {e}")
+    # Occurrences are whole days
+    parts = dict(part.partition("=")[::2] for part in v.upper().split(";"))
+    if parts.get("FREQ") in ("HOURLY", "MINUTELY", "SECONDLY"):
+        raise ValueError("recurrence_rule may repeat at most daily")
+    return v
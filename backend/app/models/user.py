@@ -1,10 +1,11 @@
 """
 User and Preferences Data Models
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime, time
 from enum import Enum
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 
 class CalendarProvider(str, Enum):
@@ -28,7 +29,17 @@ class AIPreferences(BaseModel):
     }
 
 
+def _validate_timezone(value: Optional[str]) -> Optional[str]:
+    if value is not None:
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {value}")
+    return value
+
+
 class UserPreferencesBase(BaseModel):
+    timezone: Optional[str] = "UTC"  # IANA name; work hours and slots are local
     work_hours_start: Optional[time] = time(9, 0)
     work_hours_end: Optional[time] = time(17, 0)
     work_days: Optional[List[int]] = [1, 2, 3, 4, 5]  # Monday to Friday
@@ -40,6 +51,7 @@ class UserPreferencesBase(BaseModel):
 
 
 class UserPreferencesUpdate(BaseModel):
+    timezone: Optional[str] = None
     work_hours_start: Optional[time] = None
     work_hours_end: Optional[time] = None
     work_days: Optional[List[int]] = None
@@ -49,6 +61,8 @@ class UserPreferencesUpdate(BaseModel):
     calendar_providers: Optional[List[CalendarProvider]] = None
     ai_preferences: Optional[AIPreferences] = None
 
+    _check_timezone = field_validator("timezone")(_validate_timezone)
+
 
 class UserPreferences(UserPreferencesBase):
     id: str
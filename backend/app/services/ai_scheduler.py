@@ -3,20 +3,61 @@ AI-Powered Scheduling Service
 """
 from typing import List, Dict, Any, Optional
 from datetime import date, datetime, timedelta
-from app.services.llm_provider import LLMService, Message
+from pydantic import ValidationError
+from app.models.llm_output import ScheduleOutput
+from app.services.llm_provider import (
+    LLMService,
+    Message,
+    StructuredOutputError,
+    parse_json_object,
+)
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
 from app.core.supabase import supabase_client
+from app.services.interval_index import (
+    ACTIVE_STATUSES,
+    load_user_zone,
+    schedule_conflict_index,
+    user_zone,
+)
+from app.services.schedule_cache import schedule_cache
+from app.services import duration_stats, recurrence
+from app.services.duration_stats import DurationModel
+from app.services.task_graph import task_dependency_index
 import structlog
 import json
 
 logger = structlog.get_logger()
 
+# Static instructions, sent as a cacheable system prefix
+SCHEDULE_SYSTEM_PROMPT = """You are an AI scheduling assistant. Generate an optimized schedule for the user's tasks on the requested date.
+
+Consider:
+1. Task priorities (urgent > high > medium > low)
+2. Estimated durations
+3. User's work hours
+4. Include breaks between tasks
+5. Group similar tasks when possible
+6. Start with high-priority items
+
+Return one slot per scheduled task, using the task's id, its start and end
+time (HH:MM, 24-hour) and its position in the day's order, starting at 1."""
+
+schedule_generations = SingleFlight(
+    "schedule",
+    lock_ttl=settings.SCHEDULE_LOCK_TTL_SECONDS,
+    wait_timeout=settings.SCHEDULE_LOCK_WAIT_SECONDS,
+)
+
 
 class AIScheduler:
     """AI-powered task scheduling service"""
 
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, durations: Optional[DurationModel] = None):
         self.user_id = user_id
         self.llm_service = LLMService()
+        # Learned correction of the tasks' estimated durations
+        self.durations = durations if durations is not None else DurationModel()
 
     async def generate_schedule(
         self, target_date: date, force_regenerate: bool = False
@@ -29,72 +70,109 @@ class AIScheduler:
                 if existing_schedule:
                     return existing_schedule
 
-            # Get user preferences
-            prefs_response = (
-                supabase_client.table("user_preferences")
-                .select("*")
-                .eq("user_id", self.user_id)
-                .execute()
+            async def generate() -> Dict[str, Any]:
+                # Another leader may have saved one since the check above
+                if not force_regenerate:
+                    existing_schedule = await self.get_schedule(str(target_date))
+                    if existing_schedule:
+                        return existing_schedule
+                return await self._generate_and_save(target_date)
+
+            # Concurrent requests for the same day share one generation
+            return await schedule_generations.do(
+                f"{self.user_id}:{target_date}",
+                generate,
+                lambda: self.get_schedule(str(target_date)),
             )
-            preferences = prefs_response.data[0] if prefs_response.data else {}
+        except Exception as e:
+            logger.error("Failed to generate schedule", error=str(e))
+            raise
 
-            # Get pending tasks
-            tasks_response = (
-                supabase_client.table("tasks")
-                .select("*")
-                .eq("user_id", self.user_id)
-                .in_("status", ["pending", "in_progress"])
-                .execute()
-            )
-            tasks = tasks_response.data
+    async def _generate_and_save(self, target_date: date) -> Dict[str, Any]:
+        """Fetch inputs, run the LLM and persist a new schedule"""
+        # Get user preferences
+        prefs_response = (
+            supabase_client.table("user_preferences")
+            .select("*")
+            .eq("user_id", self.user_id)
+            .execute()
+        )
+        preferences = prefs_response.data[0] if prefs_response.data else {}
+
+        # Get pending one-off tasks, plus the day's occurrences of recurring ones
+        tasks_response = (
+            supabase_client.table("tasks")
+            .select("*")
+            .eq("user_id", self.user_id)
+            .in_("status", ACTIVE_STATUSES)
+            .is_("recurrence_rule", "null")
+            .execute()
+        )
+        tasks = tasks_response.data + recurrence.occurrences(
+            self.user_id,
+            target_date,
+            target_date,
+            ACTIVE_STATUSES,
+            user_zone(preferences.get("timezone")),
+        )
 
-            if not tasks:
-                return {
-                    "message": "No pending tasks to schedule",
-                    "date": target_date,
-                    "tasks": [],
-                }
+        if not tasks:
+            return {
+                "message": "No pending tasks to schedule",
+                "date": target_date,
+                "tasks": [],
+            }
 
-            # Generate schedule using LLM
-            scheduled_tasks = await self._generate_schedule_with_llm(
-                tasks, preferences, target_date
-            )
+        self.durations = duration_stats.load(self.user_id)
 
-            # Save schedule to database
-            schedule_data = {
-                "user_id": self.user_id,
-                "date": str(target_date),
-                "tasks": scheduled_tasks,
-                "metadata": {
-                    "ai_generated": True,
-                    "adjustments_count": 0,
-                    "task_count": len(scheduled_tasks),
-                },
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
-            }
+        # Generate schedule using LLM
+        scheduled_tasks = await self._generate_schedule_with_llm(
+            tasks, preferences, target_date
+        )
 
-            schedule_response = (
-                supabase_client.table("schedules").insert(schedule_data).execute()
-            )
+        # Save schedule to database
+        schedule_data = self.schedule_record(target_date, scheduled_tasks)
 
-            logger.info(
-                "Schedule generated",
-                user_id=self.user_id,
-                date=str(target_date),
-                task_count=len(scheduled_tasks),
-            )
+        schedule_response = (
+            supabase_client.table("schedules").insert(schedule_data).execute()
+        )
+        await schedule_cache.invalidate(self.user_id, str(target_date))
 
-            return schedule_response.data[0]
-        except Exception as e:
-            logger.error("Failed to generate schedule", error=str(e))
-            raise
+        logger.info(
+            "Schedule generated",
+            user_id=self.user_id,
+            date=str(target_date),
+            task_count=len(scheduled_tasks),
+        )
 
-    async def _generate_schedule_with_llm(
+        return schedule_response.data[0]
+
+    def schedule_record(
+        self,
+        target_date: date,
+        scheduled_tasks: List[Dict],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Build the schedules row for a generated schedule"""
+        now = datetime.utcnow().isoformat()
+        return {
+            "user_id": self.user_id,
+            "date": str(target_date),
+            "tasks": scheduled_tasks,
+            "metadata": {
+                "ai_generated": True,
+                "adjustments_count": 0,
+                "task_count": len(scheduled_tasks),
+                **(metadata or {}),
+            },
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    def schedule_prompt(
         self, tasks: List[Dict], preferences: Dict, target_date: date
-    ) -> List[Dict]:
-        """Use LLM to generate optimized schedule"""
-        # Prepare context for LLM
+    ) -> str:
+        """Build the per-call part of the scheduling prompt"""
         work_start = preferences.get("work_hours_start", "09:00")
         work_end = preferences.get("work_hours_end", "17:00")
         break_duration = preferences.get("preferred_break_duration", 15)
@@ -106,66 +184,121 @@ class AIScheduler:
                     "title": task["title"],
                     "description": task.get("description", ""),
                     "priority": task.get("priority", "medium"),
-                    "estimated_duration": task.get("estimated_duration", 60),
+                    "estimated_duration": self.durations.expected_duration(task),
                 }
                 for task in tasks
             ],
             indent=2,
         )
 
-        prompt = f"""You are an AI scheduling assistant. Generate an optimized schedule for the following tasks on {target_date}.
+        return f"""Generate an optimized schedule for the following tasks on {target_date}.
 
 User preferences:
 - Work hours: {work_start} to {work_end}
 - Preferred break duration: {break_duration} minutes
 
 Tasks to schedule:
-{tasks_context}
+{tasks_context}"""
 
-Consider:
-1. Task priorities (urgent > high > medium > low)
-2. Estimated durations
-3. User's work hours
-4. Include breaks between tasks
-5. Group similar tasks when possible
-6. Start with high-priority items
-
-Return ONLY a JSON array with this structure:
-[
-  {{
-    "task_id": "task_id_here",
-    "start_time": "HH:MM",
-    "end_time": "HH:MM",
-    "order": 1
-  }}
-]"""
+    def parse_schedule(
+        self, response: str, tasks: List[Dict], preferences: Dict
+    ) -> List[Dict]:
+        """Validate a ScheduleOutput JSON response, falling back to a simple schedule"""
+        try:
+            output = ScheduleOutput.model_validate(parse_json_object(response))
+        except (StructuredOutputError, ValidationError) as e:
+            logger.error("Failed to parse LLM response", error=str(e), response=response)
+            scheduled_tasks = self._fallback_for(tasks, preferences)
+        else:
+            scheduled_tasks = self._attach_tasks(output, tasks)
+        return self._honor_dependencies(scheduled_tasks, tasks)
 
+    async def _generate_schedule_with_llm(
+        self, tasks: List[Dict], preferences: Dict, target_date: date
+    ) -> List[Dict]:
+        """Use LLM to generate optimized schedule"""
+        prompt = self.schedule_prompt(tasks, preferences, target_date)
         messages = [Message(role="user", content=prompt)]
 
-        response = await self.llm_service.generate(
-            messages=messages, temperature=0.3, max_tokens=2000
-        )
-
-        # Parse LLM response
         try:
-            # Extract JSON from response (in case there's extra text)
-            json_start = response.find("[")
-            json_end = response.rfind("]") + 1
-            json_str = response[json_start:json_end]
-            scheduled_tasks = json.loads(json_str)
-
-            # Enrich with task details
-            task_map = {task["id"]: task for task in tasks}
-            for scheduled_task in scheduled_tasks:
-                task_id = scheduled_task["task_id"]
-                if task_id in task_map:
-                    scheduled_task["task"] = task_map[task_id]
+            output = await self.llm_service.generate_structured(
+                messages=messages,
+                schema=ScheduleOutput,
+                temperature=0.3,
+                max_tokens=2000,
+                user_id=self.user_id,
+                system=SCHEDULE_SYSTEM_PROMPT,
+            )
+        except StructuredOutputError as e:
+            logger.error("Failed to generate a valid schedule", error=str(e))
+            scheduled_tasks = self._fallback_for(tasks, preferences)
+        else:
+            scheduled_tasks = self._attach_tasks(output, tasks)
+        return self._honor_dependencies(scheduled_tasks, tasks)
+
+    def _attach_tasks(self, output: ScheduleOutput, tasks: List[Dict]) -> List[Dict]:
+        """Enrich each slot with its task's details"""
+        task_map = {task["id"]: task for task in tasks}
+        scheduled_tasks = []
+        for slot in output.slots:
+            scheduled_task = slot.model_dump()
+            if slot.task_id in task_map:
+                scheduled_task["task"] = task_map[slot.task_id]
+            scheduled_tasks.append(scheduled_task)
+        return scheduled_tasks
 
+    def _honor_dependencies(
+        self, scheduled_tasks: List[Dict], tasks: List[Dict]
+    ) -> List[Dict]:
+        """
+        Move prerequisites ahead of their dependents and drop blocked tasks
+
+        Dependencies are applied here, in one pass over the graph, rather
+        than described to the LLM. Slots keep their durations and the gaps
+        between consecutive slots are preserved.
+        """
+        if not scheduled_tasks:
             return scheduled_tasks
-        except json.JSONDecodeError as e:
-            logger.error("Failed to parse LLM response", error=str(e), response=response)
-            # Fallback: create simple schedule
-            return self._create_fallback_schedule(tasks, work_start)
+        windows = sorted(scheduled_tasks, key=lambda slot: slot["start_time"])
+        preferred = [slot["task_id"] for slot in windows]
+        ordered = task_dependency_index.schedule_order(
+            self.user_id, preferred, {task["id"] for task in tasks}
+        )
+        if ordered == preferred:
+            return scheduled_tasks
+
+        slots = {slot["task_id"]: slot for slot in windows}
+        gaps = [
+            max(_minutes(after["start_time"]) - _minutes(before["end_time"]), 0)
+            for before, after in zip(windows, windows[1:])
+        ]
+        cursor = _minutes(windows[0]["start_time"])
+        reordered = []
+        for position, task_id in enumerate(ordered):
+            slot = slots[task_id]
+            duration = max(
+                _minutes(slot["end_time"]) - _minutes(slot["start_time"]), 0
+            )
+            reordered.append(
+                {
+                    **slot,
+                    "start_time": _clock(cursor),
+                    "end_time": _clock(cursor + duration),
+                    "order": position + 1,
+                }
+            )
+            cursor += duration + (gaps[position] if position < len(gaps) else 0)
+
+        logger.info(
+            "Schedule reordered for dependencies",
+            user_id=self.user_id,
+            blocked_count=len(preferred) - len(ordered),
+        )
+        return reordered
+
+    def _fallback_for(self, tasks: List[Dict], preferences: Dict) -> List[Dict]:
+        work_start = str(preferences.get("work_hours_start", "09:00"))[:5]
+        return self._create_fallback_schedule(tasks, work_start)
 
     def _create_fallback_schedule(
         self, tasks: List[Dict], start_time: str
@@ -181,7 +314,7 @@ Return ONLY a JSON array with this structure:
         )
 
         for i, task in enumerate(sorted_tasks[:10]):  # Limit to 10 tasks
-            duration = task.get("estimated_duration", 60)
+            duration = self.durations.expected_duration(task)
             end_time = current_time + timedelta(minutes=duration)
 
             scheduled_tasks.append(
@@ -201,21 +334,33 @@ Return ONLY a JSON array with this structure:
     async def get_schedule(self, date: str) -> Optional[Dict]:
         """Get existing schedule for a date"""
         try:
-            response = (
-                supabase_client.table("schedules")
-                .select("*")
-                .eq("user_id", self.user_id)
-                .eq("date", date)
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()
+            return await schedule_cache.get_or_load(
+                self.user_id, date, lambda: self._load_schedule(date)
             )
-
-            return response.data[0] if response.data else None
         except Exception as e:
             logger.error("Failed to get schedule", error=str(e))
             return None
 
+    async def _load_schedule(self, date: str) -> Optional[Dict]:
+        response = (
+            supabase_client.table("schedules")
+            .select("*")
+            .eq("user_id", self.user_id)
+            .eq("date", date)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+
+        return response.data[0] if response.data else None
+
+    async def get_schedule_version(self, date: str) -> Optional[Dict]:
+        """Get the id and updated_at of the schedule get_schedule would return"""
+        schedule = await self.get_schedule(date)
+        if not schedule:
+            return None
+        return {"id": schedule["id"], "updated_at": schedule.get("updated_at")}
+
     async def adjust_schedule(
         self, schedule_id: str, adjustments: Dict
     ) -> Dict[str, Any]:
@@ -237,9 +382,18 @@ Return ONLY a JSON array with this structure:
             metadata = schedule.get("metadata", {})
             metadata["adjustments_count"] = metadata.get("adjustments_count", 0) + 1
 
+            adjusted_tasks = adjustments.get("tasks", schedule["tasks"])
+            conflicts = schedule_conflict_index.slot_conflicts(
+                self.user_id,
+                schedule["date"],
+                adjusted_tasks,
+                load_user_zone(self.user_id),
+            )
+            metadata["conflict_count"] = len(conflicts)
+
             # Update schedule
             update_data = {
-                "tasks": adjustments.get("tasks", schedule["tasks"]),
+                "tasks": adjusted_tasks,
                 "metadata": metadata,
                 "updated_at": datetime.utcnow().isoformat(),
             }
@@ -250,10 +404,26 @@ Return ONLY a JSON array with this structure:
                 .eq("id", schedule_id)
                 .execute()
             )
+            await schedule_cache.invalidate(self.user_id, str(schedule["date"]))
 
-            logger.info("Schedule adjusted", schedule_id=schedule_id, user_id=self.user_id)
+            logger.info(
+                "Schedule adjusted",
+                schedule_id=schedule_id,
+                user_id=self.user_id,
+                conflict_count=len(conflicts),
+            )
 
-            return updated_response.data[0]
+            return {**updated_response.data[0], "conflicts": conflicts}
         except Exception as e:
             logger.error("Failed to adjust schedule", error=str(e))
             raise
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = str(value)[:5].split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _clock(minutes: int) -> str:
+    minutes = min(minutes, 24 * 60 - 1)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
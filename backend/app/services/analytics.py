@@ -0,0 +1,188 @@
+"""
+Productivity Analytics over Daily Rollups
+
+Triggers keep task_daily_rollups and schedule_daily_rollups current as
+tasks and scheduling_history change (see the analytics rollups
+migration), and scheduling_history follows the schedule in effect for
+each day and its tasks' progress (see the scheduling history
+migration). Rows are keyed by the user's local day, so a window of a
+year is at most a few rows per day however many tasks the user has.
+Those rows are bucketed into days, weeks or months here with NumPy
+instead of one query per bucket.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, timedelta
+from enum import Enum
+from app.core.supabase import fetch_all, supabase_client
+import numpy as np
+
+# Each rollup table's key after user_id, the order rows are paged in
+ROLLUP_KEYS = {
+    "task_daily_rollups": ("day", "priority"),
+    "schedule_daily_rollups": ("day",),
+}
+
+MAX_WINDOW_DAYS = 731
+
+PRIORITIES = ["urgent", "high", "medium", "low"]
+
+
+class Interval(str, Enum):
+    DAY = "day"
+    WEEK = "week"  # starting Monday
+    MONTH = "month"
+
+
+def _rollup_rows(
+    table: str, columns: str, user_id: str, start: date, end: date
+) -> List[Dict[str, Any]]:
+    if end < start:
+        raise ValueError("'to' must not be before 'from'")
+    if (end - start).days >= MAX_WINDOW_DAYS:
+        raise ValueError(f"Analytics window is limited to {MAX_WINDOW_DAYS} days")
+
+    def query():
+        request = (
+            supabase_client.table(table)
+            .select(columns)
+            .eq("user_id", user_id)
+            .gte("day", start.isoformat())
+            .lte("day", end.isoformat())
+        )
+        for column in ROLLUP_KEYS[table]:
+            request = request.order(column)
+        return request
+
+    return fetch_all(query)
+
+
+def _days(rows: List[Dict[str, Any]]) -> np.ndarray:
+    return np.array([str(row["day"])[:10] for row in rows], dtype="datetime64[D]")
+
+
+def _column(rows: List[Dict[str, Any]], name: str) -> np.ndarray:
+    return np.array([row[name] for row in rows], dtype=np.float64)
+
+
+def _period_index(days: np.ndarray, interval: Interval) -> np.ndarray:
+    """Period number of each day: days, Monday weeks or months since 1970"""
+    if interval == Interval.MONTH:
+        return days.astype("datetime64[M]").astype(np.int64)
+    ordinals = days.astype(np.int64)
+    if interval == Interval.WEEK:
+        # 1970-01-01 was a Thursday
+        return (ordinals + 3) // 7
+    return ordinals
+
+
+def _period_start(index: int, interval: Interval) -> date:
+    if interval == Interval.MONTH:
+        return np.datetime64(int(index), "M").astype("datetime64[D]").item()
+    if interval == Interval.WEEK:
+        return date(1970, 1, 1) + timedelta(days=int(index) * 7 - 3)
+    return date(1970, 1, 1) + timedelta(days=int(index))
+
+
+def _periods(
+    days: np.ndarray, start: date, end: date, interval: Interval
+) -> Tuple[np.ndarray, List[date]]:
+    """
+    Position of each day among the window's periods, and the periods' starts
+
+    Every period the window touches is listed, with or without data, so a
+    chart gets a continuous series.
+    """
+    first, last = _period_index(
+        np.array([start, end], dtype="datetime64[D]"), interval
+    )
+    starts = [_period_start(i, interval) for i in range(first, last + 1)]
+    return _period_index(days, interval) - first, starts
+
+
+def _sum_by(positions: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    return np.bincount(positions, weights=values, minlength=size)
+
+
+def completions(
+    user_id: str, start: date, end: date, interval: Interval
+) -> List[Dict[str, Any]]:
+    """Tasks completed in each period of the window"""
+    rows = _rollup_rows(
+        "task_daily_rollups", "day, completed_count", user_id, start, end
+    )
+    positions, starts = _periods(_days(rows), start, end, interval)
+    completed = _sum_by(positions, _column(rows, "completed_count"), len(starts))
+    return [
+        {"period_start": period_start, "completed": int(count)}
+        for period_start, count in zip(starts, completed)
+    ]
+
+
+def time_by_priority(user_id: str, start: date, end: date) -> List[Dict[str, Any]]:
+    """Completed tasks and minutes spent on them per priority, over the window"""
+    rows = _rollup_rows(
+        "task_daily_rollups",
+        "day, priority, completed_count, minutes_spent",
+        user_id,
+        start,
+        end,
+    )
+    positions = np.array(
+        [PRIORITIES.index(row["priority"]) for row in rows], dtype=np.int64
+    )
+    completed = _sum_by(positions, _column(rows, "completed_count"), len(PRIORITIES))
+    minutes = _sum_by(positions, _column(rows, "minutes_spent"), len(PRIORITIES))
+    return [
+        {
+            "priority": priority,
+            "completed": int(count),
+            "minutes": round(float(spent), 1),
+        }
+        for priority, count, spent in zip(PRIORITIES, completed, minutes)
+    ]
+
+
+def adherence(
+    user_id: str, start: date, end: date, interval: Interval
+) -> List[Dict[str, Any]]:
+    """How closely the user followed their schedules, per period"""
+    rows = _rollup_rows(
+        "schedule_daily_rollups",
+        "day, scheduled_count, completed_count, started_count, "
+        "on_time_count, start_delay_minutes",
+        user_id,
+        start,
+        end,
+    )
+    positions, starts = _periods(_days(rows), start, end, interval)
+    scheduled, completed, started, on_time, delay = (
+        _sum_by(positions, _column(rows, name), len(starts))
+        for name in (
+            "scheduled_count",
+            "completed_count",
+            "started_count",
+            "on_time_count",
+            "start_delay_minutes",
+        )
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        completion_rate = np.where(scheduled > 0, completed / scheduled, np.nan)
+        on_time_rate = np.where(started > 0, on_time / started, np.nan)
+        average_delay = np.where(started > 0, delay / started, np.nan)
+
+    return [
+        {
+            "period_start": starts[i],
+            "scheduled": int(scheduled[i]),
+            "completed": int(completed[i]),
+            "completion_rate": _rate(completion_rate[i]),
+            "on_time_rate": _rate(on_time_rate[i]),
+            "average_start_delay_minutes": _rate(average_delay[i], 1),
+        }
+        for i in range(len(starts))
+    ]
+
+
+def _rate(value: float, digits: int = 3) -> Optional[float]:
+    """None for periods with nothing to measure"""
+    return None if np.isnan(value) else round(float(value), digits)
@@ -0,0 +1,178 @@
+"""
+Buffered, Batched Audit Log Writer
+"""
+from typing import Any, Deque, Dict, List, Optional
+from collections import deque
+from datetime import datetime
+from fastapi import Request
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.supabase import supabase_client
+import asyncio
+import ipaddress
+import structlog
+
+logger = structlog.get_logger()
+
+
+def client_details(request: Optional[Request]) -> Dict[str, Optional[str]]:
+    """Client IP (only if it fits the INET column) and user agent of a request"""
+    if request is None:
+        return {"ip_address": None, "user_agent": None}
+    host = request.client.host if request.client else None
+    try:
+        ip_address = str(ipaddress.ip_address(host)) if host else None
+    except ValueError:
+        ip_address = None
+    return {"ip_address": ip_address, "user_agent": request.headers.get("user-agent")}
+
+
+class AuditWriter:
+    """
+    In-process buffer of audit events, written to audit_logs in batches
+
+    Requests only append to a bounded buffer. A background flusher inserts
+    up to batch_size rows per statement, as soon as a batch is full or after
+    flush_interval. When inserts fall behind and the buffer fills, record()
+    waits up to enqueue_timeout for room and then drops the event, so a slow
+    database slows auditing rather than every write. Whatever is buffered at
+    shutdown is flushed by stop().
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        batch_size: int,
+        flush_interval: float,
+        enqueue_timeout: float,
+        max_retries: int = 3,
+    ):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        # A buffer smaller than a batch must not wait for the interval when full
+        self._flush_at = min(batch_size, capacity)
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._flusher: Optional[asyncio.Task] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def record(
+        self,
+        action: str,
+        entity_type: str,
+        user_id: Optional[str],
+        entity_id: Optional[str] = None,
+        changes: Optional[Dict[str, Any]] = None,
+        request: Optional[Request] = None,
+    ) -> bool:
+        """Queue one audit event; False if it had to be dropped"""
+        if len(self._buffer) >= self.capacity and self._space is not None:
+            metrics.increment("audit.backpressure")
+            try:
+                async with self._space:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._buffer) < self.capacity),
+                        self.enqueue_timeout,
+                    )
+            except asyncio.TimeoutError:
+                pass
+        if len(self._buffer) >= self.capacity:
+            metrics.increment("audit.dropped")
+            logger.warning("Audit buffer full, dropping event", action=action)
+            return False
+
+        self._buffer.append(
+            {
+                "user_id": user_id,
+                "action": action,
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "changes": changes,
+                **client_details(request),
+                "created_at": datetime.utcnow().isoformat(),
+            }
+        )
+        if len(self._buffer) >= self._flush_at and self._batch_ready is not None:
+            self._batch_ready.set()
+        return True
+
+    def start(self):
+        """Start the background flusher"""
+        if self._flusher is None:
+            self._stopping = False
+            self._batch_ready = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher after writing everything buffered"""
+        if self._flusher is not None:
+            self._stopping = True
+            self._batch_ready.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        self._batch_ready = self._space = None
+
+    async def _run(self):
+        while not self._stopping:
+            if len(self._buffer) < self._flush_at:
+                self._batch_ready.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._batch_ready.wait(), self.flush_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Audit flush failed", error=str(e))
+
+    async def flush(self):
+        """Write out everything buffered, one batch at a time"""
+        while self._buffer:
+            batch = [
+                self._buffer.popleft()
+                for _ in range(min(self.batch_size, len(self._buffer)))
+            ]
+            if self._space is not None:
+                async with self._space:
+                    self._space.notify_all()
+            await self._write(batch)
+
+    def clear(self):
+        """Drop everything buffered without writing it"""
+        self._buffer.clear()
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.to_thread(
+                    lambda: supabase_client.table("audit_logs").insert(batch).execute()
+                )
+                metrics.increment("audit.written", len(batch))
+                return
+            except Exception as e:
+                logger.warning(
+                    "Audit batch insert failed", attempt=attempt + 1, error=str(e)
+                )
+                if attempt < self.max_retries:
+                    await asyncio.sleep(0.5 * 2**attempt)
+        metrics.increment("audit.dropped", len(batch))
+        logger.error("Dropping audit batch", size=len(batch))
+
+
+audit_log = AuditWriter(
+    capacity=settings.AUDIT_BUFFER_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    enqueue_timeout=settings.AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+)
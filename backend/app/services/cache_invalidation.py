@@ -0,0 +1,55 @@
+"""
+Local Cache Eviction on Database Changes
+"""
+from typing import Any, Dict
+from app.core.invalidation import InvalidationBus
+from app.services.interval_index import schedule_conflict_index
+from app.services.schedule_cache import schedule_cache, scheduled_days
+from app.services.task_graph import task_dependency_index
+from app.services.task_similarity import task_similarity_index
+
+
+def on_task_change(event: Dict[str, Any]):
+    user_id, task_id = event["user_id"], event["id"]
+    if event["op"] == "DELETE":
+        schedule_conflict_index.remove(user_id, task_id)
+        task_similarity_index.remove(user_id, task_id)
+        task_dependency_index.remove_task(user_id, task_id)
+    else:
+        schedule_conflict_index.refresh(user_id, event)
+        task_similarity_index.refresh(
+            user_id, task_id, event["status"], event["fingerprint"]
+        )
+    schedule_cache.evict_local_tasks(user_id, [task_id], scheduled_days(event))
+
+
+def on_schedule_change(event: Dict[str, Any]):
+    schedule_cache.evict_local(event["user_id"], event["date"])
+
+
+def on_dependency_change(event: Dict[str, Any]):
+    user_id, task_id, depends_on_id = (
+        event["user_id"],
+        event["task_id"],
+        event["depends_on_id"],
+    )
+    if event["op"] == "DELETE":
+        task_dependency_index.discard(user_id, task_id, depends_on_id)
+    else:
+        task_dependency_index.refresh_edge(user_id, task_id, depends_on_id)
+
+
+def drop_all():
+    """Forget everything cached locally; changes may have been missed"""
+    schedule_cache.clear()
+    schedule_conflict_index.clear()
+    task_similarity_index.clear()
+    task_dependency_index.clear()
+
+
+def register(bus: InvalidationBus):
+    """Subscribe this process's caches to database changes"""
+    bus.subscribe("tasks", on_task_change)
+    bus.subscribe("schedules", on_schedule_change)
+    bus.subscribe("task_dependencies", on_dependency_change)
+    bus.on_connect(drop_all)
@@ -0,0 +1,118 @@
+"""
+Learned Duration Estimates
+"""
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+from app.core.config import settings
+from app.core.supabase import fetch_all, supabase_client
+from app.services.task_graph import DEFAULT_DURATION
+import math
+import structlog
+
+logger = structlog.get_logger()
+
+# Bucket key for "any priority" / "any tag", as stored by the migration
+ANY = ""
+
+
+class Bucket(NamedTuple):
+    """Running statistics of actual / estimated duration for one bucket"""
+
+    sample_count: int
+    mean_ratio: float
+    m2: float
+
+    @property
+    def variance(self) -> float:
+        if self.sample_count < 2:
+            return 0.0
+        return self.m2 / (self.sample_count - 1)
+
+    @property
+    def standard_error(self) -> float:
+        return math.sqrt(self.variance / self.sample_count)
+
+
+class DurationModel:
+    """
+    Correction factors for one user's duration estimates
+
+    Built from the user's task_duration_stats rows, which a trigger keeps up
+    to date as tasks are completed, so applying it never reads task history.
+    A task uses the most specific buckets that have min_samples: its priority
+    and tags, then its priority, then its tags, then all the user's tasks.
+    Among a task's tags the bucket with the smallest standard error wins, the
+    tag that predicts its overrun best.
+    """
+
+    def __init__(
+        self,
+        rows: Iterable[Dict[str, Any]] = (),
+        min_samples: int = settings.DURATION_MIN_SAMPLES,
+    ):
+        self.min_samples = min_samples
+        self._buckets: Dict[Tuple[str, str], Bucket] = {
+            (row["priority"], row["tag"]): Bucket(
+                int(row["sample_count"]), float(row["mean_ratio"]), float(row["m2"])
+            )
+            for row in rows
+        }
+
+    def ratio(self, task: Dict[str, Any]) -> float:
+        """Expected actual / estimated duration for a task, 1.0 if unknown"""
+        priority = task.get("priority") or "medium"
+        tags = [tag for tag in task.get("tags") or [] if tag]
+        levels = (
+            [(priority, tag) for tag in tags],
+            [(priority, ANY)],
+            [(ANY, tag) for tag in tags],
+            [(ANY, ANY)],
+        )
+        for keys in levels:
+            usable = [
+                bucket
+                for bucket in (self._buckets.get(key) for key in keys)
+                if bucket is not None and bucket.sample_count >= self.min_samples
+            ]
+            if usable:
+                return min(usable, key=lambda b: b.standard_error).mean_ratio
+        return 1.0
+
+    def expected_duration(self, task: Dict[str, Any]) -> int:
+        """The task's estimate in minutes, corrected by the user's track record"""
+        estimate = task.get("estimated_duration") or DEFAULT_DURATION
+        return max(round(estimate * self.ratio(task)), 1)
+
+
+def load(user_id: str) -> DurationModel:
+    """One user's duration model"""
+    return load_many([user_id]).get(user_id, DurationModel())
+
+
+def load_many(user_ids: List[str]) -> Dict[str, DurationModel]:
+    """
+    Duration models for many users
+
+    A user has a row per priority and tag bucket, so the rows are read a
+    page at a time.
+    """
+    if not user_ids:
+        return {}
+    try:
+        stats = fetch_all(
+            lambda: supabase_client.table("task_duration_stats")
+            .select("user_id, priority, tag, sample_count, mean_ratio, m2")
+            .in_("user_id", user_ids)
+            .order("user_id")
+            .order("priority")
+            .order("tag")
+        )
+    except Exception as e:
+        # Uncorrected estimates are still a schedule
+        logger.warning("Failed to load duration statistics", error=str(e))
+        return {}
+
+    rows: Dict[str, List[Dict[str, Any]]] = {}
+    for row in stats:
+        rows.setdefault(row["user_id"], []).append(row)
+    return {user_id: DurationModel(user_rows) for user_id, user_rows in rows.items()}
+
@@ -1,26 +1,48 @@
 """
 Multimodal Ingestion Service
 """
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from fastapi import UploadFile
-from app.services.llm_provider import LLMService, Message
+from app.models.llm_output import BatchTaskExtractionOutput, TaskExtractionOutput
+from app.services.llm_provider import LLMService, Message, StructuredOutputError
+from app.services.llm_gateway import LLMGatewayError, RequestPriority
+from app.services.speech import SpeechTranscriber
+from app.services.vision import ImageTextExtractor
+from app.services.media_assets import MediaAssetStore, content_hash
+from app.services.audit import audit_log
+from app.services.schedule_cache import schedule_cache, scheduled_days
+from app.services.task_similarity import task_similarity_index
 from app.core.supabase import supabase_client
 from app.core.config import settings
 import structlog
-import json
-import uuid
+import asyncio
 import aiofiles
 import os
+import uuid
 from datetime import datetime
 
 logger = structlog.get_logger()
 
+# Static instructions, sent as cacheable system prefixes
+TASK_EXTRACTION_SYSTEM_PROMPT = """Extract actionable tasks from the user's text. Identify task titles, descriptions, priorities (low, medium, high or urgent), and estimated durations in minutes.
+
+If no clear tasks are found, return an empty task list."""
+
+BATCH_TASK_EXTRACTION_SYSTEM_PROMPT = """Extract actionable tasks from each of the user's notes. Identify task titles, descriptions, priorities (low, medium, high or urgent), and estimated durations in minutes. Keep every task with the note it came from.
+
+Include every note index; use an empty task list for notes without clear tasks."""
+
+PRIORITY_RANK = {"low": 0, "medium": 1, "high": 2, "urgent": 3}
+
 
 class IngestionService:
     """Service for processing multimodal input (text, voice, images)"""
 
     def __init__(self):
         self.llm_service = LLMService()
+        self.transcriber = SpeechTranscriber()
+        self.image_extractor = ImageTextExtractor(self.llm_service)
+        self.media_store = MediaAssetStore()
 
     async def process_text(
         self, user_id: str, content: str, title: Optional[str] = None
@@ -28,7 +50,7 @@ class IngestionService:
         """Process text input and extract tasks"""
         try:
             # Extract tasks using LLM
-            extracted_tasks = await self._extract_tasks_from_text(content)
+            extracted_tasks = await self._extract_tasks_from_text(user_id, content)
 
             # Save note
             note_data = {
@@ -44,11 +66,12 @@ class IngestionService:
             note_response = supabase_client.table("notes").insert(note_data).execute()
 
             # Create tasks if extracted
-            created_tasks = []
+            created_tasks, duplicates = [], []
             if extracted_tasks:
-                created_tasks = await self._create_tasks_from_extraction(
+                rows, duplicates = await self._create_tasks_from_extraction(
                     user_id, extracted_tasks
                 )
+                created_tasks = [row for row in rows if row]
 
             logger.info(
                 "Text processed",
@@ -60,26 +83,169 @@ class IngestionService:
                 "note_id": note_response.data[0]["id"],
                 "extracted_tasks": extracted_tasks,
                 "created_tasks": created_tasks,
+                "duplicates": duplicates,
                 "status": "completed",
             }
         except Exception as e:
             logger.error("Failed to process text", error=str(e))
             raise
 
+    async def process_text_batch(
+        self, user_id: str, notes: List[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process many text notes concurrently, yielding each result as it completes
+
+        Short notes are packed into shared extraction prompts, and each group's
+        notes and tasks are written with one insert per table.
+        """
+        semaphore = asyncio.Semaphore(settings.INGEST_BATCH_CONCURRENCY)
+
+        async def run(group: List[int]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return await self._ingest_text_group(
+                        user_id, [(i, notes[i]) for i in group]
+                    )
+                except LLMGatewayError as e:
+                    return [
+                        {
+                            "index": i,
+                            "status": "failed",
+                            "error": str(e),
+                            "retry_after": e.retry_after,
+                        }
+                        for i in group
+                    ]
+                except Exception as e:
+                    logger.error("Failed to process text batch group", error=str(e))
+                    return [{"index": i, "status": "failed", "error": str(e)} for i in group]
+
+        pending = [asyncio.create_task(run(group)) for group in self._plan_text_groups(notes)]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                for result in await next_done:
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+        logger.info("Text batch processed", user_id=user_id, note_count=len(notes))
+
+    def _plan_text_groups(self, notes: List[Dict[str, Any]]) -> List[List[int]]:
+        """Pack short notes into micro-batches; long notes go alone"""
+        groups: List[List[int]] = []
+        current: List[int] = []
+        current_chars = 0
+
+        for i, note in enumerate(notes):
+            length = len(note["content"])
+            if length > settings.INGEST_MICROBATCH_MAX_CHARS:
+                groups.append([i])
+                continue
+            if current and (
+                len(current) >= settings.INGEST_MICROBATCH_SIZE
+                or current_chars + length > settings.INGEST_MICROBATCH_MAX_CHARS
+            ):
+                groups.append(current)
+                current, current_chars = [], 0
+            current.append(i)
+            current_chars += length
+
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _ingest_text_group(
+        self, user_id: str, group: List[Tuple[int, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Extract, then bulk-insert the notes and tasks of one micro-batch"""
+        if len(group) == 1:
+            extractions = [
+                await self._extract_tasks_from_text(
+                    user_id, group[0][1]["content"], RequestPriority.BACKGROUND
+                )
+            ]
+        else:
+            extractions = await self._extract_tasks_from_notes(
+                user_id, [note for _, note in group]
+            )
+
+        # Ids are assigned here, so rows are matched back by key rather than
+        # by the order the insert returns them in
+        note_records = [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "title": note.get("title"),
+                "content": note["content"],
+                "source_type": "text",
+                "extracted_tasks": extracted_tasks,
+                "created_at": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+            for (_, note), extracted_tasks in zip(group, extractions)
+        ]
+        supabase_client.table("notes").insert(note_records).execute()
+
+        rows, duplicates = await self._create_tasks_from_extraction(
+            user_id, [task for extracted_tasks in extractions for task in extracted_tasks]
+        )
+
+        results = []
+        offset = 0
+        for (index, _), note_record, extracted_tasks in zip(
+            group, note_records, extractions
+        ):
+            end = offset + len(extracted_tasks)
+            results.append(
+                {
+                    "index": index,
+                    "note_id": note_record["id"],
+                    "extracted_tasks": extracted_tasks,
+                    "created_tasks": [row for row in rows[offset:end] if row],
+                    "duplicates": [
+                        {
+                            **duplicate,
+                            "extracted_index": duplicate["extracted_index"] - offset,
+                        }
+                        for duplicate in duplicates
+                        if offset <= duplicate["extracted_index"] < end
+                    ],
+                    "status": "completed",
+                }
+            )
+            offset = end
+        return results
+
     async def process_voice(
         self, user_id: str, audio_file: UploadFile
     ) -> Dict[str, Any]:
         """Process voice recording and extract tasks"""
         try:
+            content = await audio_file.read()
+            digest = content_hash(content)
+
+            # Identical bytes were ingested before: reuse the stored result
+            asset = self.media_store.find_by_hash(user_id, digest)
+            if asset and asset.get("note_id"):
+                return self._deduplicated_result(asset, "exact")
+
             # Save audio file
-            file_path = await self._save_upload_file(audio_file)
+            file_path = await self.media_store.save_file(
+                audio_file.filename, content, digest
+            )
 
-            # TODO: Implement actual speech-to-text
-            # For now, create a placeholder transcription
-            transcription = f"[Audio transcription would go here for {audio_file.filename}]"
+            # Transcribe in the worker pool; let ffmpeg sniff non-WAV formats
+            file_extension = os.path.splitext(audio_file.filename or "")[1].lower()
+            transcription = await self.transcriber.transcribe(
+                content, "wav" if file_extension == ".wav" else None
+            )
 
             # Extract tasks from transcription
-            extracted_tasks = await self._extract_tasks_from_text(transcription)
+            extracted_tasks = []
+            if transcription:
+                extracted_tasks = await self._extract_tasks_from_text(user_id, transcription)
 
             # Save note
             note_data = {
@@ -96,17 +262,32 @@ class IngestionService:
             note_response = supabase_client.table("notes").insert(note_data).execute()
 
             # Create tasks
-            created_tasks = await self._create_tasks_from_extraction(
+            rows, duplicates = await self._create_tasks_from_extraction(
                 user_id, extracted_tasks
             )
 
-            logger.info("Voice processed", user_id=user_id)
-
-            return {
+            result = {
                 "note_id": note_response.data[0]["id"],
                 "transcription": transcription,
                 "extracted_tasks": extracted_tasks,
-                "created_tasks": created_tasks,
+            }
+            self.media_store.record(
+                user_id,
+                audio_file.filename,
+                "audio",
+                content,
+                digest,
+                file_path,
+                result["note_id"],
+                result,
+            )
+
+            logger.info("Voice processed", user_id=user_id)
+
+            return {
+                **result,
+                "created_tasks": [row for row in rows if row],
+                "duplicates": duplicates,
                 "status": "completed",
             }
         except Exception as e:
@@ -118,15 +299,49 @@ class IngestionService:
     ) -> Dict[str, Any]:
         """Process image and extract tasks"""
         try:
-            # Save image file
-            file_path = await self._save_upload_file(image_file)
+            content = await image_file.read()
+            digest = content_hash(content)
+
+            # Identical bytes were ingested before: reuse the stored result
+            asset = self.media_store.find_by_hash(user_id, digest)
+            if asset and asset.get("note_id"):
+                return self._deduplicated_result(asset, "exact")
+
+            # Preprocess in the worker pool
+            prepared = await self.image_extractor.prepare(content)
+            phash = prepared["perceptual_hash"]
 
-            # TODO: Implement actual OCR/image analysis
-            # For now, create a placeholder
-            extracted_text = f"[Image text extraction would go here for {image_file.filename}]"
+            # Same picture re-encoded or re-shot: reuse the earlier extraction
+            similar = self.media_store.find_similar_image(
+                user_id, phash, settings.IMAGE_SIMILARITY_MAX_DISTANCE
+            )
+            # The upload's own bytes are stored either way
+            file_path = await self.media_store.save_file(
+                image_file.filename, content, digest
+            )
+            if similar and similar.get("note_id"):
+                previous = similar.get("metadata", {}).get("result", {})
+                self.media_store.record(
+                    user_id,
+                    image_file.filename,
+                    "image",
+                    content,
+                    digest,
+                    file_path,
+                    similar["note_id"],
+                    previous,
+                    phash,
+                )
+                return self._deduplicated_result(similar, "near")
+
+            # Read text from the reduced image
+            thumbnail_path = await self._save_thumbnail(file_path, prepared["thumbnail"])
+            extracted_text = await self.image_extractor.extract_text(user_id, prepared)
 
             # Extract tasks
-            extracted_tasks = await self._extract_tasks_from_text(extracted_text)
+            extracted_tasks = []
+            if extracted_text:
+                extracted_tasks = await self._extract_tasks_from_text(user_id, extracted_text)
 
             # Save note
             note_data = {
@@ -135,6 +350,12 @@ class IngestionService:
                 "source_type": "image",
                 "media_url": file_path,
                 "extracted_tasks": extracted_tasks,
+                "metadata": {
+                    "thumbnail_url": thumbnail_path,
+                    "original_size": prepared["original_size"],
+                    "processed_size": prepared["size"],
+                    "skew_angle": prepared["skew_angle"],
+                },
                 "created_at": datetime.utcnow().isoformat(),
                 "updated_at": datetime.utcnow().isoformat(),
             }
@@ -142,102 +363,251 @@ class IngestionService:
             note_response = supabase_client.table("notes").insert(note_data).execute()
 
             # Create tasks
-            created_tasks = await self._create_tasks_from_extraction(
+            rows, duplicates = await self._create_tasks_from_extraction(
                 user_id, extracted_tasks
             )
 
-            logger.info("Image processed", user_id=user_id)
-
-            return {
+            result = {
                 "note_id": note_response.data[0]["id"],
                 "extracted_text": extracted_text,
+                "thumbnail_url": thumbnail_path,
                 "extracted_tasks": extracted_tasks,
-                "created_tasks": created_tasks,
+            }
+            self.media_store.record(
+                user_id,
+                image_file.filename,
+                "image",
+                content,
+                digest,
+                file_path,
+                result["note_id"],
+                result,
+                phash,
+            )
+
+            logger.info("Image processed", user_id=user_id)
+
+            return {
+                **result,
+                "created_tasks": [row for row in rows if row],
+                "duplicates": duplicates,
                 "status": "completed",
             }
         except Exception as e:
             logger.error("Failed to process image", error=str(e))
             raise
 
-    async def _extract_tasks_from_text(self, text: str) -> list:
-        """Use LLM to extract actionable tasks from text"""
-        prompt = f"""Extract actionable tasks from the following text. Identify task titles, descriptions, priorities, and estimated durations.
-
-Text:
-{text}
+    def _deduplicated_result(self, asset: Dict[str, Any], match: str) -> Dict[str, Any]:
+        """Build a response from a previously ingested upload"""
+        previous = asset.get("metadata", {}).get("result", {})
 
-Return ONLY a JSON array with this structure:
-[
-  {{
-    "title": "Task title",
-    "description": "Optional description",
-    "priority": "low|medium|high|urgent",
-    "estimated_duration": 60
-  }}
-]
+        logger.info(
+            "Duplicate upload reused",
+            user_id=asset["user_id"],
+            asset_id=asset["id"],
+            match=match,
+        )
 
-If no clear tasks are found, return an empty array: []"""
+        # The tasks were created by the original ingestion, so none are new
+        return {
+            **previous,
+            "note_id": asset["note_id"],
+            "created_tasks": [],
+            "duplicates": [],
+            "duplicate_of": asset["note_id"],
+            "duplicate_match": match,
+            "status": "completed",
+        }
+
+    async def _extract_tasks_from_text(
+        self,
+        user_id: str,
+        text: str,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+    ) -> list:
+        """Use LLM to extract actionable tasks from text"""
+        prompt = f"""Text:
+{text}"""
 
         messages = [Message(role="user", content=prompt)]
 
-        response = await self.llm_service.generate(
-            messages=messages, temperature=0.2, max_tokens=1500
-        )
-
         try:
-            # Extract JSON from response
-            json_start = response.find("[")
-            json_end = response.rfind("]") + 1
-            json_str = response[json_start:json_end]
-            tasks = json.loads(json_str)
-            return tasks
-        except json.JSONDecodeError as e:
+            output = await self.llm_service.generate_structured(
+                messages=messages,
+                schema=TaskExtractionOutput,
+                temperature=0.2,
+                max_tokens=1500,
+                user_id=user_id,
+                priority=priority,
+                system=TASK_EXTRACTION_SYSTEM_PROMPT,
+            )
+        except StructuredOutputError as e:
             logger.error("Failed to parse task extraction", error=str(e))
             return []
+        return [task.model_dump(mode="json") for task in output.tasks]
+
+    async def _extract_tasks_from_notes(
+        self, user_id: str, notes: List[Dict[str, Any]]
+    ) -> List[list]:
+        """Use one LLM call to extract tasks from several short notes"""
+        notes_context = "\n\n".join(
+            f'<note index="{i}">\n{note["content"]}\n</note>' for i, note in enumerate(notes)
+        )
 
-    async def _create_tasks_from_extraction(
-        self, user_id: str, extracted_tasks: list
-    ) -> list:
-        """Create task records from extracted task data"""
-        created_tasks = []
+        prompt = f"""Notes:
+{notes_context}"""
 
-        for task_data in extracted_tasks:
-            task_record = {
-                "user_id": user_id,
-                "title": task_data["title"],
-                "description": task_data.get("description"),
-                "priority": task_data.get("priority", "medium"),
-                "estimated_duration": task_data.get("estimated_duration"),
-                "status": "pending",
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
-            }
+        messages = [Message(role="user", content=prompt)]
 
-            response = supabase_client.table("tasks").insert(task_record).execute()
-            created_tasks.append(response.data[0])
+        try:
+            output = await self.llm_service.generate_structured(
+                messages=messages,
+                schema=BatchTaskExtractionOutput,
+                temperature=0.2,
+                max_tokens=1500 + 500 * len(notes),
+                user_id=user_id,
+                priority=RequestPriority.BACKGROUND,
+                system=BATCH_TASK_EXTRACTION_SYSTEM_PROMPT,
+            )
+            by_index = {note.index: note.tasks for note in output.notes}
+            return [
+                [task.model_dump(mode="json") for task in by_index.get(i, [])]
+                for i in range(len(notes))
+            ]
+        except StructuredOutputError as e:
+            logger.error("Failed to parse batched task extraction", error=str(e))
+            # Fall back to one extraction per note
+            return list(
+                await asyncio.gather(
+                    *(
+                        self._extract_tasks_from_text(
+                            user_id, note["content"], RequestPriority.BACKGROUND
+                        )
+                        for note in notes
+                    )
+                )
+            )
 
-        return created_tasks
+    async def _create_tasks_from_extraction(
+        self, user_id: str, extracted_tasks: list
+    ) -> Tuple[list, list]:
+        """
+        Create task records from extracted task data, skipping near-duplicates
+
+        Returns one entry per extracted task (its created row, or None when
+        it was merged into a similar open task) and the dedup report. In
+        "merge" mode a duplicate is not inserted and only raises the priority
+        of the task it matched; in "flag" mode it is inserted and reported.
+        """
+        if not extracted_tasks:
+            return [], []
+
+        mode = settings.TASK_DEDUP_MODE
+        records = [
+            self._task_record(user_id, task_data) for task_data in extracted_tasks
+        ]
+        if mode in ("merge", "flag"):
+            matches = task_similarity_index.match(
+                user_id, records, index_matched=mode == "flag"
+            )
+        else:
+            matches = [None] * len(records)
+
+        raised: Dict[str, str] = {}
+        if mode == "merge":
+            for record, match in zip(records, matches):
+                if match is None:
+                    continue
+                if "candidate" in match:
+                    target = records[match["candidate"]]
+                    if _outranks(record["priority"], target["priority"]):
+                        target["priority"] = record["priority"]
+                elif _outranks(
+                    record["priority"], raised.get(match["task_id"], match["priority"])
+                ):
+                    raised[match["task_id"]] = record["priority"]
+
+        keep = [mode != "merge" or match is None for match in matches]
+        to_insert = [record for record, kept in zip(records, keep) if kept]
+        inserted = (
+            supabase_client.table("tasks").insert(to_insert).execute().data
+            if to_insert
+            else []
+        )
+        for row in inserted:
+            task_similarity_index.record(user_id, row)
+        created = {row["id"]: row for row in inserted}
+        rows = [
+            created[record["id"]] if kept else None
+            for record, kept in zip(records, keep)
+        ]
+
+        for task_id, priority in raised.items():
+            response = (
+                supabase_client.table("tasks")
+                .update(
+                    {"priority": priority, "updated_at": datetime.utcnow().isoformat()}
+                )
+                .eq("id", task_id)
+                .eq("user_id", user_id)
+                .execute()
+            )
+            for row in response.data:
+                task_similarity_index.record(user_id, row)
+                await schedule_cache.invalidate_task(
+                    user_id, task_id, scheduled_days(row)
+                )
+                await audit_log.record(
+                    "update", "task", user_id, task_id, {"priority": priority}
+                )
 
-    async def _save_upload_file(self, upload_file: UploadFile) -> str:
-        """Save uploaded file to storage"""
-        try:
-            # Generate unique filename
-            file_extension = os.path.splitext(upload_file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
-
-            # Save file
-            async with aiofiles.open(file_path, "wb") as f:
-                content = await upload_file.read()
-                await f.write(content)
-
-            logger.info("File saved", path=file_path)
-            return file_path
-        except Exception as e:
-            logger.error("Failed to save upload file", error=str(e))
-            raise
+        duplicates = [
+            {
+                "extracted_index": position,
+                "title": record["title"],
+                "duplicate_of": match.get("task_id") or rows[match["candidate"]]["id"],
+                "duplicate_of_title": match["title"],
+                "similarity": match["similarity"],
+                "action": "merged" if mode == "merge" else "flagged",
+            }
+            for position, (record, match) in enumerate(zip(records, matches))
+            if match is not None
+        ]
+        if duplicates:
+            logger.info(
+                "Near-duplicate tasks found",
+                user_id=user_id,
+                duplicate_count=len(duplicates),
+                mode=mode,
+            )
+        return rows, duplicates
+
+    def _task_record(self, user_id: str, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a task row from one extracted task"""
+        return {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "title": task_data["title"],
+            "description": task_data.get("description"),
+            "priority": task_data.get("priority", "medium"),
+            "estimated_duration": task_data.get("estimated_duration"),
+            "status": "pending",
+            "created_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+
+    async def _save_thumbnail(self, file_path: str, thumbnail: bytes) -> str:
+        """Save a JPEG thumbnail next to its source upload"""
+        thumbnail_path = f"{os.path.splitext(file_path)[0]}_thumb.jpg"
+        async with aiofiles.open(thumbnail_path, "wb") as f:
+            await f.write(thumbnail)
+        return thumbnail_path
 
     async def get_job_status(self, job_id: str) -> Dict[str, Any]:
         """Get status of an ingestion job"""
         # Placeholder for async job tracking
         return {"job_id": job_id, "status": "completed"}
+
+
+def _outranks(priority: str, other: str) -> bool:
+    return PRIORITY_RANK.get(priority, 1) > PRIORITY_RANK.get(other, 1)
@@ -0,0 +1,369 @@
+"""
+Per-User Interval Index for Task Time Slots
+"""
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import date, datetime, timezone, tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from app.core.config import settings
+from app.core.supabase import fetch_all, supabase_client
+import heapq
+import random
+import structlog
+
+logger = structlog.get_logger()
+
+ACTIVE_STATUSES = ["pending", "in_progress"]
+
+
+class _Node:
+    __slots__ = ("start", "end", "key", "priority", "max_end", "left", "right")
+
+    def __init__(self, start: datetime, end: datetime, key: Hashable):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.priority = random.random()
+        self.max_end = end
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+
+    def update(self):
+        self.max_end = self.end
+        if self.left and self.left.max_end > self.max_end:
+            self.max_end = self.left.max_end
+        if self.right and self.right.max_end > self.max_end:
+            self.max_end = self.right.max_end
+
+
+class IntervalTree:
+    """
+    Augmented treap of half-open [start, end) intervals.
+
+    Nodes are ordered by (start, key) and carry the maximum end of their
+    subtree, so inserts and removals are O(log n) and an overlap query is
+    O(log n + k) for k matches.
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self._spans: Dict[Hashable, Tuple[datetime, datetime]] = {}
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._spans
+
+    def insert(self, key: Hashable, start: datetime, end: datetime):
+        """Insert or replace the interval stored under key"""
+        if end <= start:
+            raise ValueError("Interval end must be after its start")
+        if key in self._spans:
+            self.remove(key)
+        self._spans[key] = (start, end)
+        self._root = self._insert(self._root, _Node(start, end, key))
+
+    def remove(self, key: Hashable) -> bool:
+        """Remove the interval stored under key, if any"""
+        span = self._spans.pop(key, None)
+        if span is None:
+            return False
+        self._root = self._remove(self._root, (span[0], _sort_key(key)))
+        return True
+
+    def overlapping(
+        self, start: datetime, end: datetime
+    ) -> List[Tuple[Hashable, datetime, datetime]]:
+        """Return every stored interval that overlaps [start, end)"""
+        found: List[Tuple[Hashable, datetime, datetime]] = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            if node.max_end <= start:
+                continue
+            if node.left:
+                stack.append(node.left)
+            if node.start < end:
+                if node.end > start:
+                    found.append((node.key, node.start, node.end))
+                if node.right:
+                    stack.append(node.right)
+        return found
+
+    def _insert(self, node: Optional[_Node], new: _Node) -> _Node:
+        if node is None:
+            return new
+        if (new.start, _sort_key(new.key)) < (node.start, _sort_key(node.key)):
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                node = self._rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                node = self._rotate_left(node)
+        node.update()
+        return node
+
+    def _remove(self, node: Optional[_Node], target: Tuple) -> Optional[_Node]:
+        if node is None:
+            return None
+        current = (node.start, _sort_key(node.key))
+        if target < current:
+            node.left = self._remove(node.left, target)
+        elif target > current:
+            node.right = self._remove(node.right, target)
+        else:
+            if node.left is None:
+                return node.right
+            if node.right is None:
+                return node.left
+            if node.left.priority > node.right.priority:
+                node = self._rotate_right(node)
+                node.right = self._remove(node.right, target)
+            else:
+                node = self._rotate_left(node)
+                node.left = self._remove(node.left, target)
+        node.update()
+        return node
+
+    @staticmethod
+    def _rotate_right(node: _Node) -> _Node:
+        pivot = node.left
+        node.left = pivot.right
+        pivot.right = node
+        node.update()
+        pivot.update()
+        return pivot
+
+    @staticmethod
+    def _rotate_left(node: _Node) -> _Node:
+        pivot = node.right
+        node.right = pivot.left
+        pivot.left = node
+        node.update()
+        pivot.update()
+        return pivot
+
+
+def _sort_key(key: Hashable) -> str:
+    return str(key)
+
+
+def to_utc(value: Any) -> Optional[datetime]:
+    """Parse an ISO string or datetime into an aware UTC datetime"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def user_zone(name: Optional[str]) -> tzinfo:
+    """The zone a user's HH:MM times are in, UTC if unset or unknown"""
+    try:
+        return ZoneInfo(name) if name else timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Unknown timezone, using UTC", timezone=name)
+        return timezone.utc
+
+
+def load_user_zone(user_id: str) -> tzinfo:
+    """The zone in the user's preferences"""
+    preferences = (
+        supabase_client.table("user_preferences")
+        .select("timezone")
+        .eq("user_id", user_id)
+        .execute()
+    ).data
+    return user_zone(preferences[0].get("timezone") if preferences else None)
+
+
+def overlapping_pairs(
+    intervals: Iterable[Tuple[Hashable, datetime, datetime]]
+) -> List[Dict[str, Any]]:
+    """Sweep intervals by start time and return every overlapping pair"""
+    conflicts = []
+    active: List[Tuple[datetime, str, Hashable]] = []
+    for key, start, end in sorted(intervals, key=lambda i: (i[1], _sort_key(i[0]))):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for other_end, _, other_key in active:
+            conflicts.append(
+                {
+                    "task_id": other_key,
+                    "conflicting_task_id": key,
+                    "overlap_start": start,
+                    "overlap_end": min(end, other_end),
+                }
+            )
+        heapq.heappush(active, (end, _sort_key(key), key))
+    return conflicts
+
+
+class ScheduleConflictIndex:
+    """
+    Lazily loaded per-user interval trees over scheduled task slots
+
+    At most max_users trees are kept; the least recently used is dropped
+    and reloaded when its user comes back.
+    """
+
+    def __init__(self, max_users: int = settings.USER_INDEX_MAX_USERS):
+        self.max_users = max_users
+        self._trees: "OrderedDict[str, IntervalTree]" = OrderedDict()
+
+    def _tree(self, user_id: str) -> IntervalTree:
+        tree = self._trees.get(user_id)
+        if tree is not None:
+            self._trees.move_to_end(user_id)
+        else:
+            tree = IntervalTree()
+            tasks = fetch_all(
+                lambda: supabase_client.table("tasks")
+                .select("id, scheduled_start, scheduled_end, status")
+                .eq("user_id", user_id)
+                .in_("status", ACTIVE_STATUSES)
+                .not_.is_("scheduled_start", "null")
+                .not_.is_("scheduled_end", "null")
+                .order("id")
+            )
+            for task in tasks:
+                self._add(tree, task)
+            self._trees[user_id] = tree
+            while len(self._trees) > self.max_users:
+                self._trees.popitem(last=False)
+            logger.info("Interval index loaded", user_id=user_id, size=len(tree))
+        return tree
+
+    @staticmethod
+    def _add(tree: IntervalTree, task: Dict[str, Any]):
+        start = to_utc(task.get("scheduled_start"))
+        end = to_utc(task.get("scheduled_end"))
+        if (
+            start is None
+            or end is None
+            or end <= start
+            or task.get("status", "pending") not in ACTIVE_STATUSES
+        ):
+            tree.remove(task["id"])
+            return
+        tree.insert(task["id"], start, end)
+
+    def find_conflicts(
+        self,
+        user_id: str,
+        start: Any,
+        end: Any,
+        exclude: Iterable[str] = (),
+    ) -> List[Dict[str, Any]]:
+        """Return stored slots overlapping [start, end)"""
+        start, end = to_utc(start), to_utc(end)
+        if start is None or end is None or end <= start:
+            return []
+        skip = set(exclude)
+        return [
+            {"task_id": key, "scheduled_start": s, "scheduled_end": e}
+            for key, s, e in self._tree(user_id).overlapping(start, end)
+            if key not in skip
+        ]
+
+    def record(self, user_id: str, task: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Index a written task row and report the slots it now overlaps"""
+        tree = self._tree(user_id)
+        self._add(tree, task)
+        if task["id"] not in tree:
+            return []
+        start, end = to_utc(task["scheduled_start"]), to_utc(task["scheduled_end"])
+        return [
+            {
+                "task_id": task["id"],
+                "conflicting_task_id": key,
+                "overlap_start": max(start, s),
+                "overlap_end": min(end, e),
+            }
+            for key, s, e in tree.overlapping(start, end)
+            if key != task["id"]
+        ]
+
+    def remove(self, user_id: str, task_id: str):
+        """Drop a task from the user's index if it is loaded"""
+        tree = self._trees.get(user_id)
+        if tree is not None:
+            tree.remove(task_id)
+
+    def refresh(self, user_id: str, task: Dict[str, Any]):
+        """Apply a task row written elsewhere if the user's index is loaded"""
+        tree = self._trees.get(user_id)
+        if tree is not None:
+            self._add(tree, task)
+
+    def evict(self, user_id: str):
+        """Forget a user's index so it is reloaded on next use"""
+        self._trees.pop(user_id, None)
+
+    def clear(self):
+        """Forget every user's index"""
+        self._trees.clear()
+
+    def conflicts_in_range(
+        self, user_id: str, range_start: Any, range_end: Any
+    ) -> List[Dict[str, Any]]:
+        """Return all overlapping pairs among slots touching a time range"""
+        range_start, range_end = to_utc(range_start), to_utc(range_end)
+        if range_start is None or range_end is None or range_end <= range_start:
+            return []
+        return overlapping_pairs(
+            self._tree(user_id).overlapping(range_start, range_end)
+        )
+
+    def slot_conflicts(
+        self,
+        user_id: str,
+        schedule_date: Any,
+        slots: List[Dict[str, Any]],
+        zone: tzinfo = timezone.utc,
+    ) -> List[Dict[str, Any]]:
+        """
+        Check HH:MM schedule slots against each other and indexed tasks
+
+        Slot times are wall-clock times in the user's zone on schedule_date.
+        """
+        if isinstance(schedule_date, str):
+            schedule_date = date.fromisoformat(schedule_date)
+
+        intervals = []
+        for slot in slots:
+            try:
+                start = _slot_time(schedule_date, slot["start_time"], zone)
+                end = _slot_time(schedule_date, slot["end_time"], zone)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if end > start:
+                intervals.append((slot.get("task_id"), start, end))
+
+        conflicts = overlapping_pairs(intervals)
+        slot_ids = {key for key, _, _ in intervals}
+        for key, start, end in intervals:
+            for other in self.find_conflicts(user_id, start, end, exclude=slot_ids):
+                conflicts.append(
+                    {
+                        "task_id": key,
+                        "conflicting_task_id": other["task_id"],
+                        "overlap_start": max(start, other["scheduled_start"]),
+                        "overlap_end": min(end, other["scheduled_end"]),
+                    }
+                )
+        return conflicts
+
+
+def _slot_time(schedule_date: date, value: str, zone: tzinfo) -> datetime:
+    parsed = datetime.strptime(str(value)[:5], "%H:%M").time()
+    local = datetime.combine(schedule_date, parsed, tzinfo=zone)
+    return local.astimezone(timezone.utc)
+
+
+# Global index instance
+schedule_conflict_index = ScheduleConflictIndex()
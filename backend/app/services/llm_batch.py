@@ -0,0 +1,258 @@
+"""
+Batch LLM Submission
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from app.core.config import settings
+from app.services.llm_gateway import RequestPriority
+from app.services.llm_provider import (
+    AnthropicProvider,
+    LLMProvider,
+    LLMService,
+    Message,
+    OpenAIProvider,
+    record_token_usage,
+    provider_registry,
+)
+import asyncio
+import json
+import time
+import uuid
+import structlog
+
+logger = structlog.get_logger()
+
+# OpenAI batch states that are still running
+OPENAI_PENDING_STATUSES = {"validating", "in_progress", "finalizing", "cancelling"}
+
+
+class BatchRequest:
+    def __init__(
+        self,
+        custom_id: str,
+        messages: List[Message],
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        schema: Optional[Type[BaseModel]] = None,
+    ):
+        self.custom_id = custom_id  # [a-zA-Z0-9_-]{1,64}
+        self.messages = messages
+        self.system = system
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.schema = schema  # structured output; results are then JSON text
+
+
+class BaseBatchBackend(ABC):
+    """Submits many LLM requests as one asynchronous, discounted batch"""
+
+    poll_interval: float = settings.LLM_BATCH_POLL_SECONDS
+
+    @abstractmethod
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        """Submit requests and return the batch id"""
+        pass
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Text per custom_id (None for failed requests), or None while running
+
+        Structured requests yield their JSON as text, still to be validated.
+        """
+        pass
+
+    async def run(
+        self, requests: List[BatchRequest], timeout: float
+    ) -> Tuple[str, Dict[str, Optional[str]]]:
+        """Submit a batch and wait for its results"""
+        batch_id = await self.submit(requests)
+        logger.info("LLM batch submitted", batch_id=batch_id, requests=len(requests))
+
+        deadline = time.monotonic() + timeout
+        while True:
+            results = await self.results(batch_id)
+            if results is not None:
+                return batch_id, results
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"LLM batch {batch_id} did not finish in {timeout}s")
+            await asyncio.sleep(self.poll_interval)
+
+
+class AnthropicBatchBackend(BaseBatchBackend):
+    """Anthropic Message Batches API"""
+
+    def __init__(self, provider: AnthropicProvider):
+        self.provider = provider
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        batch = await self.provider.client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": request.custom_id,
+                    "params": self.provider.request_params(
+                        request.messages,
+                        request.max_tokens,
+                        request.temperature,
+                        request.system,
+                        schema=request.schema,
+                    ),
+                }
+                for request in requests
+            ]
+        )
+        return batch.id
+
+    async def results(self, batch_id: str) -> Optional[Dict[str, Optional[str]]]:
+        batch = await self.provider.client.messages.batches.retrieve(batch_id)
+        if batch.processing_status != "ended":
+            return None
+
+        results: Dict[str, Optional[str]] = {}
+        async for entry in await self.provider.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                self.provider.record_usage(message.usage)
+                tool_inputs = [block.input for block in message.content if block.type == "tool_use"]
+                results[entry.custom_id] = (
+                    json.dumps(tool_inputs[0]) if tool_inputs else message.content[0].text
+                )
+            else:
+                logger.warning(
+                    "LLM batch request failed", custom_id=entry.custom_id, result=entry.result.type
+                )
+                results[entry.custom_id] = None
+        return results
+
+
+class OpenAIBatchBackend(BaseBatchBackend):
+    """OpenAI Batch API over Chat Completions"""
+
+    def __init__(self, provider: OpenAIProvider):
+        self.provider = provider
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self.provider.request_params(
+                        request.messages,
+                        request.max_tokens,
+                        request.temperature,
+                        request.system,
+                        schema=request.schema,
+                    ),
+                }
+            )
+            for request in requests
+        ]
+        upload = await self.provider.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch"
+        )
+        batch = await self.provider.client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def results(self, batch_id: str) -> Optional[Dict[str, Optional[str]]]:
+        batch = await self.provider.client.batches.retrieve(batch_id)
+        if batch.status in OPENAI_PENDING_STATUSES:
+            return None
+
+        results: Dict[str, Optional[str]] = {}
+        if batch.output_file_id:
+            content = await self.provider.client.files.content(batch.output_file_id)
+            for line in content.text.splitlines():
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") != 200:
+                    results[entry["custom_id"]] = None
+                    continue
+                body = response["body"]
+                usage = body.get("usage") or {}
+                record_token_usage(
+                    "openai",
+                    usage.get("prompt_tokens", 0),
+                    usage.get("completion_tokens", 0),
+                    (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+                )
+                results[entry["custom_id"]] = body["choices"][0]["message"]["content"]
+        if batch.status != "completed":
+            logger.warning("LLM batch did not complete", batch_id=batch_id, status=batch.status)
+        return results
+
+
+class LocalBatchBackend(BaseBatchBackend):
+    """
+    Runs a batch as concurrent background calls through LLMService
+
+    Used in tests, with providers that have no batch API, and when
+    LLM_BATCH_BACKEND=local.
+    """
+
+    poll_interval = 0
+
+    def __init__(self, llm_service: LLMService, concurrency: int = 4):
+        self.llm_service = llm_service
+        self.concurrency = concurrency
+        self._completed: Dict[str, Dict[str, Optional[str]]] = {}
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def complete(request: BatchRequest) -> Optional[str]:
+            async with semaphore:
+                try:
+                    if request.schema is not None:
+                        output = await self.llm_service.generate_structured(
+                            messages=request.messages,
+                            schema=request.schema,
+                            max_tokens=request.max_tokens,
+                            temperature=request.temperature,
+                            priority=RequestPriority.BACKGROUND,
+                            system=request.system,
+                        )
+                        return output.model_dump_json()
+                    return await self.llm_service.generate(
+                        messages=request.messages,
+                        max_tokens=request.max_tokens,
+                        temperature=request.temperature,
+                        priority=RequestPriority.BACKGROUND,
+                        system=request.system,
+                    )
+                except Exception as e:
+                    logger.warning(
+                        "LLM batch request failed", custom_id=request.custom_id, error=str(e)
+                    )
+                    return None
+
+        texts = await asyncio.gather(*(complete(request) for request in requests))
+        batch_id = f"local-{uuid.uuid4().hex}"
+        self._completed[batch_id] = {
+            request.custom_id: text for request, text in zip(requests, texts)
+        }
+        return batch_id
+
+    async def results(self, batch_id: str) -> Optional[Dict[str, Optional[str]]]:
+        return self._completed.pop(batch_id)
+
+
+def get_batch_backend(name: Optional[str] = None) -> BaseBatchBackend:
+    """Batch backend for the default provider, or the local one"""
+    name = name or settings.LLM_BATCH_BACKEND
+    if name == "local":
+        return LocalBatchBackend(LLMService())
+
+    provider = provider_registry.get(LLMProvider(settings.DEFAULT_LLM_PROVIDER))
+    if isinstance(provider, AnthropicProvider):
+        return AnthropicBatchBackend(provider)
+    if isinstance(provider, OpenAIProvider):
+        return OpenAIBatchBackend(provider)
+    return LocalBatchBackend(LLMService())
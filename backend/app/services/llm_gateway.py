@@ -0,0 +1,261 @@
+"""
+LLM Gateway: Admission Control and Weighted Fair Queuing
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from enum import Enum
+from app.core.config import settings
+from app.core.metrics import metrics
+import asyncio
+import heapq
+import itertools
+import time
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Idle user buckets are pruned once this many are tracked
+MAX_TRACKED_USERS = 10000
+
+
+class RequestPriority(str, Enum):
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+
+
+class LLMGatewayError(Exception):
+    """Raised when the gateway sheds a request instead of queuing it"""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Consume a token, possibly going into debt for a reserved future token"""
+        self._refill()
+        self.tokens -= 1
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class _Waiter:
+    __slots__ = ("provider", "future", "cancelled")
+
+    def __init__(self, provider: str, future: asyncio.Future):
+        self.provider = provider
+        self.future = future
+        self.cancelled = False
+
+
+class LLMGateway:
+    """
+    Admission control in front of every LLM call
+
+    Calls hold a slot under both a global and a per-provider concurrency
+    limit. When no slot is free, callers wait in a weighted fair queue
+    (virtual finish-time tags per priority class) so interactive requests
+    overtake background jobs without starving them. Each user is rate
+    limited by a token bucket. Work that would wait too long is rejected
+    immediately with a Retry-After hint instead of hanging.
+    """
+
+    def __init__(
+        self,
+        global_limit: int,
+        provider_limits: Dict[str, int],
+        user_rate_per_minute: float,
+        user_burst: int,
+        max_queue: int,
+        queue_timeout: float,
+        weights: Dict[RequestPriority, float],
+    ):
+        self.global_limit = global_limit
+        self.provider_limits = provider_limits
+        self.user_rate = user_rate_per_minute / 60
+        self.user_burst = user_burst
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.weights = weights
+
+        self._active = 0
+        self._active_by_provider: Dict[str, int] = {}
+        self._queue: List = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[RequestPriority, float] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._service_time = 2.0  # EMA of call duration in seconds
+
+    async def run(
+        self,
+        provider: str,
+        call: Callable[[], Awaitable[T]],
+        user_id: Optional[str] = None,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+    ) -> T:
+        """Run an LLM call once the user's rate limit and a free slot allow it"""
+        await self._check_rate_limit(user_id, priority)
+        await self._acquire(provider, priority)
+
+        started = time.monotonic()
+        try:
+            return await call()
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_time = 0.9 * self._service_time + 0.1 * elapsed
+            self._release(provider)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current load"""
+        return {
+            "active": self._active,
+            "active_by_provider": dict(self._active_by_provider),
+            "queued": self._queued,
+            "service_time_seconds": round(self._service_time, 3),
+        }
+
+    async def _check_rate_limit(self, user_id: Optional[str], priority: RequestPriority):
+        if not user_id:
+            return
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_USERS:
+                self._prune_buckets()
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+
+        wait = bucket.wait_time()
+        # Interactive callers are told to retry; background work is paced
+        if wait > 0 and (priority == RequestPriority.INTERACTIVE or wait > self.queue_timeout):
+            metrics.increment("llm_gateway.rate_limited")
+            logger.warning("LLM request rate limited", user_id=user_id, retry_after=wait)
+            raise LLMGatewayError("LLM rate limit exceeded", 429, wait)
+
+        bucket.take()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _prune_buckets(self):
+        for user_id in [u for u, bucket in self._buckets.items() if bucket.idle]:
+            del self._buckets[user_id]
+
+    def _has_capacity(self, provider: str) -> bool:
+        return self._active < self.global_limit and self._active_by_provider.get(
+            provider, 0
+        ) < self.provider_limits.get(provider, self.global_limit)
+
+    def _grant(self, provider: str):
+        self._active += 1
+        self._active_by_provider[provider] = self._active_by_provider.get(provider, 0) + 1
+
+    async def _acquire(self, provider: str, priority: RequestPriority):
+        if not self._queued and self._has_capacity(provider):
+            self._grant(provider)
+            metrics.increment("llm_gateway.admitted")
+            return
+
+        if self._queued >= self.max_queue:
+            retry_after = self._estimated_wait()
+            metrics.increment("llm_gateway.shed")
+            logger.warning("LLM gateway queue full", queued=self._queued)
+            raise LLMGatewayError("LLM capacity exhausted", 503, retry_after)
+
+        # Weighted fair queuing: finish tag advances by 1/weight per request
+        start = max(self._virtual_time, self._last_finish.get(priority, 0.0))
+        finish = start + 1.0 / self.weights.get(priority, 1.0)
+        self._last_finish[priority] = finish
+
+        waiter = _Waiter(provider, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (finish, next(self._sequence), waiter))
+        self._queued += 1
+        metrics.increment("llm_gateway.queued")
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted as we gave up; hand it back
+                self._release(provider)
+            else:
+                waiter.cancelled = True
+                self._queued -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            metrics.increment("llm_gateway.timed_out")
+            raise LLMGatewayError("LLM queue wait timed out", 503, self._estimated_wait())
+
+        metrics.increment("llm_gateway.admitted")
+
+    def _release(self, provider: str):
+        self._active -= 1
+        self._active_by_provider[provider] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the waiters with the smallest finish tags"""
+        skipped = []
+        while self._queue and self._active < self.global_limit:
+            entry = heapq.heappop(self._queue)
+            finish, _, waiter = entry
+            if waiter.cancelled:
+                continue
+            if not self._has_capacity(waiter.provider):
+                # Provider saturated: let other providers' waiters through
+                skipped.append(entry)
+                continue
+            self._virtual_time = max(self._virtual_time, finish)
+            self._queued -= 1
+            self._grant(waiter.provider)
+            waiter.future.set_result(None)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    def _estimated_wait(self) -> float:
+        return max(1.0, self._service_time * (self._queued + 1) / self.global_limit)
+
+
+# Global gateway instance
+llm_gateway = LLMGateway(
+    global_limit=settings.LLM_MAX_CONCURRENCY,
+    provider_limits={
+        "anthropic": settings.ANTHROPIC_MAX_CONCURRENCY,
+        "openai": settings.OPENAI_MAX_CONCURRENCY,
+    },
+    user_rate_per_minute=settings.LLM_USER_RATE_PER_MINUTE,
+    user_burst=settings.LLM_USER_BURST,
+    max_queue=settings.LLM_MAX_QUEUE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+    weights={
+        RequestPriority.INTERACTIVE: settings.LLM_INTERACTIVE_WEIGHT,
+        RequestPriority.BACKGROUND: settings.LLM_BACKGROUND_WEIGHT,
+    },
+)
@@ -2,15 +2,22 @@
 LLM Provider Abstraction Layer
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Type, TypeVar
 from enum import Enum
-import anthropic
-import openai
+from pydantic import BaseModel, ValidationError
+import base64
+import json
+import threading
+import httpx
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.llm_gateway import RequestPriority, llm_gateway
 import structlog
 
 logger = structlog.get_logger()
 
+M = TypeVar("M", bound=BaseModel)
+
 
 class LLMProvider(str, Enum):
     ANTHROPIC = "anthropic"
@@ -18,9 +25,135 @@ class LLMProvider(str, Enum):
 
 
 class Message:
-    def __init__(self, role: str, content: str):
+    def __init__(self, role: str, content: str, images: Optional[List[bytes]] = None):
         self.role = role
         self.content = content
+        self.images = images or []  # PNG-encoded
+
+
+def _image_base64(image: bytes) -> str:
+    return base64.b64encode(image).decode("ascii")
+
+
+class StructuredOutputError(Exception):
+    """Raised when an LLM response does not match the requested schema"""
+
+
+def parse_json_object(text: str) -> Any:
+    """Parse the JSON object in a text response, ignoring surrounding prose"""
+    try:
+        return json.loads(text[text.find("{") : text.rfind("}") + 1])
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Response is not valid JSON: {e}") from e
+
+
+def _schema_description(schema: Type[BaseModel]) -> str:
+    return (schema.__doc__ or schema.__name__).strip()
+
+
+def _with_schema_instruction(system: Optional[str], schema: Type[BaseModel]) -> str:
+    """Append an instruction to answer with JSON matching schema"""
+    instruction = (
+        "Respond with ONLY a JSON object matching this JSON schema:\n"
+        + json.dumps(schema.model_json_schema())
+    )
+    return f"{system}\n\n{instruction}" if system else instruction
+
+
+# Keywords OpenAI's strict mode rejects. Pydantic still enforces them when
+# the response is validated.
+_UNSUPPORTED_STRICT_KEYWORDS = (
+    "default",
+    "pattern",
+    "format",
+    "minLength",
+    "maxLength",
+    "minimum",
+    "maximum",
+    "exclusiveMinimum",
+    "exclusiveMaximum",
+    "multipleOf",
+    "minItems",
+    "maxItems",
+)
+
+
+def _allows_null(schema: Dict[str, Any]) -> bool:
+    types = schema.get("type")
+    return (
+        types == "null"
+        or (isinstance(types, list) and "null" in types)
+        or any(_allows_null(option) for option in schema.get("anyOf", ()))
+    )
+
+
+def _strict_schema(schema: Any) -> Any:
+    """
+    A JSON schema reshaped for OpenAI strict mode
+
+    Every object lists all its properties as required and allows no others;
+    properties that were optional accept null instead.
+    """
+    if isinstance(schema, list):
+        return [_strict_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict: Dict[str, Any] = {}
+    for key, value in schema.items():
+        if key in ("properties", "$defs"):
+            # Maps of names to schemas: the names are not keywords
+            strict[key] = {name: _strict_schema(sub) for name, sub in value.items()}
+        elif key not in _UNSUPPORTED_STRICT_KEYWORDS:
+            strict[key] = _strict_schema(value)
+    properties = strict.get("properties")
+    if properties is not None:
+        required = set(schema.get("required", ()))
+        for name, prop in properties.items():
+            if name in required or _allows_null(prop):
+                continue
+            if isinstance(prop.get("type"), str):
+                prop["type"] = [prop["type"], "null"]
+            else:
+                properties[name] = {"anyOf": [prop, {"type": "null"}]}
+        strict["required"] = list(properties)
+        strict["additionalProperties"] = False
+    return strict
+
+
+def strict_json_schema(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """A model's JSON schema in the form OpenAI strict mode accepts"""
+    return _strict_schema(schema.model_json_schema())
+
+
+def _openai_supports_json_schema(model: str) -> bool:
+    """Whether a model accepts response_format json_schema (Structured Outputs)"""
+    return not (
+        model in ("gpt-4", "gpt-4o-2024-05-13")
+        or model.startswith(("gpt-3.5", "gpt-4-"))
+    )
+
+
+def record_token_usage(
+    provider: str,
+    input_tokens: int,
+    output_tokens: int,
+    cached_tokens: int = 0,
+    cache_write_tokens: int = 0,
+):
+    """Count prompt tokens, and how many were served from the prompt cache"""
+    metrics.increment(f"llm.{provider}.input_tokens", input_tokens)
+    metrics.increment(f"llm.{provider}.output_tokens", output_tokens)
+    metrics.increment(f"llm.{provider}.cached_input_tokens", cached_tokens)
+    metrics.increment(f"llm.{provider}.cache_write_tokens", cache_write_tokens)
+    # Field names avoid "token", which the log redactor masks
+    logger.debug(
+        "LLM usage",
+        provider=provider,
+        prompt=input_tokens,
+        cached=cached_tokens,
+        cache_write=cache_write_tokens,
+        completion=output_tokens,
+    )
 
 
 class BaseLLMProvider(ABC):
@@ -32,115 +165,487 @@ class BaseLLMProvider(ABC):
         messages: List[Message],
         max_tokens: int = 1024,
         temperature: float = 0.7,
+        system: Optional[str] = None,
         **kwargs,
     ) -> str:
-        """Generate text completion"""
+        """
+        Generate text completion
+
+        system carries static instructions; keeping them identical across
+        calls lets providers serve them from their prompt cache.
+        """
+        pass
+
+    async def generate_structured(
+        self,
+        messages: List[Message],
+        schema: Type[BaseModel],
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        system: Optional[str] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Generate JSON constrained to a Pydantic model's schema
+
+        Returns the parsed, not yet validated, JSON. Providers without a
+        native structured mode get the schema as an instruction.
+        """
+        system = _with_schema_instruction(system, schema)
+        text = await self.generate(messages, max_tokens, temperature, system=system, **kwargs)
+        return parse_json_object(text)
+
+    async def aclose(self):
+        """Release the provider's HTTP connections"""
         pass
 
 
 class AnthropicProvider(BaseLLMProvider):
     """Anthropic Claude provider"""
 
-    def __init__(self, api_key: str):
-        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+    def __init__(self, api_key: str, http_client: Optional[httpx.AsyncClient] = None):
+        # SDKs are imported on first use to keep cold starts fast
+        import anthropic
+
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
 
     async def generate(
         self,
         messages: List[Message],
         max_tokens: int = 1024,
         temperature: float = 0.7,
+        system: Optional[str] = None,
         model: str = "claude-3-5-sonnet-20241022",
         **kwargs,
     ) -> str:
         try:
-            # Convert messages to Anthropic format
-            formatted_messages = [
-                {"role": msg.role, "content": msg.content} for msg in messages
-            ]
-
             response = await self.client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                messages=formatted_messages,
+                **self.request_params(messages, max_tokens, temperature, system, model),
                 **kwargs,
             )
-
+            self.record_usage(response.usage)
             return response.content[0].text
         except Exception as e:
             logger.error("Anthropic API error", error=str(e))
             raise
 
+    async def generate_structured(
+        self,
+        messages: List[Message],
+        schema: Type[BaseModel],
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        system: Optional[str] = None,
+        model: str = "claude-3-5-sonnet-20241022",
+        **kwargs,
+    ) -> Any:
+        try:
+            response = await self.client.messages.create(
+                **self.request_params(messages, max_tokens, temperature, system, model, schema),
+                **kwargs,
+            )
+            self.record_usage(response.usage)
+        except Exception as e:
+            logger.error("Anthropic API error", error=str(e))
+            raise
+        return self.structured_result(response)
+
+    def request_params(
+        self,
+        messages: List[Message],
+        max_tokens: int,
+        temperature: float,
+        system: Optional[str] = None,
+        model: str = "claude-3-5-sonnet-20241022",
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Messages API request body, also used for batch submissions
+
+        With a schema, the model is forced to answer through a single tool
+        whose input schema is the model's JSON schema. Anthropic caches the
+        prefix in tools, system, messages order, so the breakpoint on the
+        system block covers the tool definition as well; without a system
+        prompt it goes on the tool itself.
+        """
+        params: Dict[str, Any] = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            # Convert messages to Anthropic format
+            "messages": [
+                {"role": msg.role, "content": self._format_content(msg)}
+                for msg in messages
+            ],
+        }
+        if system:
+            params["system"] = self._format_system(system)
+        if schema is not None:
+            params["tools"] = [
+                {
+                    "name": schema.__name__,
+                    "description": _schema_description(schema),
+                    "input_schema": schema.model_json_schema(),
+                }
+            ]
+            if not system and settings.LLM_PROMPT_CACHING:
+                params["tools"][-1]["cache_control"] = {"type": "ephemeral"}
+            params["tool_choice"] = {"type": "tool", "name": schema.__name__}
+        return params
+
+    @staticmethod
+    def structured_result(message) -> Any:
+        """The forced tool call's input"""
+        for block in message.content:
+            if block.type == "tool_use":
+                return block.input
+        raise StructuredOutputError("Response has no tool call")
+
+    @staticmethod
+    def record_usage(usage):
+        cached = getattr(usage, "cache_read_input_tokens", None) or 0
+        written = getattr(usage, "cache_creation_input_tokens", None) or 0
+        record_token_usage(
+            "anthropic",
+            usage.input_tokens + cached + written,
+            usage.output_tokens,
+            cached,
+            written,
+        )
+
+    async def aclose(self):
+        await self.client.close()
+
+    @staticmethod
+    def _format_system(system: str) -> List[Dict[str, Any]]:
+        block: Dict[str, Any] = {"type": "text", "text": system}
+        if settings.LLM_PROMPT_CACHING:
+            # Cache breakpoint: everything up to here is reused across calls
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block]
+
+    @staticmethod
+    def _format_content(msg: Message):
+        if not msg.images:
+            return msg.content
+        return [
+            {
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/png",
+                    "data": _image_base64(image),
+                },
+            }
+            for image in msg.images
+        ] + [{"type": "text", "text": msg.content}]
+
 
 class OpenAIProvider(BaseLLMProvider):
     """OpenAI GPT provider"""
 
-    def __init__(self, api_key: str):
-        self.client = openai.AsyncOpenAI(api_key=api_key)
+    def __init__(self, api_key: str, http_client: Optional[httpx.AsyncClient] = None):
+        import openai
+
+        self.client = openai.AsyncOpenAI(api_key=api_key, http_client=http_client)
 
     async def generate(
         self,
         messages: List[Message],
         max_tokens: int = 1024,
         temperature: float = 0.7,
-        model: str = "gpt-4-turbo-preview",
+        system: Optional[str] = None,
+        model: str = "gpt-4o-2024-08-06",
         **kwargs,
     ) -> str:
         try:
-            # Convert messages to OpenAI format
-            formatted_messages = [
-                {"role": msg.role, "content": msg.content} for msg in messages
-            ]
-
             response = await self.client.chat.completions.create(
-                model=model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                messages=formatted_messages,
+                **self.request_params(messages, max_tokens, temperature, system, model),
                 **kwargs,
             )
-
+            self.record_usage(response.usage)
             return response.choices[0].message.content
         except Exception as e:
             logger.error("OpenAI API error", error=str(e))
             raise
 
+    async def generate_structured(
+        self,
+        messages: List[Message],
+        schema: Type[BaseModel],
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        system: Optional[str] = None,
+        model: str = "gpt-4o-2024-08-06",
+        **kwargs,
+    ) -> Any:
+        try:
+            response = await self.client.chat.completions.create(
+                **self.request_params(messages, max_tokens, temperature, system, model, schema),
+                **kwargs,
+            )
+            self.record_usage(response.usage)
+        except Exception as e:
+            logger.error("OpenAI API error", error=str(e))
+            raise
+        return parse_json_object(response.choices[0].message.content or "")
 
-class LLMService:
-    """Main LLM service with provider abstraction"""
-
-    def __init__(
+    def request_params(
         self,
-        provider: LLMProvider = LLMProvider(settings.DEFAULT_LLM_PROVIDER),
-    ):
-        self.provider_type = provider
-        self.provider = self._initialize_provider(provider)
+        messages: List[Message],
+        max_tokens: int,
+        temperature: float,
+        system: Optional[str] = None,
+        model: str = "gpt-4o-2024-08-06",
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Chat Completions request body, also used for batch submissions
 
-    def _initialize_provider(self, provider: LLMProvider) -> BaseLLMProvider:
-        """Initialize the selected LLM provider"""
+        With a schema, decoding is constrained by a strict json_schema
+        response format. Older models without Structured Outputs get JSON
+        mode and the schema as an instruction instead.
+        """
+        legacy_json = schema is not None and not _openai_supports_json_schema(model)
+        if legacy_json:
+            system = _with_schema_instruction(system, schema)
+
+        # Convert messages to OpenAI format; OpenAI caches the longest
+        # repeated prefix automatically, so static instructions go first
+        formatted_messages = [
+            {"role": msg.role, "content": self._format_content(msg)}
+            for msg in messages
+        ]
+        if system:
+            formatted_messages.insert(0, {"role": "system", "content": system})
+        params: Dict[str, Any] = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": formatted_messages,
+        }
+        if legacy_json:
+            params["response_format"] = {"type": "json_object"}
+        elif schema is not None:
+            params["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": schema.__name__,
+                    "description": _schema_description(schema),
+                    "schema": strict_json_schema(schema),
+                    "strict": True,
+                },
+            }
+        return params
+
+    @staticmethod
+    def record_usage(usage):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        record_token_usage(
+            "openai",
+            usage.prompt_tokens,
+            usage.completion_tokens,
+            getattr(details, "cached_tokens", None) or 0,
+        )
+
+    async def aclose(self):
+        await self.client.close()
+
+    @staticmethod
+    def _format_content(msg: Message):
+        if not msg.images:
+            return msg.content
+        return [{"type": "text", "text": msg.content}] + [
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:image/png;base64,{_image_base64(image)}"},
+            }
+            for image in msg.images
+        ]
+
+
+def _http_client(max_connections: int) -> httpx.AsyncClient:
+    """Long-lived keep-alive connection pool for one provider"""
+    return httpx.AsyncClient(
+        http2=settings.LLM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=10.0),
+    )
+
+
+class ProviderRegistry:
+    """
+    Process-wide provider clients
+
+    Each provider is built once with its own pooled HTTP client, sized to
+    the gateway's concurrency limit for that provider, so every LLMService
+    reuses warm connections instead of paying TCP and TLS setup per request.
+    """
+
+    def __init__(self):
+        self._providers: Dict[LLMProvider, BaseLLMProvider] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: LLMProvider) -> BaseLLMProvider:
+        """Return the shared client for a provider, building it on first use"""
+        client = self._providers.get(provider)
+        if client is None:
+            with self._lock:
+                client = self._providers.get(provider)
+                if client is None:
+                    client = self._providers[provider] = self._build(provider)
+                    logger.info("LLM provider client created", provider=provider.value)
+        return client
+
+    @staticmethod
+    def _build(provider: LLMProvider) -> BaseLLMProvider:
         if provider == LLMProvider.ANTHROPIC:
             if not settings.ANTHROPIC_API_KEY:
                 raise ValueError("Anthropic API key not configured")
-            return AnthropicProvider(settings.ANTHROPIC_API_KEY)
+            return AnthropicProvider(
+                settings.ANTHROPIC_API_KEY,
+                _http_client(settings.ANTHROPIC_MAX_CONCURRENCY),
+            )
         elif provider == LLMProvider.OPENAI:
             if not settings.OPENAI_API_KEY:
                 raise ValueError("OpenAI API key not configured")
-            return OpenAIProvider(settings.OPENAI_API_KEY)
+            return OpenAIProvider(
+                settings.OPENAI_API_KEY,
+                _http_client(settings.OPENAI_MAX_CONCURRENCY),
+            )
         else:
             raise ValueError(f"Unsupported LLM provider: {provider}")
 
+    async def aclose(self):
+        """Close every provider's connection pool"""
+        with self._lock:
+            providers, self._providers = self._providers, {}
+        for provider, client in providers.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning("Failed to close LLM provider", provider=provider.value, error=str(e))
+
+
+# Global registry instance
+provider_registry = ProviderRegistry()
+
+
+class LLMService:
+    """Main LLM service with provider abstraction"""
+
+    def __init__(
+        self,
+        provider: LLMProvider = LLMProvider(settings.DEFAULT_LLM_PROVIDER),
+    ):
+        self.provider_type = provider
+        self._provider: Optional[BaseLLMProvider] = None
+
+    @property
+    def provider(self) -> BaseLLMProvider:
+        """The provider client, built on first use"""
+        if self._provider is None:
+            self._provider = self._initialize_provider(self.provider_type)
+        return self._provider
+
+    @provider.setter
+    def provider(self, provider: BaseLLMProvider):
+        self._provider = provider
+
+    def _initialize_provider(self, provider: LLMProvider) -> BaseLLMProvider:
+        """Get the shared client for the selected LLM provider"""
+        return provider_registry.get(provider)
+
     async def generate(
         self,
         messages: List[Message],
         max_tokens: int = 1024,
         temperature: float = 0.7,
+        user_id: Optional[str] = None,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+        system: Optional[str] = None,
         **kwargs,
     ) -> str:
-        """Generate text using the configured provider"""
-        return await self.provider.generate(messages, max_tokens, temperature, **kwargs)
+        """Generate text using the configured provider, through the LLM gateway"""
+        return await llm_gateway.run(
+            self.provider_type.value,
+            lambda: self.provider.generate(
+                messages, max_tokens, temperature, system=system, **kwargs
+            ),
+            user_id=user_id,
+            priority=priority,
+        )
+
+    async def generate_structured(
+        self,
+        messages: List[Message],
+        schema: Type[M],
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        user_id: Optional[str] = None,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+        system: Optional[str] = None,
+        repair_attempts: Optional[int] = None,
+        **kwargs,
+    ) -> M:
+        """
+        Generate output validated against a Pydantic model
+
+        Invalid output is sent back with the validation errors for a
+        bounded number of repair attempts before StructuredOutputError.
+        """
+        if repair_attempts is None:
+            repair_attempts = settings.LLM_STRUCTURED_REPAIR_ATTEMPTS
+        name = schema.__name__
+        error: Optional[Exception] = None
+
+        for attempt in range(repair_attempts + 1):
+            raw = None
+            try:
+                raw = await llm_gateway.run(
+                    self.provider_type.value,
+                    lambda: self.provider.generate_structured(
+                        messages, schema, max_tokens, temperature, system=system, **kwargs
+                    ),
+                    user_id=user_id,
+                    priority=priority,
+                )
+                result = schema.model_validate(raw)
+            except (StructuredOutputError, ValidationError) as e:
+                error = e
+                metrics.increment(f"llm.structured.{name}.invalid")
+                logger.warning(
+                    "Invalid structured LLM output", schema=name, attempt=attempt, error=str(e)
+                )
+                # Show the model its output and what was wrong with it
+                messages = messages + [
+                    Message(
+                        role="assistant",
+                        content=json.dumps(raw) if raw is not None else "(no valid JSON)",
+                    ),
+                    Message(
+                        role="user",
+                        content=f"That output was invalid:\n{e}\nReturn a corrected result.",
+                    ),
+                ]
+                continue
+
+            metrics.increment(f"llm.structured.{name}.valid")
+            if attempt:
+                metrics.increment(f"llm.structured.{name}.repaired")
+            return result
+
+        metrics.increment(f"llm.structured.{name}.failed")
+        raise StructuredOutputError(f"{name} still invalid after {repair_attempts} repairs: {error}")
 
     def switch_provider(self, provider: LLMProvider):
         """Switch to a different LLM provider"""
         self.provider_type = provider
-        self.provider = self._initialize_provider(provider)
+        self._provider = None
         logger.info("Switched LLM provider", provider=provider.value)
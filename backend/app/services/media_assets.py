@@ -0,0 +1,98 @@
+"""
+Content-Addressed Media Asset Store
+"""
+from typing import Any, Dict, Optional
+from datetime import datetime
+from app.core.config import settings
+from app.core.supabase import supabase_client
+import aiofiles
+import hashlib
+import os
+import structlog
+
+logger = structlog.get_logger()
+
+
+def content_hash(content: bytes) -> str:
+    """SHA-256 hex digest of an upload"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class MediaAssetStore:
+    """Stores uploads once per content hash and remembers their ingestion results"""
+
+    def find_by_hash(self, user_id: str, digest: str) -> Optional[Dict[str, Any]]:
+        """Find a previously ingested upload with identical bytes"""
+        response = (
+            supabase_client.table("media_assets")
+            .select("*")
+            .eq("user_id", user_id)
+            .eq("content_hash", digest)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    def find_similar_image(
+        self, user_id: str, phash: int, max_distance: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find the previously ingested image whose perceptual hash is closest
+
+        Every hashed image of the user is compared, in the database (see
+        nearest_image_asset in the image lookup migration).
+        """
+        response = supabase_client.rpc(
+            "nearest_image_asset",
+            {"p_user_id": user_id, "p_hash": phash, "p_max_distance": max_distance},
+        ).execute()
+        if not response.data:
+            return None
+
+        match = response.data[0]
+        logger.info("Near-duplicate image found", asset_id=match["id"])
+        return match
+
+    async def save_file(self, filename: Optional[str], content: bytes, digest: str) -> str:
+        """Write an upload under its content hash, skipping existing files"""
+        file_extension = os.path.splitext(filename or "")[1].lower()
+        file_path = os.path.join(settings.UPLOAD_DIR, f"{digest}{file_extension}")
+
+        if not os.path.exists(file_path):
+            async with aiofiles.open(file_path, "wb") as f:
+                await f.write(content)
+            logger.info("File saved", path=file_path)
+        return file_path
+
+    def record(
+        self,
+        user_id: str,
+        filename: Optional[str],
+        file_type: str,
+        content: bytes,
+        digest: str,
+        storage_path: str,
+        note_id: str,
+        result: Dict[str, Any],
+        phash: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Remember an upload and the ingestion result computed from it"""
+        asset_data = {
+            "user_id": user_id,
+            "file_name": filename or os.path.basename(storage_path),
+            "file_type": file_type,
+            "file_size": len(content),
+            "storage_path": storage_path,
+            "content_hash": digest,
+            "perceptual_hash": phash,
+            "note_id": note_id,
+            "metadata": {"result": result},
+            "created_at": datetime.utcnow().isoformat(),
+        }
+
+        response = (
+            supabase_client.table("media_assets")
+            .upsert(asset_data, on_conflict="user_id,content_hash")
+            .execute()
+        )
+        return response.data[0]
@@ -0,0 +1,224 @@
+"""
+Recurring Task Expansion
+
+A recurring series is stored once, as a template task with an RFC 5545
+recurrence_rule. Occurrences are never materialized: they are expanded on
+demand for the window being scheduled or listed, and only occurrences that
+differ from the template (rescheduled, edited, completed) get a row in
+task_occurrences.
+
+Series are expanded in the user's zone: an occurrence's date is its local
+date, rules such as BYDAY=MO fire on local weekdays, and occurrences keep
+the template's local wall-clock times across DST changes.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from dateutil.rrule import rrulestr
+from app.core.supabase import fetch_all, supabase_client
+from app.services.interval_index import ACTIVE_STATUSES, load_user_zone, to_utc
+import structlog
+
+logger = structlog.get_logger()
+
+# Longest window a single listing may expand
+MAX_WINDOW_DAYS = 366
+
+# Ids per IN (...) filter
+IN_FILTER_SIZE = 200
+
+OVERRIDE_FIELDS = (
+    "title",
+    "description",
+    "priority",
+    "estimated_duration",
+    "scheduled_start",
+    "scheduled_end",
+    "status",
+)
+
+
+# Whole periods of each frequency, as (months, days)
+PERIODS = {"YEARLY": (12, 0), "MONTHLY": (1, 0), "WEEKLY": (0, 7), "DAILY": (0, 1)}
+
+
+def rule_parts(recurrence_rule: str) -> Dict[str, str]:
+    """The rule's NAME=VALUE parts, names upper-cased"""
+    parts = {}
+    for part in recurrence_rule.split(";"):
+        name, _, value = part.partition("=")
+        parts[name.strip().upper()] = value.strip()
+    return parts
+
+
+def series_start(template: Dict[str, Any], zone: tzinfo = timezone.utc) -> datetime:
+    """The series' first instant, in zone: its scheduled start, else its creation"""
+    start = to_utc(template.get("scheduled_start")) or to_utc(template["created_at"])
+    return start.astimezone(zone)
+
+
+def expansion_start(recurrence_rule: str, dtstart: datetime, start: date) -> datetime:
+    """
+    A start for expanding the series near start, in step with dtstart
+
+    rrule walks every instant from dtstart, so a series that began years
+    before the window is moved forward by whole INTERVAL periods, stopping
+    at least one interval before start, where the period dtstart lies in
+    is whole again. A COUNT is reckoned from the real dtstart, so those
+    series are walked as stored.
+    """
+    parts = rule_parts(recurrence_rule)
+    period = PERIODS.get(parts.get("FREQ", ""))
+    if period is None or "COUNT" in parts:
+        return dtstart
+    interval = int(parts.get("INTERVAL") or 1)
+    months, days = period
+    if months:
+        elapsed = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+        steps = elapsed // (months * interval) - 1
+    else:
+        steps = (start - dtstart.date()).days // (days * interval) - 1
+    # Moved to a month without dtstart's day (the 31st, February 29th), the
+    # rule would take its defaults from another day: step back until it has it
+    while steps > 0:
+        if not months:
+            return dtstart + timedelta(days=steps * interval * days)
+        year, month = divmod(dtstart.month - 1 + steps * interval * months, 12)
+        try:
+            return dtstart.replace(year=dtstart.year + year, month=month + 1)
+        except ValueError:
+            steps -= 1
+    return dtstart
+
+
+def occurrence_id(task_id: str, day: date) -> str:
+    return f"{task_id}:{day.isoformat()}"
+
+
+def occurrence_dates(
+    template: Dict[str, Any], start: date, end: date, zone: tzinfo = timezone.utc
+) -> List[date]:
+    """Local days in [start, end] on which the series occurs"""
+    recurrence_rule = template["recurrence_rule"]
+    dtstart = expansion_start(recurrence_rule, series_start(template, zone), start)
+    rule = rrulestr(recurrence_rule, dtstart=dtstart)
+    instants = rule.between(
+        datetime.combine(start, time.min, tzinfo=zone),
+        datetime.combine(end, time.max, tzinfo=zone),
+        inc=True,
+    )
+    # An occurrence is a day, however many times the rule fires in it
+    return list(dict.fromkeys(instant.date() for instant in instants))
+
+
+def split_templates(
+    tasks: Iterable[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Separate one-off tasks from recurring templates"""
+    one_off, templates = [], []
+    for task in tasks:
+        (templates if task.get("recurrence_rule") else one_off).append(task)
+    return one_off, templates
+
+
+def fetch_overrides(
+    task_ids: List[str], start: date, end: date
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Stored occurrence rows for the given series within [start, end]"""
+    overrides = {}
+    for i in range(0, len(task_ids), IN_FILTER_SIZE):
+        response = (
+            supabase_client.table("task_occurrences")
+            .select("*")
+            .in_("task_id", task_ids[i : i + IN_FILTER_SIZE])
+            .gte("occurrence_date", start.isoformat())
+            .lte("occurrence_date", end.isoformat())
+            .execute()
+        )
+        for row in response.data:
+            overrides[(row["task_id"], str(row["occurrence_date"]))] = row
+    return overrides
+
+
+def expand(
+    templates: List[Dict[str, Any]],
+    start: date,
+    end: date,
+    overrides: Dict[Tuple[str, str], Dict[str, Any]],
+    statuses: Optional[List[str]] = None,
+    zone: tzinfo = timezone.utc,
+) -> List[Dict[str, Any]]:
+    """Occurrences of templates within [start, end], overrides applied"""
+    occurrences = []
+    for template in templates:
+        for day in occurrence_dates(template, start, end, zone):
+            occurrence = build_occurrence(
+                template, day, overrides.get((template["id"], day.isoformat())), zone
+            )
+            if statuses is None or occurrence["status"] in statuses:
+                occurrences.append(occurrence)
+    return occurrences
+
+
+def build_occurrence(
+    template: Dict[str, Any],
+    day: date,
+    override: Optional[Dict[str, Any]] = None,
+    zone: tzinfo = timezone.utc,
+) -> Dict[str, Any]:
+    """One occurrence as a task row: the template moved to day, then overridden"""
+    # Moved by whole local days, keeping local times, so 09:00 stays 09:00
+    # on either side of a DST change
+    shift = day - series_start(template, zone).date()
+
+    occurrence = {
+        **template,
+        "id": occurrence_id(template["id"], day),
+        "series_id": template["id"],
+        "occurrence_date": day.isoformat(),
+    }
+    for field in ("scheduled_start", "scheduled_end"):
+        value = to_utc(template.get(field))
+        if value is not None:
+            local = value.astimezone(zone)
+            moved = datetime.combine(local.date() + shift, local.time(), tzinfo=zone)
+            occurrence[field] = moved.astimezone(timezone.utc).isoformat()
+
+    for field in OVERRIDE_FIELDS:
+        if override and override.get(field) is not None:
+            occurrence[field] = override[field]
+    return occurrence
+
+
+def load_templates(user_id: str) -> List[Dict[str, Any]]:
+    return fetch_all(
+        lambda: supabase_client.table("tasks")
+        .select("*")
+        .eq("user_id", user_id)
+        .in_("status", ACTIVE_STATUSES)
+        .not_.is_("recurrence_rule", "null")
+        .order("id")
+    )
+
+
+def occurrences(
+    user_id: str,
+    start: date,
+    end: date,
+    statuses: Optional[List[str]] = None,
+    zone: Optional[tzinfo] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Expand a user's active series over [start, end]
+
+    start and end are days in zone, the user's preferred zone by default.
+    Cost grows with the number of series and the window length, never with
+    how far a series extends beyond the window.
+    """
+    if (end - start).days >= MAX_WINDOW_DAYS:
+        raise ValueError(f"Occurrence window is limited to {MAX_WINDOW_DAYS} days")
+    templates = load_templates(user_id)
+    if not templates:
+        return []
+    overrides = fetch_overrides([t["id"] for t in templates], start, end)
+    zone = zone or load_user_zone(user_id)
+    return expand(templates, start, end, overrides, statuses, zone)
@@ -0,0 +1,292 @@
+"""
+Two-Tier Read-Through Cache for Daily Schedules
+"""
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+from collections import OrderedDict
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import RETRY_INTERVAL_SECONDS, get_redis, mark_redis_unavailable
+import asyncio
+import json
+import time
+import structlog
+
+logger = structlog.get_logger()
+
+CHANNEL = "schedule-cache:invalidate"
+
+# Fill the shared tier only if no invalidation happened since the load began
+_FILL_SCRIPT = """
+if (redis.call("get", KEYS[2]) or "") == ARGV[1] then
+    redis.call("set", KEYS[1], ARGV[2], "EX", ARGV[3])
+    redis.call("sadd", KEYS[3], ARGV[4])
+    redis.call("expire", KEYS[3], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+Key = Tuple[str, str]
+
+
+def scheduled_days(task: Dict[str, Any]) -> List[str]:
+    """Dates (YYYY-MM-DD) a task's scheduled slot touches"""
+    return [
+        str(task[field])[:10]
+        for field in ("scheduled_start", "scheduled_end")
+        if task.get(field)
+    ]
+
+
+def _references(schedule: Optional[Dict[str, Any]], task_ids: Set[str]) -> bool:
+    return bool(schedule) and any(
+        slot.get("task_id") in task_ids for slot in schedule.get("tasks") or []
+    )
+
+
+class ScheduleCache:
+    """
+    Per-(user, date) schedule rows, in process and in Redis
+
+    Hits in the process tier are a dict lookup. Misses fall through to Redis,
+    then to the loader, and absent schedules are cached too. Invalidation
+    deletes the Redis entry, stamps the key with a generation so an
+    in-flight load cannot write back a stale row, and is broadcast so every worker drops
+    its own copy. Without Redis, other workers' copies expire after the
+    local TTL.
+
+    Cached rows are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, ttl: int, local_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[Key, Tuple[float, Optional[Dict]]]" = OrderedDict()
+        self._user_days: Dict[str, Set[str]] = {}
+        # A global counter, bumped by every local eviction. _evicted holds
+        # the generation of each key's latest eviction; evictions up to
+        # _horizon may have been forgotten.
+        self._generation = 0
+        self._evicted: Dict[Key, int] = {}
+        self._horizon = 0
+        self._listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _keys(user_id: str, day: str) -> Tuple[str, str, str]:
+        return (
+            f"schedule:{user_id}:{day}",
+            f"schedule:ver:{user_id}:{day}",
+            f"schedule:days:{user_id}",
+        )
+
+    async def get_or_load(
+        self,
+        user_id: str,
+        day: str,
+        load: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached schedule for (user_id, day), loading it on a miss"""
+        key = (user_id, day)
+        entry = self._local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._local.move_to_end(key)
+            metrics.increment("schedule_cache.hit.local")
+            return entry[1]
+
+        generation = self._generation
+        data_key, version_key, days_key = self._keys(user_id, day)
+        version = ""
+        client = await get_redis()
+        if client is not None:
+            try:
+                cached, version = await client.mget(data_key, version_key)
+                version = version or ""
+                if cached is not None:
+                    value = json.loads(cached)
+                    self._store(key, value, generation)
+                    metrics.increment("schedule_cache.hit.redis")
+                    return value
+            except Exception as e:
+                logger.warning("Schedule cache read failed", error=str(e))
+                mark_redis_unavailable()
+                client = None
+
+        metrics.increment("schedule_cache.miss")
+        value = await load()
+        self._store(key, value, generation)
+        if client is not None:
+            try:
+                await client.eval(
+                    _FILL_SCRIPT,
+                    3,
+                    data_key,
+                    version_key,
+                    days_key,
+                    version,
+                    json.dumps(value, default=str),
+                    self.ttl,
+                    day,
+                )
+            except Exception as e:
+                logger.warning("Schedule cache fill failed", error=str(e))
+                mark_redis_unavailable()
+        return value
+
+    def _store(self, key: Key, value: Optional[Dict[str, Any]], generation: int):
+        if self._evicted.get(key, self._horizon) > generation:
+            return  # invalidated while loading, or possibly so
+        self._local[key] = (time.monotonic() + self.local_ttl, value)
+        self._local.move_to_end(key)
+        self._user_days.setdefault(key[0], set()).add(key[1])
+        while len(self._local) > self.max_entries:
+            self._forget(next(iter(self._local)))
+
+    def _forget(self, key: Key):
+        self._local.pop(key, None)
+        days = self._user_days.get(key[0])
+        if days is not None:
+            days.discard(key[1])
+            if not days:
+                del self._user_days[key[0]]
+
+    def evict_local(self, user_id: str, day: str):
+        """Drop (user_id, day) from this process only"""
+        key = (user_id, day)
+        self._forget(key)
+        self._generation += 1
+        self._evicted[key] = self._generation
+        if len(self._evicted) > 2 * self.max_entries:
+            # Only loads still in flight care about past evictions; those
+            # that began before now will not be stored locally
+            self._evicted.clear()
+            self._horizon = self._generation
+
+    async def invalidate(self, user_id: str, day: str):
+        """Drop (user_id, day) from every tier and every worker"""
+        self.evict_local(user_id, day)
+        metrics.increment("schedule_cache.invalidated")
+        client = await get_redis()
+        if client is None:
+            return
+        data_key, version_key, days_key = self._keys(user_id, day)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(data_key)
+                pipe.incr(version_key)
+                pipe.expire(version_key, self.ttl * 2)
+                pipe.srem(days_key, day)
+                pipe.publish(CHANNEL, json.dumps([user_id, day]))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Schedule cache invalidation failed", error=str(e))
+            mark_redis_unavailable()
+
+    async def invalidate_task(
+        self, user_id: str, task_id: str, days: Iterable[str] = ()
+    ):
+        """Invalidate days, plus every cached day whose schedule lists task_id"""
+        await self.invalidate_tasks(user_id, [task_id], days)
+
+    async def invalidate_tasks(
+        self, user_id: str, task_ids: Iterable[str], days: Iterable[str] = ()
+    ):
+        """Invalidate days, plus every cached day whose schedule lists any task"""
+        task_ids = set(task_ids)
+        affected = {day for day in days if day} | self._local_days_listing(
+            user_id, task_ids
+        )
+
+        client = await get_redis()
+        if client is not None:
+            try:
+                cached_days = sorted(await client.smembers(self._keys(user_id, "")[2]))
+                if cached_days:
+                    values = await client.mget(
+                        [self._keys(user_id, day)[0] for day in cached_days]
+                    )
+                    affected.update(
+                        day
+                        for day, value in zip(cached_days, values)
+                        if value is not None
+                        and _references(json.loads(value), task_ids)
+                    )
+            except Exception as e:
+                logger.warning("Schedule cache lookup failed", error=str(e))
+                mark_redis_unavailable()
+
+        for day in sorted(affected):
+            await self.invalidate(user_id, day)
+
+    def evict_local_tasks(
+        self, user_id: str, task_ids: Iterable[str], days: Iterable[str] = ()
+    ):
+        """Drop days, and local days whose schedule lists any task, from this process"""
+        affected = {day for day in days if day}
+        affected |= self._local_days_listing(user_id, set(task_ids))
+        for day in affected:
+            self.evict_local(user_id, day)
+
+    def _local_days_listing(self, user_id: str, task_ids: Set[str]) -> Set[str]:
+        return {
+            day
+            for day in self._user_days.get(user_id, ())
+            if _references(self._local[(user_id, day)][1], task_ids)
+        }
+
+    def clear(self):
+        """Drop every entry held by this process"""
+        for user_id, day in list(self._local):
+            self.evict_local(user_id, day)
+
+    def start(self):
+        """Start listening for invalidations from other workers"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            client = await get_redis()
+            if client is None:
+                await asyncio.sleep(RETRY_INTERVAL_SECONDS)
+                continue
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        user_id, day = json.loads(message["data"])
+                        self.evict_local(user_id, day)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Schedule cache listener failed", error=str(e))
+                mark_redis_unavailable()
+            finally:
+                await pubsub.aclose()
+
+
+schedule_cache = ScheduleCache(
+    ttl=settings.SCHEDULE_CACHE_TTL_SECONDS,
+    local_ttl=settings.SCHEDULE_CACHE_LOCAL_TTL_SECONDS,
+    max_entries=settings.SCHEDULE_CACHE_MAX_ENTRIES,
+)
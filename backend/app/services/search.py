@@ -0,0 +1,48 @@
+"""
+Full-Text Search over Tasks and Notes
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.supabase import supabase_client
+import base64
+import json
+
+
+def encode_cursor(rank: float, row_id: str) -> str:
+    """Opaque keyset cursor for the row after which the next page starts"""
+    return base64.urlsafe_b64encode(json.dumps([rank, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        rank, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), str(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid search cursor") from e
+
+
+def search(
+    function: str,
+    user_id: str,
+    query: str,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Run a ranked search function and return one page plus the next cursor
+
+    function is search_tasks or search_notes (see the full-text search
+    migration); pages are ordered by (rank, id) descending.
+    """
+    params: Dict[str, Any] = {
+        "p_user_id": user_id,
+        "p_query": query,
+        # One extra row tells us whether another page exists
+        "p_limit": limit + 1,
+    }
+    if cursor:
+        params["p_after_rank"], params["p_after_id"] = decode_cursor(cursor)
+
+    rows = supabase_client.rpc(function, params).execute().data or []
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]["rank"], page[-1]["id"]) if len(rows) > limit else None
+    return page, next_cursor
@@ -0,0 +1,165 @@
+"""
+Speech-to-Text Pipeline
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.workers import run_in_process
+import asyncio
+import io
+import structlog
+
+logger = structlog.get_logger()
+
+# (recognizer, audio_data, language) -> transcript
+SpeechEngine = Callable[..., str]
+
+TARGET_FRAME_RATE = 16000
+MIN_SILENCE_MS = 700
+SILENCE_PADDING_MS = 200
+
+
+def _recognize_sphinx(recognizer, audio, language: str) -> str:
+    """Offline CMU Sphinx recognition (requires pocketsphinx)"""
+    return recognizer.recognize_sphinx(audio, language=language)
+
+
+def _recognize_whisper(recognizer, audio, language: str) -> str:
+    """Local Whisper recognition (requires openai-whisper)"""
+    return recognizer.recognize_whisper(audio, model="base")
+
+
+def _recognize_google(recognizer, audio, language: str) -> str:
+    """Google Web Speech API recognition (network)"""
+    return recognizer.recognize_google(audio, language=language)
+
+
+SPEECH_ENGINES: Dict[str, SpeechEngine] = {
+    "sphinx": _recognize_sphinx,
+    "whisper": _recognize_whisper,
+    "google": _recognize_google,
+}
+
+
+def register_engine(name: str, engine: SpeechEngine):
+    """
+    Register a speech engine
+
+    Engines run inside worker processes, so they must be module-level
+    functions that can be pickled by reference.
+    """
+    SPEECH_ENGINES[name] = engine
+
+
+def get_engine(name: str) -> SpeechEngine:
+    """Look up a registered speech engine"""
+    if name not in SPEECH_ENGINES:
+        raise ValueError(f"Unsupported speech engine: {name}")
+    return SPEECH_ENGINES[name]
+
+
+def _plan_chunks(
+    ranges: List[Tuple[int, int]], max_chunk_ms: int
+) -> List[Tuple[int, int]]:
+    """Group non-silent ranges into chunks, cutting inside silences"""
+    chunks: List[Tuple[int, int]] = []
+    chunk_start, chunk_end = ranges[0]
+    for start, end in ranges[1:]:
+        if end - chunk_start <= max_chunk_ms:
+            chunk_end = end
+            continue
+        chunks.append((chunk_start, chunk_end))
+        chunk_start, chunk_end = start, end
+    chunks.append((chunk_start, chunk_end))
+
+    # Speech with no usable pause is hard-split at the chunk length
+    split: List[Tuple[int, int]] = []
+    for start, end in chunks:
+        while end - start > max_chunk_ms:
+            split.append((start, start + max_chunk_ms))
+            start += max_chunk_ms
+        split.append((start, end))
+    return split
+
+
+def prepare_audio(
+    data: bytes, file_format: Optional[str], max_chunk_ms: int
+) -> List[bytes]:
+    """
+    Normalize audio and split it into WAV chunks (runs in a worker process)
+
+    Downmixes to mono 16 kHz 16-bit PCM, trims leading and trailing
+    silence and cuts long recordings at pauses.
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_nonsilent
+
+    audio = AudioSegment.from_file(io.BytesIO(data), format=file_format)
+    audio = (
+        audio.set_channels(1).set_frame_rate(TARGET_FRAME_RATE).set_sample_width(2)
+    )
+    if audio.dBFS == float("-inf"):
+        return []
+
+    ranges = detect_nonsilent(
+        audio,
+        min_silence_len=MIN_SILENCE_MS,
+        silence_thresh=audio.dBFS - 16,
+        seek_step=10,
+    )
+    if not ranges:
+        return []
+
+    chunks = []
+    for start, end in _plan_chunks(ranges, max_chunk_ms):
+        segment = audio[max(start - SILENCE_PADDING_MS, 0) : end + SILENCE_PADDING_MS]
+        buffer = io.BytesIO()
+        segment.export(buffer, format="wav")
+        chunks.append(buffer.getvalue())
+    return chunks
+
+
+def transcribe_chunk(engine: SpeechEngine, wav: bytes, language: str) -> str:
+    """Transcribe one WAV chunk (runs in a worker process)"""
+    import speech_recognition as sr
+
+    recognizer = sr.Recognizer()
+    with sr.AudioFile(io.BytesIO(wav)) as source:
+        audio = recognizer.record(source)
+
+    try:
+        return engine(recognizer, audio, language).strip()
+    except sr.UnknownValueError:
+        return ""
+
+
+class SpeechTranscriber:
+    """Normalizes, chunks and transcribes audio off the event loop"""
+
+    def __init__(
+        self,
+        engine: Optional[str] = None,
+        language: Optional[str] = None,
+        chunk_seconds: Optional[int] = None,
+    ):
+        self.engine_name = engine or settings.SPEECH_ENGINE
+        self.engine = get_engine(self.engine_name)
+        self.language = language or settings.SPEECH_LANGUAGE
+        self.chunk_ms = (chunk_seconds or settings.SPEECH_CHUNK_SECONDS) * 1000
+
+    async def transcribe(self, data: bytes, file_format: Optional[str] = None) -> str:
+        """Transcribe an audio file, chunks in parallel, stitched in order"""
+        chunks = await run_in_process(prepare_audio, data, file_format, self.chunk_ms)
+
+        texts = await asyncio.gather(
+            *(
+                run_in_process(transcribe_chunk, self.engine, chunk, self.language)
+                for chunk in chunks
+            )
+        )
+
+        logger.info(
+            "Audio transcribed",
+            engine=self.engine_name,
+            chunk_count=len(chunks),
+        )
+        return " ".join(text for text in texts if text)
@@ -0,0 +1,305 @@
+"""
+Per-User Task Dependency Graphs
+"""
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from collections import OrderedDict
+from app.core.config import settings
+from app.core.supabase import fetch_all, supabase_client
+import structlog
+
+logger = structlog.get_logger()
+
+DEFAULT_DURATION = 60  # minutes, for tasks without an estimate
+
+
+class DependencyCycleError(ValueError):
+    """Raised when a dependency would make a task (transitively) depend on itself"""
+
+
+class DependencyGraph:
+    """
+    Directed acyclic graph with an incrementally maintained topological order
+
+    An edge (before, after) means "after" cannot start until "before" is done.
+    Every node holds a position such that edges always point from a lower to
+    a higher position. Adding an edge that already agrees with the order is
+    O(1); otherwise only the nodes whose positions lie between its endpoints
+    are searched and reordered (Pearce & Kelly, 2006), which is also where a
+    cycle would have to pass.
+    """
+
+    def __init__(self):
+        self._successors: Dict[Hashable, Set[Hashable]] = {}
+        self._predecessors: Dict[Hashable, Set[Hashable]] = {}
+        self._position: Dict[Hashable, int] = {}
+        self._next_position = 0
+
+    def __len__(self) -> int:
+        return len(self._position)
+
+    def __contains__(self, node: Hashable) -> bool:
+        return node in self._position
+
+    def add_node(self, node: Hashable):
+        if node not in self._position:
+            self._position[node] = self._next_position
+            self._next_position += 1
+            self._successors[node] = set()
+            self._predecessors[node] = set()
+
+    def remove_node(self, node: Hashable):
+        if node not in self._position:
+            return
+        for successor in self._successors.pop(node):
+            self._predecessors[successor].discard(node)
+        for predecessor in self._predecessors.pop(node):
+            self._successors[predecessor].discard(node)
+        del self._position[node]
+
+    def predecessors(self, node: Hashable) -> Set[Hashable]:
+        return self._predecessors.get(node, set())
+
+    def edges(self) -> List[Tuple[Hashable, Hashable]]:
+        return [
+            (before, after)
+            for before, successors in self._successors.items()
+            for after in successors
+        ]
+
+    def add_edge(self, before: Hashable, after: Hashable):
+        """Add before -> after, raising DependencyCycleError if it closes a cycle"""
+        if before == after:
+            raise DependencyCycleError("A task cannot depend on itself")
+        self.add_node(before)
+        self.add_node(after)
+        if after in self._successors[before]:
+            return
+
+        lower, upper = self._position[after], self._position[before]
+        if lower < upper:
+            forward = self._search(after, self._successors, lambda p: p <= upper)
+            if before in forward:
+                raise DependencyCycleError("Dependency would create a cycle")
+            backward = self._search(before, self._predecessors, lambda p: p >= lower)
+            self._reorder(backward, forward)
+
+        self._successors[before].add(after)
+        self._predecessors[after].add(before)
+
+    def remove_edge(self, before: Hashable, after: Hashable) -> bool:
+        # Removing an edge never invalidates the order
+        if after not in self._successors.get(before, set()):
+            return False
+        self._successors[before].discard(after)
+        self._predecessors[after].discard(before)
+        return True
+
+    def _search(self, start: Hashable, neighbours, in_region) -> List[Hashable]:
+        seen = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for neighbour in neighbours[node]:
+                if neighbour not in seen and in_region(self._position[neighbour]):
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        return list(seen)
+
+    def _reorder(self, backward: List[Hashable], forward: List[Hashable]):
+        # Ancestors of "before" take the lowest of the freed positions, then
+        # descendants of "after", each group keeping its relative order
+        backward.sort(key=self._position.__getitem__)
+        forward.sort(key=self._position.__getitem__)
+        positions = sorted(self._position[node] for node in backward + forward)
+        for node, position in zip(backward + forward, positions):
+            self._position[node] = position
+
+    def topological_order(self, nodes: Iterable[Hashable]) -> List[Hashable]:
+        """Return nodes sorted by the maintained order"""
+        return sorted(
+            (node for node in nodes if node in self._position),
+            key=self._position.__getitem__,
+        )
+
+    def order_by_preference(self, preferred: List[Hashable]) -> List[Hashable]:
+        """
+        Reorder a list so every node follows its listed prerequisites
+
+        Nodes keep their preferred relative order except that a node's
+        unemitted prerequisites from the list are pulled in just before it,
+        so every prefix of the result is closed under prerequisites. This is
+        one depth-first pass over the listed nodes and their edges.
+        """
+        included = set(preferred)
+        emitted: Set[Hashable] = set()
+        ordered: List[Hashable] = []
+
+        for root in preferred:
+            if root in emitted:
+                continue
+            # Iterative post-order DFS over prerequisites within the list
+            stack = [(root, iter(self._listed_predecessors(root, included)))]
+            emitted.add(root)
+            while stack:
+                node, pending = stack[-1]
+                for predecessor in pending:
+                    if predecessor not in emitted:
+                        emitted.add(predecessor)
+                        stack.append(
+                            (
+                                predecessor,
+                                iter(self._listed_predecessors(predecessor, included)),
+                            )
+                        )
+                        break
+                else:
+                    stack.pop()
+                    ordered.append(node)
+        return ordered
+
+    def _listed_predecessors(self, node: Hashable, included: Set[Hashable]):
+        return sorted(
+            (p for p in self._predecessors.get(node, ()) if p in included),
+            key=self._position.__getitem__,
+        )
+
+    def critical_path(
+        self, durations: Dict[Hashable, int]
+    ) -> Tuple[List[Hashable], int]:
+        """
+        Longest duration-weighted chain among the given nodes
+
+        One pass over the nodes in topological order relaxes each edge once.
+        """
+        finish: Dict[Hashable, int] = {}
+        previous: Dict[Hashable, Optional[Hashable]] = {}
+        isolated = [node for node in durations if node not in self._position]
+        for node in isolated + self.topological_order(durations):
+            start, via = 0, None
+            for predecessor in self.predecessors(node):
+                if predecessor in finish and finish[predecessor] > start:
+                    start, via = finish[predecessor], predecessor
+            finish[node] = start + durations[node]
+            previous[node] = via
+
+        if not finish:
+            return [], 0
+        node = max(finish, key=finish.__getitem__)
+        total = finish[node]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        path.reverse()
+        return path, total
+
+
+class TaskDependencyIndex:
+    """
+    Lazily loaded per-user dependency graphs
+
+    At most max_users graphs are kept; the least recently used is dropped
+    and reloaded when its user comes back.
+    """
+
+    def __init__(self, max_users: int = settings.USER_INDEX_MAX_USERS):
+        self.max_users = max_users
+        self._graphs: "OrderedDict[str, DependencyGraph]" = OrderedDict()
+
+    def graph(self, user_id: str) -> DependencyGraph:
+        graph = self._graphs.get(user_id)
+        if graph is not None:
+            self._graphs.move_to_end(user_id)
+        else:
+            graph = DependencyGraph()
+            edges = fetch_all(
+                lambda: supabase_client.table("task_dependencies")
+                .select("task_id, depends_on_id")
+                .eq("user_id", user_id)
+                .order("task_id")
+                .order("depends_on_id")
+            )
+            for edge in edges:
+                try:
+                    graph.add_edge(edge["depends_on_id"], edge["task_id"])
+                except DependencyCycleError:
+                    logger.warning(
+                        "Skipping cyclic dependency", user_id=user_id, **edge
+                    )
+            self._graphs[user_id] = graph
+            while len(self._graphs) > self.max_users:
+                self._graphs.popitem(last=False)
+            logger.info("Dependency graph loaded", user_id=user_id, size=len(graph))
+        return graph
+
+    def add(self, user_id: str, task_id: str, depends_on_id: str):
+        """Record that task_id depends on depends_on_id, rejecting cycles"""
+        self.graph(user_id).add_edge(depends_on_id, task_id)
+
+    def discard(self, user_id: str, task_id: str, depends_on_id: str):
+        graph = self._graphs.get(user_id)
+        if graph is not None:
+            graph.remove_edge(depends_on_id, task_id)
+
+    def remove_task(self, user_id: str, task_id: str):
+        """Drop a deleted task and its edges if the user's graph is loaded"""
+        graph = self._graphs.get(user_id)
+        if graph is not None:
+            graph.remove_node(task_id)
+
+    def refresh_edge(self, user_id: str, task_id: str, depends_on_id: str):
+        """Apply an edge written elsewhere if the user's graph is loaded"""
+        graph = self._graphs.get(user_id)
+        if graph is None:
+            return
+        try:
+            graph.add_edge(depends_on_id, task_id)
+        except DependencyCycleError:
+            # Our copy has drifted from the table; rebuild it
+            self.evict(user_id)
+
+    def evict(self, user_id: str):
+        """Forget a user's graph so it is reloaded on next use"""
+        self._graphs.pop(user_id, None)
+
+    def clear(self):
+        """Forget every user's graph"""
+        self._graphs.clear()
+
+    def schedule_order(
+        self, user_id: str, preferred: List[str], open_ids: Set[str]
+    ) -> List[str]:
+        """
+        Order task ids so prerequisites come first
+
+        A task is dropped when one of its prerequisites is still open but not
+        in the list, or was itself dropped.
+        """
+        graph = self.graph(user_id)
+        listed = set(preferred)
+        dropped: Set[str] = set()
+        ordered = []
+        for task_id in graph.order_by_preference(preferred):
+            if any(
+                predecessor in dropped
+                or (predecessor in open_ids and predecessor not in listed)
+                for predecessor in graph.predecessors(task_id)
+            ):
+                dropped.add(task_id)
+            else:
+                ordered.append(task_id)
+        return ordered
+
+    def critical_path(
+        self, user_id: str, tasks: List[Dict[str, Any]]
+    ) -> Tuple[List[str], int]:
+        """Longest chain of dependent tasks by estimated duration"""
+        return self.graph(user_id).critical_path(
+            {
+                task["id"]: task.get("estimated_duration") or DEFAULT_DURATION
+                for task in tasks
+            }
+        )
+
+
+task_dependency_index = TaskDependencyIndex()
@@ -0,0 +1,346 @@
+"""
+Per-User Near-Duplicate Index for Open Tasks
+"""
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+from collections import OrderedDict
+from app.core.config import settings
+from app.core.supabase import fetch_all, supabase_client
+from app.services.interval_index import ACTIVE_STATUSES
+import hashlib
+import random
+import re
+import structlog
+
+logger = structlog.get_logger()
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Share of the score carried by the title when both tasks have a description
+TITLE_WEIGHT = 0.75
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase and collapse text to space-separated alphanumeric words"""
+    return " ".join(_WORD.findall((text or "").lower()))
+
+
+def shingles(text: Optional[str], size: int = 3) -> Set[str]:
+    """Character n-grams of normalized text, padded so short words still count"""
+    normalized = normalize(text)
+    if not normalized:
+        return set()
+    padded = f" {normalized} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i : i + size] for i in range(len(padded) - size + 1)}
+
+
+def fingerprint(title: Optional[str], description: Optional[str], priority: str) -> str:
+    """Digest of what the index keeps for a task; the invalidation trigger mirrors it"""
+    content = f"{title or ''}\x1f{description or ''}\x1f{priority}"
+    return hashlib.md5(content.encode()).hexdigest()[:16]
+
+
+def jaccard(a: Set[Any], b: Set[Any]) -> float:
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class MinHasher:
+    """
+    MinHash signatures over a 64-bit hash and random XOR masks
+
+    Two sets agree on any one signature position with probability close to
+    their Jaccard similarity, so signatures can be bucketed band by band to
+    find likely matches without comparing against every stored set. XOR with
+    a mask permutes the hash space at a fraction of the cost of modular
+    multiplication on Python ints.
+    """
+
+    def __init__(self, num_perm: int = 48, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+
+    def signature(self, items: Set[str]) -> Tuple[int, ...]:
+        hashes = [
+            int.from_bytes(
+                hashlib.blake2b(item.encode(), digest_size=8).digest(), "little"
+            )
+            for item in items
+        ]
+        if not hashes:
+            return ()
+        return tuple(min([h ^ mask for h in hashes]) for mask in self._masks)
+
+
+class _Entry:
+    __slots__ = (
+        "title",
+        "priority",
+        "title_shingles",
+        "words",
+        "signature",
+        "fingerprint",
+    )
+
+    def __init__(
+        self,
+        title: str,
+        priority: str,
+        title_shingles: Set[str],
+        words: Set[str],
+        signature: Tuple[int, ...],
+        fingerprint: str,
+    ):
+        self.title = title
+        self.priority = priority
+        self.title_shingles = title_shingles
+        self.words = words
+        self.signature = signature
+        self.fingerprint = fingerprint
+
+
+class SimilarityIndex:
+    """
+    Locality-sensitive hash index over task titles and descriptions
+
+    Titles are MinHashed over character trigrams and split into bands; a
+    stored task becomes a candidate when any band matches exactly. With 16
+    bands of 3 rows, pairs at 0.6 Jaccard collide with ~98% probability
+    while pairs at 0.3 collide about a third of the time. Candidates are then
+    scored exactly, so the threshold is never approximated.
+    """
+
+    def __init__(self, hasher: MinHasher, bands: int = 16):
+        if hasher.num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = hasher
+        self.bands = bands
+        self.rows = hasher.num_perm // bands
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def entry(self, key: Hashable) -> Optional[_Entry]:
+        return self._entries.get(key)
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands if signature else 0):
+            yield band, signature[band * self.rows : (band + 1) * self.rows]
+
+    def _entry(
+        self, title: str, description: Optional[str], priority: str = "medium"
+    ) -> _Entry:
+        title_shingles = shingles(title)
+        return _Entry(
+            title,
+            priority,
+            title_shingles,
+            set(normalize(description).split()),
+            self.hasher.signature(title_shingles),
+            fingerprint(title, description, priority),
+        )
+
+    def add(
+        self,
+        key: Hashable,
+        title: str,
+        description: Optional[str] = None,
+        priority: str = "medium",
+    ):
+        """Insert or replace a task"""
+        self.remove(key)
+        entry = self._entry(title, description, priority)
+        self._entries[key] = entry
+        for band_key in self._band_keys(entry.signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for band_key in self._band_keys(entry.signature):
+            bucket = self._buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band_key]
+        return True
+
+    def best_match(
+        self, title: str, description: Optional[str], threshold: float
+    ) -> Optional[Tuple[Hashable, float]]:
+        """Return the most similar stored task scoring at least threshold"""
+        probe = self._entry(title, description)
+        candidates: Set[Hashable] = set()
+        for band_key in self._band_keys(probe.signature):
+            candidates |= self._buckets.get(band_key, set())
+
+        best: Optional[Tuple[Hashable, float]] = None
+        for key in candidates:
+            score = self._score(probe, self._entries[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    @staticmethod
+    def _score(a: _Entry, b: _Entry) -> float:
+        title_score = jaccard(a.title_shingles, b.title_shingles)
+        if not a.words or not b.words:
+            return title_score
+        return TITLE_WEIGHT * title_score + (1 - TITLE_WEIGHT) * jaccard(
+            a.words, b.words
+        )
+
+
+class TaskSimilarityIndex:
+    """
+    Lazily loaded per-user similarity indexes over open tasks
+
+    At most max_users indexes are kept; the least recently used is dropped
+    and reloaded when its user comes back.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        num_perm: int = 48,
+        bands: int = 16,
+        max_users: int = settings.USER_INDEX_MAX_USERS,
+    ):
+        self.threshold = threshold
+        self.bands = bands
+        self.max_users = max_users
+        self._hasher = MinHasher(num_perm)
+        self._indexes: "OrderedDict[str, SimilarityIndex]" = OrderedDict()
+
+    def _index(self, user_id: str) -> SimilarityIndex:
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+        else:
+            index = SimilarityIndex(self._hasher, self.bands)
+            tasks = fetch_all(
+                lambda: supabase_client.table("tasks")
+                .select("id, title, description, priority, status")
+                .eq("user_id", user_id)
+                .in_("status", ACTIVE_STATUSES)
+                .order("id")
+            )
+            for task in tasks:
+                self._add(index, task)
+            self._indexes[user_id] = index
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+            logger.info("Similarity index loaded", user_id=user_id, size=len(index))
+        return index
+
+    @staticmethod
+    def _add(index: SimilarityIndex, task: Dict[str, Any]):
+        status = task.get("status", "pending")
+        if not task.get("title") or status not in ACTIVE_STATUSES:
+            index.remove(task["id"])
+            return
+        index.add(
+            task["id"],
+            task["title"],
+            task.get("description"),
+            task.get("priority") or "medium",
+        )
+
+    def record(self, user_id: str, task: Dict[str, Any]):
+        """Index a written task row, dropping it once it is no longer open"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._add(index, task)
+
+    def remove(self, user_id: str, task_id: str):
+        """Drop a task from the user's index if it is loaded"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.remove(task_id)
+
+    def refresh(
+        self, user_id: str, task_id: str, status: str, task_fingerprint: str
+    ):
+        """
+        Reconcile a task written elsewhere with the user's index, if loaded
+
+        Writes this process already recorded match their fingerprint and are
+        skipped; anything else reloads the index on next use.
+        """
+        index = self._indexes.get(user_id)
+        if index is None:
+            return
+        if status not in ACTIVE_STATUSES:
+            index.remove(task_id)
+            return
+        entry = index.entry(task_id)
+        if entry is None or entry.fingerprint != task_fingerprint:
+            self.evict(user_id)
+
+    def evict(self, user_id: str):
+        """Forget a user's index so it is reloaded on next use"""
+        self._indexes.pop(user_id, None)
+
+    def clear(self):
+        """Forget every user's index"""
+        self._indexes.clear()
+
+    def match(
+        self,
+        user_id: str,
+        candidates: List[Dict[str, Any]],
+        index_matched: bool = False,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Match each candidate task against open tasks and earlier candidates
+
+        Returns, per candidate, None or the match: either an existing task
+        ("task_id") or an earlier candidate ("candidate" index). Matched
+        candidates are only compared against later ones when index_matched
+        is set, i.e. when they will be created anyway.
+        """
+        index = self._index(user_id)
+        matches: List[Optional[Dict[str, Any]]] = []
+        pending = []
+        try:
+            for position, candidate in enumerate(candidates):
+                found = index.best_match(
+                    candidate["title"], candidate.get("description"), self.threshold
+                )
+                if found is None:
+                    matches.append(None)
+                else:
+                    key, score = found
+                    entry = index.entry(key)
+                    matches.append(
+                        {
+                            **(
+                                {"candidate": key[1]}
+                                if isinstance(key, tuple)
+                                else {"task_id": key}
+                            ),
+                            "title": entry.title,
+                            "priority": entry.priority,
+                            "similarity": round(score, 3),
+                        }
+                    )
+                if found is None or index_matched:
+                    key = ("candidate", position)
+                    index.add(key, candidate["title"], candidate.get("description"))
+                    pending.append(key)
+        finally:
+            for key in pending:
+                index.remove(key)
+        return matches
+
+
+task_similarity_index = TaskSimilarityIndex(settings.TASK_DEDUP_THRESHOLD)
@@ -0,0 +1,163 @@
+"""
+Image Preprocessing and Text Extraction Pipeline
+"""
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.workers import run_in_process
+from app.services.llm_provider import LLMService, Message
+import io
+import structlog
+
+logger = structlog.get_logger()
+
+# Refuse to decode anything larger than ~50 MP (decompression bombs)
+MAX_SOURCE_PIXELS = 50_000_000
+MAX_DESKEW_ANGLE = 15.0
+
+
+def _deskew(binary, gray):
+    """Rotate both images so text lines are horizontal"""
+    import cv2
+
+    coords = cv2.findNonZero(255 - binary)
+    if coords is None or len(coords) < 50:
+        return binary, gray, 0.0
+
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 0.5 or abs(angle) > MAX_DESKEW_ANGLE:
+        return binary, gray, 0.0
+
+    height, width = binary.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+
+    def rotate(image):
+        return cv2.warpAffine(
+            image,
+            matrix,
+            (width, height),
+            flags=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=255,
+        )
+
+    return rotate(binary), rotate(gray), float(angle)
+
+
+def perceptual_hash(gray) -> int:
+    """64-bit difference hash, as a signed integer so it fits a BIGINT"""
+    import cv2
+
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    value = 0
+    for bit in (small[:, 1:] > small[:, :-1]).flatten():
+        value = (value << 1) | int(bit)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two 64-bit hashes"""
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def prepare_image(data: bytes, max_dimension: int, thumbnail_size: int) -> Dict[str, Any]:
+    """
+    Orient, downscale, clean up and thumbnail an image (runs in a worker process)
+
+    JPEGs are decoded directly at a reduced scale, so a 12 MP photo never
+    materializes at full resolution.
+    """
+    import cv2
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    cv2.setNumThreads(1)
+
+    image = Image.open(io.BytesIO(data))
+    if image.width * image.height > MAX_SOURCE_PIXELS:
+        raise ValueError("Image resolution is too large")
+    original_size = image.size
+
+    # Ask for the size thumbnail() will produce; a square box would keep the
+    # shorter side, and with it the whole photo, at full scale
+    scale = min(max_dimension / max(image.size), 1.0)
+    image.draft("RGB", (round(image.width * scale), round(image.height * scale)))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension))
+    image = image.convert("RGB")
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((thumbnail_size, thumbnail_size))
+    thumbnail_buffer = io.BytesIO()
+    thumbnail.save(thumbnail_buffer, format="JPEG", quality=80, optimize=True)
+
+    gray = np.asarray(image.convert("L"))
+    phash = perceptual_hash(gray)
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+    )
+    binary, gray, skew_angle = _deskew(binary, gray)
+
+    return {
+        "image": cv2.imencode(".png", gray)[1].tobytes(),
+        "binary": cv2.imencode(".png", binary)[1].tobytes(),
+        "thumbnail": thumbnail_buffer.getvalue(),
+        "original_size": original_size,
+        "size": (gray.shape[1], gray.shape[0]),
+        "skew_angle": skew_angle,
+        "perceptual_hash": phash,
+    }
+
+
+def ocr_image(png: bytes) -> str:
+    """Run Tesseract OCR on a preprocessed image (runs in a worker process)"""
+    try:
+        import pytesseract
+    except ImportError:
+        raise ValueError("Tesseract OCR engine requires pytesseract")
+    from PIL import Image
+
+    return pytesseract.image_to_string(Image.open(io.BytesIO(png))).strip()
+
+
+class ImageTextExtractor:
+    """Preprocesses images in the worker pool and extracts their text"""
+
+    def __init__(self, llm_service: LLMService, engine: Optional[str] = None):
+        self.llm_service = llm_service
+        self.engine = engine or settings.IMAGE_TEXT_ENGINE
+        if self.engine not in ("vision", "tesseract"):
+            raise ValueError(f"Unsupported image text engine: {self.engine}")
+
+    async def prepare(self, data: bytes) -> Dict[str, Any]:
+        """Preprocess an image and build its thumbnail"""
+        return await run_in_process(
+            prepare_image, data, settings.IMAGE_MAX_DIMENSION, settings.THUMBNAIL_SIZE
+        )
+
+    async def extract_text(self, user_id: str, prepared: Dict[str, Any]) -> str:
+        """Read the text from a preprocessed image"""
+        if self.engine == "tesseract":
+            text = await run_in_process(ocr_image, prepared["binary"])
+        else:
+            text = await self._extract_with_vision(user_id, prepared["image"])
+
+        logger.info("Image text extracted", engine=self.engine, length=len(text))
+        return text
+
+    async def _extract_with_vision(self, user_id: str, png: bytes) -> str:
+        """Transcribe the image with a vision-capable LLM"""
+        prompt = """Transcribe all handwritten or printed text in this image (notes, whiteboards, lists, sticky notes).
+
+Preserve line breaks and list structure. Return ONLY the transcribed text, or an empty response if there is no text."""
+
+        messages = [Message(role="user", content=prompt, images=[png])]
+
+        response = await self.llm_service.generate(
+            messages=messages, temperature=0, max_tokens=1500, user_id=user_id
+        )
+        return response.strip()
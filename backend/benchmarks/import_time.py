@@ -0,0 +1,120 @@
+"""
+Cold-Start Import-Time Benchmark
+
+Imports main:app in fresh interpreters and reports startup milliseconds,
+plus the modules that contribute most, so eager imports that creep back in
+show up as a regression.
+
+Usage:
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --max-ms 1000 --json startup.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.loadtest import BENCHMARK_ENVIRONMENT
+
+# Importing any of these at startup means a lazy import regressed
+DEFERRED_MODULES = ["anthropic", "openai", "supabase", "redis"]
+
+_PROBE = (
+    "import sys, time; started = time.perf_counter(); import main; "
+    "elapsed = time.perf_counter() - started; "
+    "print(elapsed * 1000); "
+    f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+)
+
+
+def _environment() -> Dict[str, str]:
+    env = dict(BENCHMARK_ENVIRONMENT)
+    env.update(os.environ)
+    return env
+
+
+def measure_import(cwd: str) -> Dict[str, Any]:
+    """Import main in a fresh interpreter and time it"""
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=cwd,
+        env=_environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+    return {
+        "milliseconds": float(output[-2]),
+        "eager_modules": [m for m in output[-1].split(",") if m],
+    }
+
+
+def slowest_modules(cwd: str, top: int) -> List[Dict[str, Any]]:
+    """main's direct imports ranked by cumulative import time (-X importtime)"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=cwd,
+        env=_environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nesting is shown as two spaces of indent per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1 and cumulative.strip().isdigit():
+            modules.append({"module": name.strip(), "milliseconds": int(cumulative) / 1000})
+    modules.sort(key=lambda m: m["milliseconds"], reverse=True)
+    return modules[:top]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    parser.add_argument("--max-ms", type=float, help="fail if the median exceeds this")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = [measure_import(cwd) for _ in range(args.runs)]
+    timings = [run["milliseconds"] for run in runs]
+    report = {
+        "runs": args.runs,
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "eager_modules": runs[-1]["eager_modules"],
+        "slowest_modules": slowest_modules(cwd, args.top),
+    }
+
+    print(
+        f"import main: median {report['median_ms']}ms "
+        f"(min {report['min_ms']}ms, max {report['max_ms']}ms over {args.runs} runs)"
+    )
+    for module in report["slowest_modules"]:
+        print(f"  {module['milliseconds']:>9.1f}ms  {module['module']}")
+    if report["eager_modules"]:
+        print(f"eagerly imported: {', '.join(report['eager_modules'])}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = bool(report["eager_modules"])
+    if args.max_ms is not None and report["median_ms"] > args.max_ms:
+        print(f"REGRESSION median {report['median_ms']}ms exceeds {args.max_ms}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
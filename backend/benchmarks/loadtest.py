@@ -0,0 +1,378 @@
+"""
+Offline Load-Testing Harness
+
+Boots main:app in-process against the in-memory Supabase stand-in and a
+fake LLM provider, drives mixed traffic (task CRUD, schedule generation,
+ingestion) at a fixed concurrency and reports RPS and p50/p95/p99 per route.
+
+Usage:
+    python -m benchmarks.loadtest --duration 30 --concurrency 50 --users 20
+    python -m benchmarks.loadtest --llm-latency uniform:200-1200 --json run.json
+    python -m benchmarks.loadtest --baseline run.json --max-regression 0.2
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from unittest import mock
+from datetime import date, datetime, timedelta
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Settings the app needs to import, plus gateway limits loose enough that
+# the harness measures the app rather than its own rate limiting
+BENCHMARK_ENVIRONMENT = {
+    "SECRET_KEY": "benchmark",
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "benchmark",
+    "SUPABASE_ANON_KEY": "benchmark",
+    "ANTHROPIC_API_KEY": "benchmark",
+    "OPENAI_API_KEY": "benchmark",
+    "DEBUG": "false",
+    "LOG_LEVEL": "WARNING",
+    "LLM_USER_RATE_PER_MINUTE": "100000",
+    "LLM_USER_BURST": "1000",
+    "LLM_MAX_QUEUE": "100000",
+}
+
+
+@dataclass
+class LoadTestConfig:
+    duration: float = 10.0
+    concurrency: int = 20
+    users: int = 10
+    tasks_per_user: int = 50
+    llm_latency: str = "lognormal:800,0.4"
+    seed: int = 42
+
+
+@dataclass
+class UserState:
+    user_id: str
+    task_ids: List[str] = field(default_factory=list)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer token-{self.user_id}"}
+
+
+@contextmanager
+def boot_app(llm_latency: str, seed: Optional[int] = None):
+    """
+    Import main:app wired to the offline stand-ins
+
+    Everything patched here is restored on exit, so the harness can run
+    inside a process (such as the test suite) that keeps using the app.
+    """
+    with ExitStack() as patches:
+        patches.enter_context(
+            mock.patch.dict(
+                os.environ,
+                {k: v for k, v in BENCHMARK_ENVIRONMENT.items() if k not in os.environ},
+            )
+        )
+
+        import main
+        from app.services.llm_gateway import llm_gateway
+        from app.services.llm_provider import LLMService
+        from benchmarks.stand_ins import FakeLLMProvider, InMemorySupabase, LatencyModel
+
+        provider = FakeLLMProvider(LatencyModel(llm_latency, seed))
+        db = InMemorySupabase()
+
+        patches.enter_context(
+            mock.patch.object(
+                LLMService, "_initialize_provider", lambda self, provider_type: provider
+            )
+        )
+
+        # The app may already have been imported with production limits
+        limits = BENCHMARK_ENVIRONMENT
+        for name, value in (
+            ("user_rate", float(limits["LLM_USER_RATE_PER_MINUTE"]) / 60),
+            ("user_burst", int(limits["LLM_USER_BURST"])),
+            ("max_queue", int(limits["LLM_MAX_QUEUE"])),
+            ("_buckets", {}),
+        ):
+            patches.enter_context(mock.patch.object(llm_gateway, name, value))
+
+        for name, module in list(sys.modules.items()):
+            if not (name == "main" or name.startswith("app.")):
+                continue
+            if hasattr(module, "supabase_client"):
+                patches.enter_context(mock.patch.object(module, "supabase_client", db))
+            service = getattr(module, "ingestion_service", None)
+            if service is not None:
+                patches.enter_context(
+                    mock.patch.object(service.llm_service, "_provider", provider)
+                )
+
+        yield main.app, db, provider
+
+
+def seed_data(db, config: LoadTestConfig, rng: random.Random) -> List[UserState]:
+    """Create users with preferences and a backlog of pending tasks"""
+    users = []
+    for u in range(config.users):
+        user = UserState(user_id=f"bench-user-{u}")
+        db.table("user_preferences").insert({"user_id": user.user_id}).execute()
+        rows = [
+            {
+                "user_id": user.user_id,
+                "title": f"Seed task {i}",
+                "description": "Seeded by the load-test harness",
+                "priority": rng.choice(["low", "medium", "high", "urgent"]),
+                "status": "pending",
+                "estimated_duration": rng.choice([15, 30, 45, 60, 90]),
+            }
+            for i in range(config.tasks_per_user)
+        ]
+        user.task_ids = [row["id"] for row in db.table("tasks").insert(rows).execute().data]
+        users.append(user)
+    return users
+
+
+Scenario = Callable[[Any, UserState, random.Random], Awaitable[Tuple[str, Any]]]
+
+
+async def list_tasks(client, user, rng):
+    return "GET /tasks", await client.get("/api/v1/tasks", headers=user.headers)
+
+
+async def get_task(client, user, rng):
+    task_id = rng.choice(user.task_ids)
+    return "GET /tasks/{id}", await client.get(f"/api/v1/tasks/{task_id}", headers=user.headers)
+
+
+async def create_task(client, user, rng):
+    start = datetime(2024, 1, 1, 9) + timedelta(minutes=15 * rng.randint(0, 2000))
+    response = await client.post(
+        "/api/v1/tasks",
+        headers=user.headers,
+        json={
+            "title": f"Load test task {rng.randint(0, 10**6)}",
+            "priority": rng.choice(["low", "medium", "high"]),
+            "estimated_duration": 30,
+            "scheduled_start": start.isoformat(),
+            "scheduled_end": (start + timedelta(minutes=30)).isoformat(),
+        },
+    )
+    if response.status_code == 201:
+        user.task_ids.append(response.json()["id"])
+    return "POST /tasks", response
+
+
+async def update_task(client, user, rng):
+    task_id = rng.choice(user.task_ids)
+    response = await client.patch(
+        f"/api/v1/tasks/{task_id}",
+        headers=user.headers,
+        json={"priority": rng.choice(["low", "medium", "high", "urgent"])},
+    )
+    return "PATCH /tasks/{id}", response
+
+
+async def list_conflicts(client, user, rng):
+    response = await client.get(
+        "/api/v1/tasks/conflicts",
+        headers=user.headers,
+        params={"from": "2024-01-01T00:00:00", "to": "2024-02-01T00:00:00"},
+    )
+    return "GET /tasks/conflicts", response
+
+
+async def list_notes(client, user, rng):
+    return "GET /notes", await client.get("/api/v1/notes", headers=user.headers)
+
+
+async def get_schedule(client, user, rng):
+    day = date(2024, 1, 1) + timedelta(days=rng.randint(0, 6))
+    return "GET /schedule/{date}", await client.get(
+        f"/api/v1/schedule/{day}", headers=user.headers
+    )
+
+
+async def generate_schedule(client, user, rng):
+    day = date(2024, 1, 1) + timedelta(days=rng.randint(0, 6))
+    response = await client.post(
+        "/api/v1/schedule/generate",
+        headers=user.headers,
+        json={"date": str(day), "force_regenerate": rng.random() < 0.3},
+    )
+    return "POST /schedule/generate", response
+
+
+async def ingest_text(client, user, rng):
+    response = await client.post(
+        "/api/v1/ingestion/text",
+        headers=user.headers,
+        data={"content": f"Meeting notes {rng.randint(0, 10**6)}: send the report, book a room."},
+    )
+    return "POST /ingestion/text", response
+
+
+# (scenario, relative weight) — read-heavy, like real client traffic
+TRAFFIC_MIX: List[Tuple[Scenario, int]] = [
+    (list_tasks, 25),
+    (get_task, 15),
+    (create_task, 10),
+    (update_task, 15),
+    (list_conflicts, 5),
+    (list_notes, 10),
+    (get_schedule, 10),
+    (generate_schedule, 5),
+    (ingest_text, 5),
+]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Any]:
+    """Aggregate (route, status, seconds) samples into a per-route report"""
+    by_route: Dict[str, List[Tuple[int, float]]] = {}
+    for route, status_code, latency in samples:
+        by_route.setdefault(route, []).append((status_code, latency))
+
+    routes = {}
+    for route, results in sorted(by_route.items()):
+        latencies = sorted(latency for _, latency in results)
+        routes[route] = {
+            "requests": len(results),
+            "errors": sum(1 for code, _ in results if code >= 400 and code != 404),
+            "rps": round(len(results) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        }
+
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "routes": routes,
+    }
+
+
+async def run_load_test(config: LoadTestConfig) -> Dict[str, Any]:
+    """Boot the app, seed data, drive traffic and return the report"""
+    rng = random.Random(config.seed)
+    with boot_app(config.llm_latency, config.seed) as (app, db, provider):
+        users = seed_data(db, config, rng)
+        samples, elapsed = await drive_traffic(app, config, users, rng)
+
+    report = summarize(samples, elapsed)
+    report["config"] = config.__dict__
+    report["llm_calls"] = provider.calls
+    return report
+
+
+async def drive_traffic(
+    app, config: LoadTestConfig, users: List[UserState], rng: random.Random
+) -> Tuple[List[Tuple[str, int, float]], float]:
+    """Run the traffic mix for the configured duration"""
+    import httpx
+
+    scenarios = [scenario for scenario, _ in TRAFFIC_MIX]
+    weights = [weight for _, weight in TRAFFIC_MIX]
+    samples: List[Tuple[str, int, float]] = []
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            deadline = time.perf_counter() + config.duration
+
+            async def worker(worker_rng: random.Random):
+                while time.perf_counter() < deadline:
+                    scenario = worker_rng.choices(scenarios, weights)[0]
+                    user = worker_rng.choice(users)
+                    started = time.perf_counter()
+                    route, response = await scenario(client, user, worker_rng)
+                    samples.append((route, response.status_code, time.perf_counter() - started))
+
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(worker(random.Random(rng.random())) for _ in range(config.concurrency))
+            )
+            elapsed = time.perf_counter() - started
+
+    return samples, elapsed
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """List routes whose p95 latency or throughput regressed past the threshold"""
+    regressions = []
+    for route, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{route}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["rps"] < previous["rps"] * (1 - max_regression):
+            regressions.append(f"{route}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    header = f"{'route':<28}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:<28}{stats['requests']:>8}{stats['errors']:>8}{stats['rps']:>10}"
+            f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        )
+    print("-" * len(header))
+    print(
+        f"total {report['requests']} requests in {report['elapsed_seconds']}s "
+        f"({report['rps']} rps), {report['llm_calls']} LLM calls"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks-per-user", type=int, default=50)
+    parser.add_argument("--llm-latency", default="lognormal:800,0.4", help="fixed:MS | uniform:LO-HI | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json report")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    config = LoadTestConfig(
+        duration=args.duration,
+        concurrency=args.concurrency,
+        users=args.users,
+        tasks_per_user=args.tasks_per_user,
+        llm_latency=args.llm_latency,
+        seed=args.seed,
+    )
+    report = asyncio.run(run_load_test(config))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+"""
+Offline Stand-Ins for Supabase and LLM Providers
+
+An in-memory PostgREST-style client that supports the query builder
+surface the app uses, and an LLM provider with configurable latency that
+returns well-formed scheduling and extraction responses.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime
+from app.services.llm_provider import BaseLLMProvider, Message
+import asyncio
+import copy
+import json
+import random
+import re
+import uuid
+
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "tasks": {
+        "priority": "medium",
+        "status": "pending",
+        "tags": [],
+        "metadata": {},
+        "recurrence_rule": None,
+    },
+    "notes": {"source_type": "text", "extracted_tasks": [], "metadata": {}},
+    "schedules": {"tasks": [], "metadata": {}},
+    "user_preferences": {
+        "work_hours_start": "09:00:00",
+        "work_hours_end": "17:00:00",
+        "work_days": [1, 2, 3, 4, 5],
+        "preferred_break_duration": 15,
+        "calendar_sync_enabled": False,
+        "calendar_providers": [],
+    },
+}
+
+# text[] columns: Postgres stores non-string elements as their JSON text
+TEXT_ARRAY_COLUMNS = {"notes": ["extracted_tasks"]}
+
+
+class FakeResponse:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Chainable query mirroring postgrest's request builders"""
+
+    def __init__(self, db: "InMemorySupabase", table: str):
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.count_mode: Optional[str] = None
+        self.payload: Any = None
+        self.on_conflict = ""
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.orders: List = []
+        self.offset = 0
+        self.max_rows: Optional[int] = None
+        self._negate = False
+
+    # Operations
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.columns, self.count_mode = columns, count
+        return self
+
+    def insert(self, payload):
+        self.operation, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = ""):
+        self.operation, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def update(self, payload):
+        self.operation, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    # Filters
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _filter(self, predicate: Callable[[Dict[str, Any]], bool]):
+        if self._negate:
+            self.filters.append(lambda row: not predicate(row))
+            self._negate = False
+        else:
+            self.filters.append(predicate)
+        return self
+
+    def or_(self, filters: str):
+        """PostgREST or=(...): comma-separated column.operator.value conditions"""
+        predicates = []
+        for condition in filters.split(","):
+            column, operator, value = condition.split(".", 2)
+            probe = FakeQuery(self.db, self.table)
+            getattr(probe, "is_" if operator == "is" else operator)(column, value)
+            predicates.extend(probe.filters)
+        return self._filter(lambda row: any(p(row) for p in predicates))
+
+    def eq(self, column, value):
+        return self._filter(lambda row: _compare(_field(row, column), value) == 0)
+
+    def neq(self, column, value):
+        return self._filter(lambda row: _compare(_field(row, column), value) != 0)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: _compare(_field(row, column), value) > 0)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: _compare(_field(row, column), value) >= 0)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: _compare(_field(row, column), value) < 0)
+
+    def lte(self, column, value):
+        return self._filter(lambda row: _compare(_field(row, column), value) <= 0)
+
+    def in_(self, column, values):
+        values = [str(v) for v in values]
+        return self._filter(lambda row: str(_field(row, column)) in values)
+
+    def is_(self, column, value):
+        if value in ("null", None):
+            return self._filter(lambda row: _field(row, column) is None)
+        return self._filter(lambda row: _field(row, column) is value)
+
+    # Modifiers
+    def order(self, column, desc: bool = False):
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset, self.max_rows = start, end - start + 1
+        return self
+
+    def limit(self, size: int):
+        self.max_rows = size
+        return self
+
+    def execute(self) -> FakeResponse:
+        return getattr(self.db, f"_{self.operation}")(self)
+
+
+class FakeRPC:
+    def __init__(self, db: "InMemorySupabase", name: str, params: Dict[str, Any]):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self) -> FakeResponse:
+        if self.name not in self.db.functions:
+            raise ValueError(f"Unknown RPC function: {self.name}")
+        return FakeResponse(self.db.functions[self.name](self.db, self.params))
+
+
+class _FakeUser:
+    def __init__(self, user_id: str):
+        self.id = user_id
+
+    def model_dump(self) -> Dict[str, Any]:
+        return {"id": self.id, "email": f"{self.id}@example.com", "user_metadata": {}}
+
+
+class _FakeUserResponse:
+    def __init__(self, user: Optional[_FakeUser]):
+        self.user = user
+
+
+class FakeAuth:
+    """Accepts bearer tokens of the form `token-<user_id>`"""
+
+    def get_user(self, token: str) -> _FakeUserResponse:
+        if not token.startswith("token-"):
+            raise ValueError("Invalid token")
+        return _FakeUserResponse(_FakeUser(token[len("token-") :]))
+
+    def sign_out(self):
+        pass
+
+
+class InMemorySupabase:
+    """Drop-in replacement for the supabase Client backed by Python lists"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.functions: Dict[str, Callable[["InMemorySupabase", Dict], List]] = {}
+        self.auth = FakeAuth()
+        # PostgREST's db-max-rows: selects return at most this many rows
+        self.max_rows = 1000
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> FakeRPC:
+        return FakeRPC(self, name, params or {})
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+    def _matching(self, query: FakeQuery) -> List[Dict[str, Any]]:
+        return [row for row in self.rows(query.table) if all(f(row) for f in query.filters)]
+
+    def _select(self, query: FakeQuery) -> FakeResponse:
+        rows = self._matching(query)
+        count = len(rows) if query.count_mode else None
+        for column, desc in reversed(query.orders):
+            rows.sort(key=lambda row: _sort_key(row.get(column)), reverse=desc)
+        limit = min(query.max_rows or self.max_rows, self.max_rows)
+        rows = rows[query.offset : query.offset + limit]
+        return FakeResponse([_project(row, query.columns) for row in rows], count)
+
+    def _new_row(self, table: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.utcnow().isoformat()
+        row = copy.deepcopy(TABLE_DEFAULTS.get(table, {}))
+        row.update({"id": str(uuid.uuid4()), "created_at": now, "updated_at": now})
+        row.update(copy.deepcopy(values))
+        for column in TEXT_ARRAY_COLUMNS.get(table, []):
+            if row.get(column):
+                row[column] = [
+                    item if isinstance(item, str) else json.dumps(item) for item in row[column]
+                ]
+        return row
+
+    def _insert(self, query: FakeQuery) -> FakeResponse:
+        payload = query.payload if isinstance(query.payload, list) else [query.payload]
+        rows = [self._new_row(query.table, values) for values in payload]
+        self.rows(query.table).extend(rows)
+        return FakeResponse(copy.deepcopy(rows))
+
+    def _upsert(self, query: FakeQuery) -> FakeResponse:
+        payload = query.payload if isinstance(query.payload, list) else [query.payload]
+        keys = [k.strip() for k in query.on_conflict.split(",") if k.strip()] or ["id"]
+        written = []
+        for values in payload:
+            existing = next(
+                (
+                    row
+                    for row in self.rows(query.table)
+                    if all(str(row.get(k)) == str(values.get(k)) for k in keys)
+                ),
+                None,
+            )
+            if existing is None:
+                existing = self._new_row(query.table, values)
+                self.rows(query.table).append(existing)
+            else:
+                existing.update(copy.deepcopy(values))
+            written.append(copy.deepcopy(existing))
+        return FakeResponse(written)
+
+    def _update(self, query: FakeQuery) -> FakeResponse:
+        rows = self._matching(query)
+        for row in rows:
+            row.update(copy.deepcopy(query.payload))
+        return FakeResponse(copy.deepcopy(rows))
+
+    def _delete(self, query: FakeQuery) -> FakeResponse:
+        rows = self._matching(query)
+        doomed = {id(row) for row in rows}
+        self.tables[query.table] = [r for r in self.rows(query.table) if id(r) not in doomed]
+        return FakeResponse(copy.deepcopy(rows))
+
+
+def _field(row: Dict[str, Any], column: str) -> Any:
+    """A column's value, or a JSON field's as text for column->>field"""
+    name, arrow, key = column.partition("->>")
+    value = row.get(name)
+    if not arrow:
+        return value
+    value = value.get(key) if isinstance(value, dict) else None
+    return value if value is None or isinstance(value, str) else json.dumps(value)
+
+
+def _compare(left: Any, right: Any) -> int:
+    if left is None or right is None:
+        return 0 if left is right else -1
+    if isinstance(left, (int, float)) and not isinstance(right, (int, float)):
+        right = float(right)
+    elif not isinstance(left, (int, float)):
+        left, right = str(left), str(right)
+    return (left > right) - (left < right)
+
+
+def _sort_key(value: Any):
+    return (value is None, str(value) if not isinstance(value, (int, float)) else value)
+
+
+def _project(row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+    if columns.strip() == "*":
+        return copy.deepcopy(row)
+    names = [c.strip() for c in columns.split(",")]
+    return {name: copy.deepcopy(row.get(name)) for name in names}
+
+
+class LatencyModel:
+    """
+    Samples simulated provider latency in seconds
+
+    Specs: "fixed:200", "uniform:100-400" or "lognormal:300,0.5"
+    (median milliseconds, sigma).
+    """
+
+    def __init__(self, spec: str = "lognormal:800,0.4", seed: Optional[int] = None):
+        self.spec = spec
+        self.kind, _, params = spec.partition(":")
+        self.random = random.Random(seed)
+        if self.kind == "fixed":
+            self.value = float(params)
+        elif self.kind == "uniform":
+            low, high = params.split("-")
+            self.low, self.high = float(low), float(high)
+        elif self.kind == "lognormal":
+            median, sigma = params.split(",")
+            self.median, self.sigma = float(median), float(sigma)
+        else:
+            raise ValueError(f"Unsupported latency distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            milliseconds = self.value
+        elif self.kind == "uniform":
+            milliseconds = self.random.uniform(self.low, self.high)
+        else:
+            milliseconds = self.median * self.random.lognormvariate(0, self.sigma)
+        return milliseconds / 1000
+
+
+class FakeLLMProvider(BaseLLMProvider):
+    """
+    Answers scheduling and extraction prompts after a simulated delay
+
+    Replies use the structured-output shapes; structured calls go through
+    the base class's prompt-and-parse path.
+    """
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+        self.calls = 0
+
+    async def generate(
+        self,
+        messages: List[Message],
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        **kwargs,
+    ) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        prompt = messages[-1].content
+
+        if "schedule" in prompt.lower() and '"id"' in prompt:
+            task_ids = re.findall(r'"id": "([^"]+)"', prompt)
+            slots = []
+            for order, task_id in enumerate(task_ids[:10], start=1):
+                hour = 9 + order - 1
+                slots.append(
+                    {
+                        "task_id": task_id,
+                        "start_time": f"{hour:02d}:00",
+                        "end_time": f"{hour:02d}:45",
+                        "order": order,
+                    }
+                )
+            return json.dumps({"slots": slots})
+
+        if "<note index=" in prompt:
+            count = prompt.count("<note index=")
+            return json.dumps(
+                {"notes": [{"index": i, "tasks": [_extracted_task(i)]} for i in range(count)]}
+            )
+
+        if messages[-1].images:
+            return "Follow up with design review\nSend invoice to client"
+
+        return json.dumps({"tasks": [_extracted_task(0), _extracted_task(1)]})
+
+
+def _extracted_task(i: int) -> Dict[str, Any]:
+    return {
+        "title": f"Extracted task {i}",
+        "description": "Generated by the load-test LLM stand-in",
+        "priority": random.choice(["low", "medium", "high"]),
+        "estimated_duration": random.choice([15, 30, 60]),
+    }
@@ -1,14 +1,28 @@
 """
 FastAPI Application Entry Point
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import math
+import os
 import structlog
 
 from app.core.config import settings
+from app.core.invalidation import invalidation_bus
 from app.core.logging import setup_logging
+from app.core.metrics import metrics
+from app.core.redis import close_redis
+from app.core.supabase import supabase_client
+from app.core.workers import shutdown_process_pool
+from app.services.llm_gateway import LLMGatewayError, llm_gateway
+from app.services.llm_provider import LLMProvider, provider_registry
+from app.services import cache_invalidation
+from app.services.audit import audit_log
+from app.services.schedule_cache import schedule_cache
 from app.api.v1.router import api_router
 
 # Setup logging
@@ -16,12 +30,35 @@ setup_logging()
 logger = structlog.get_logger()
 
 
+def warm_up():
+    """Build the Supabase and LLM SDK clients before the first request"""
+    supabase_client.client
+    try:
+        provider_registry.get(LLMProvider(settings.DEFAULT_LLM_PROVIDER))
+    except Exception as e:
+        logger.warning("LLM provider warm-up failed", error=str(e))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     logger.info("Starting up application", environment=settings.ENVIRONMENT)
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    if settings.WARMUP_ON_STARTUP:
+        await asyncio.to_thread(warm_up)
+        logger.info("Clients warmed up")
+    schedule_cache.start()
+    cache_invalidation.register(invalidation_bus)
+    invalidation_bus.start()
+    audit_log.start()
     yield
     logger.info("Shutting down application")
+    await audit_log.stop()
+    await invalidation_bus.stop()
+    await schedule_cache.stop()
+    shutdown_process_pool()
+    await provider_registry.aclose()
+    await close_redis()
 
 
 # Create FastAPI app
@@ -51,6 +88,16 @@ app.add_middleware(GZipMiddleware, minimum_size=1000)
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
 
+@app.exception_handler(LLMGatewayError)
+async def llm_gateway_error_handler(request: Request, exc: LLMGatewayError):
+    """Shed LLM work with a fast 429/503 and a Retry-After hint"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -61,6 +108,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Process-local counters and LLM gateway load"""
+    return {"counters": metrics.snapshot(), "llm_gateway": llm_gateway.stats()}
+
+
 if __name__ == "__main__":
     import uvicorn
 
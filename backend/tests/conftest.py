@@ -1,9 +1,53 @@
 """
 Pytest Configuration and Fixtures
 """
+import os
 import pytest
 from fastapi.testclient import TestClient
-from app.main import app
+
+# Required settings, so the app imports without a real .env
+for key in ("SECRET_KEY", "SUPABASE_KEY", "SUPABASE_ANON_KEY", "ANTHROPIC_API_KEY"):
+    os.environ.setdefault(key, "test")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+
+from main import app
+from app.core.supabase import supabase_client
+from app.services.audit import audit_log
+from app.services.schedule_cache import schedule_cache
+from benchmarks.stand_ins import InMemorySupabase
+
+
+@pytest.fixture(autouse=True)
+def clear_schedule_cache():
+    """Cached schedules belong to the test that loaded them"""
+    yield
+    schedule_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_audit_log():
+    """Audit events buffered by one test are not written anywhere"""
+    yield
+    audit_log.clear()
+
+
+@pytest.fixture
+def fake_db_class():
+    """The in-memory database fake_db uses; override to customize it"""
+    return InMemorySupabase
+
+
+@pytest.fixture
+def fake_db(monkeypatch, fake_db_class):
+    """
+    In-memory database behind supabase_client
+
+    Every module imports the same lazy client, so this one patch reaches
+    all of them, including modules imported after the fixture runs.
+    """
+    db = fake_db_class()
+    monkeypatch.setattr(supabase_client, "_client", db)
+    return db
 
 
 @pytest.fixture
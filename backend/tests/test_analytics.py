@@ -0,0 +1,157 @@
+"""
+Tests for Productivity Analytics
+"""
+from datetime import date
+
+from app.core import supabase
+from app.services import analytics
+from app.services.analytics import Interval
+
+HEADERS = {"Authorization": "Bearer token-u1"}
+
+
+def add_task_rollups(db, *rows, user_id="u1"):
+    db.table("task_daily_rollups").insert(
+        [
+            {
+                "user_id": user_id,
+                "day": day,
+                "priority": priority,
+                "completed_count": completed,
+                "minutes_spent": minutes,
+            }
+            for day, priority, completed, minutes in rows
+        ]
+    ).execute()
+
+
+def test_completions_fill_every_period(fake_db):
+    add_task_rollups(
+        fake_db,
+        ("2024-01-01", "high", 2, 90),  # Monday
+        ("2024-01-01", "low", 1, 15),
+        ("2024-01-07", "medium", 3, 120),  # Sunday, same week
+        ("2024-01-16", "high", 1, 30),
+        ("2024-01-03", "high", 5, 0),
+    )
+    add_task_rollups(fake_db, ("2024-01-02", "high", 9, 9), user_id="u2")
+    start, end = date(2024, 1, 1), date(2024, 1, 21)
+
+    daily = analytics.completions("u1", start, end, Interval.DAY)
+    assert len(daily) == 21
+    assert daily[0] == {"period_start": date(2024, 1, 1), "completed": 3}
+    assert daily[1]["completed"] == 0
+
+    weekly = analytics.completions("u1", start, end, Interval.WEEK)
+    assert [(p["period_start"], p["completed"]) for p in weekly] == [
+        (date(2024, 1, 1), 11),
+        (date(2024, 1, 8), 0),
+        (date(2024, 1, 15), 1),
+    ]
+
+    monthly = analytics.completions("u1", date(2023, 12, 15), end, Interval.MONTH)
+    assert [(p["period_start"], p["completed"]) for p in monthly] == [
+        (date(2023, 12, 1), 0),
+        (date(2024, 1, 1), 12),
+    ]
+
+
+def test_weeks_start_on_monday_even_mid_window(fake_db):
+    add_task_rollups(fake_db, ("2024-01-10", "high", 1, 0))  # Wednesday
+
+    [week] = analytics.completions(
+        "u1", date(2024, 1, 10), date(2024, 1, 12), Interval.WEEK
+    )
+    assert week == {"period_start": date(2024, 1, 8), "completed": 1}
+
+
+def test_time_by_priority_pages_through_rollups(fake_db, monkeypatch):
+    monkeypatch.setattr(supabase, "PAGE_SIZE", 2)
+    add_task_rollups(
+        fake_db,
+        ("2024-01-01", "high", 2, 90),
+        ("2024-01-02", "high", 1, 30.25),
+        ("2024-01-02", "urgent", 1, 45),
+        ("2024-01-05", "low", 4, 20),
+        ("2024-02-01", "low", 4, 20),  # outside the window
+    )
+
+    spent = analytics.time_by_priority("u1", date(2024, 1, 1), date(2024, 1, 31))
+
+    assert spent == [
+        {"priority": "urgent", "completed": 1, "minutes": 45.0},
+        {"priority": "high", "completed": 3, "minutes": 120.2},
+        {"priority": "medium", "completed": 0, "minutes": 0.0},
+        {"priority": "low", "completed": 4, "minutes": 20.0},
+    ]
+
+
+def test_adherence_rates(fake_db):
+    fake_db.table("schedule_daily_rollups").insert(
+        [
+            {
+                "user_id": "u1",
+                "day": "2024-01-01",
+                "scheduled_count": 4,
+                "completed_count": 3,
+                "started_count": 4,
+                "on_time_count": 2,
+                "start_delay_minutes": 40,
+            },
+            {
+                "user_id": "u1",
+                "day": "2024-01-02",
+                "scheduled_count": 2,
+                "completed_count": 0,
+                "started_count": 0,
+                "on_time_count": 0,
+                "start_delay_minutes": 0,
+            },
+        ]
+    ).execute()
+
+    first, second, idle = analytics.adherence(
+        "u1", date(2024, 1, 1), date(2024, 1, 3), Interval.DAY
+    )
+
+    assert first["completion_rate"] == 0.75
+    assert first["on_time_rate"] == 0.5
+    assert first["average_start_delay_minutes"] == 10.0
+    assert second["completion_rate"] == 0.0
+    assert second["on_time_rate"] is None
+    assert idle["scheduled"] == 0
+    assert idle["completion_rate"] is None
+
+
+def test_endpoints(client, fake_db):
+    add_task_rollups(fake_db, ("2024-03-04", "medium", 2, 50))
+
+    response = client.get(
+        "/api/v1/analytics/completions",
+        params={"from": "2024-03-01", "to": "2024-03-31", "interval": "month"},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "interval": "month",
+        "points": [{"period_start": "2024-03-01", "completed": 2}],
+        "total": 2,
+    }
+
+    response = client.get(
+        "/api/v1/analytics/adherence",
+        params={"from": "2024-03-01", "to": "2024-03-10"},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    assert [p["period_start"] for p in response.json()["points"]] == [
+        "2024-02-26",
+        "2024-03-04",
+    ]
+
+    response = client.get(
+        "/api/v1/analytics/time-by-priority",
+        params={"from": "2022-01-01", "to": "2024-03-31"},
+        headers=HEADERS,
+    )
+    assert response.status_code == 400
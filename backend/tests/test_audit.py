@@ -0,0 +1,123 @@
+"""
+Tests for the Buffered Audit Log Writer
+"""
+import asyncio
+
+import pytest
+
+from app.services import task_similarity
+from app.services.audit import AuditWriter, audit_log
+from app.services.interval_index import schedule_conflict_index
+from benchmarks.stand_ins import InMemorySupabase
+
+HEADERS = {"Authorization": "Bearer token-u1"}
+
+
+class AuditDatabase(InMemorySupabase):
+    """Records the size of every insert, and can fail the first few"""
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.inserts = []
+        self.failures = failures
+
+    def _insert(self, query):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        self.inserts.append(len(query.payload))
+        return super()._insert(query)
+
+
+@pytest.fixture
+def fake_db_class():
+    return AuditDatabase
+
+
+def writer(**options):
+    settings = {
+        "capacity": 100,
+        "batch_size": 10,
+        "flush_interval": 60,
+        "enqueue_timeout": 0.01,
+        **options,
+    }
+    return AuditWriter(**settings)
+
+
+async def record(log, count):
+    return [await log.record("update", "task", "u1", f"t{i}") for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_full_batches_are_written_without_waiting(fake_db):
+    log = writer()
+    log.start()
+    await record(log, 10)
+    await asyncio.sleep(0.05)
+    assert fake_db.inserts == [10]
+
+    # A partial batch waits for the interval, or for shutdown
+    await record(log, 5)
+    await asyncio.sleep(0.05)
+    assert fake_db.inserts == [10]
+    assert len(log) == 5
+
+    await log.stop()
+    assert fake_db.inserts == [10, 5]
+    assert [row["entity_id"] for row in fake_db.rows("audit_logs")][:2] == ["t0", "t1"]
+
+
+@pytest.mark.asyncio
+async def test_partial_batches_are_written_after_the_interval(fake_db):
+    log = writer(flush_interval=0.05)
+    log.start()
+    await record(log, 3)
+
+    await asyncio.sleep(0.2)
+    assert fake_db.inserts == [3]
+    await log.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_events_after_waiting(fake_db):
+    log = writer(capacity=5)
+    assert await record(log, 7) == [True] * 5 + [False] * 2
+
+    # With the flusher running, a full buffer waits for room instead
+    log.start()
+    assert await record(log, 5) == [True] * 5
+    await log.stop()
+    assert sum(fake_db.inserts) == 10
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_retried_then_dropped(fake_db):
+    fake_db.failures = 1
+    log = writer(max_retries=1)
+    await record(log, 3)
+    await log.flush()
+    assert fake_db.inserts == [3]
+
+    fake_db.failures = 2
+    await record(log, 3)
+    await log.flush()
+    assert fake_db.inserts == [3]
+    assert len(log) == 0
+
+
+def test_mutations_enqueue_events(client, fake_db):
+    response = client.post("/api/v1/tasks", json={"title": "Audit me"}, headers=HEADERS)
+    assert response.status_code == 201
+    schedule_conflict_index.evict("u1")
+    task_similarity.task_similarity_index.evict("u1")
+
+    [event] = audit_log._buffer
+    assert event["action"] == "create"
+    assert event["entity_type"] == "task"
+    assert event["entity_id"] == response.json()["id"]
+    assert event["user_id"] == "u1"
+    assert event["changes"]["title"] == "Audit me"
+    # The test client's host is not an address the INET column accepts
+    assert event["ip_address"] is None
+    assert event["user_agent"] == "testclient"
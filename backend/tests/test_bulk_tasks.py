@@ -0,0 +1,150 @@
+"""
+Tests for Bulk Task Operations
+"""
+import pytest
+from app.services import task_graph, task_similarity
+from app.services.interval_index import schedule_conflict_index
+
+HEADERS = {"Authorization": "Bearer token-u1"}
+
+
+def fake_bulk_task_operations(db, params):
+    """Mimics bulk_task_operations: one result per operation, in order"""
+    user_id, results = params["p_user_id"], []
+    for item, operation in enumerate(params["p_operations"]):
+        op, data = operation["op"], operation.get("data", {})
+        table = db.table("tasks")
+        if op == "create":
+            task = table.insert({**data, "user_id": user_id}).execute().data[0]
+        else:
+            query = table.update(data) if op == "update" else table.delete()
+            written = query.eq("id", operation["id"]).eq("user_id", user_id).execute()
+            task = written.data[0] if written.data else None
+        outcome = {"create": "created", "update": "updated", "delete": "deleted"}[op]
+        results.append(
+            {
+                "item": item,
+                "op": op,
+                "outcome": outcome if task else "not_found",
+                "task": task,
+            }
+        )
+    return results
+
+
+@pytest.fixture(autouse=True)
+def bulk_task_operations(fake_db):
+    fake_db.functions["bulk_task_operations"] = fake_bulk_task_operations
+    yield
+    schedule_conflict_index.evict("u1")
+    task_similarity.task_similarity_index.evict("u1")
+    task_graph.task_dependency_index.evict("u1")
+
+
+def add_task(db, user_id="u1", **values):
+    return (
+        db.table("tasks")
+        .insert({"user_id": user_id, "title": "Existing", "status": "pending", **values})
+        .execute()
+        .data[0]
+    )
+
+
+def test_mixed_operations_report_per_item_results(client, fake_db):
+    done, doomed = add_task(fake_db), add_task(fake_db)
+    theirs = add_task(fake_db, user_id="u2")
+
+    response = client.post(
+        "/api/v1/tasks/bulk",
+        headers=HEADERS,
+        json={
+            "operations": [
+                {"op": "create", "task": {"title": "New"}},
+                {"op": "update", "id": done["id"], "changes": {"status": "completed"}},
+                {"op": "delete", "id": doomed["id"]},
+                {"op": "update", "id": theirs["id"], "changes": {"title": "Mine now"}},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["index"], r["status"]) for r in results] == [
+        (0, "created"),
+        (1, "updated"),
+        (2, "deleted"),
+        (3, "not_found"),
+    ]
+    assert results[0]["task"]["title"] == "New"
+    assert results[1]["task"]["status"] == "completed"
+    assert results[3]["task"] is None
+    assert {row["title"] for row in fake_db.rows("tasks")} == {"New", "Existing"}
+    [untouched] = [r for r in fake_db.rows("tasks") if r["id"] == theirs["id"]]
+    assert untouched["title"] == "Existing"
+
+
+def test_updates_send_only_the_fields_that_were_set(client, fake_db):
+    captured = []
+    fake_db.functions["bulk_task_operations"] = (
+        lambda db, params: captured.append(params) or []
+    )
+
+    client.post(
+        "/api/v1/tasks/bulk",
+        headers=HEADERS,
+        json={"operations": [{"op": "update", "id": "t1", "changes": {"priority": "high"}}]},
+    )
+
+    [params] = captured
+    assert params["p_user_id"] == "u1"
+    assert params["p_operations"] == [
+        {"op": "update", "id": "t1", "data": {"priority": "high"}}
+    ]
+
+
+def test_bulk_writes_keep_conflicts_current(client, fake_db):
+    slot = {
+        "scheduled_start": "2024-01-08T09:00:00+00:00",
+        "scheduled_end": "2024-01-08T10:00:00+00:00",
+    }
+    response = client.post(
+        "/api/v1/tasks/bulk",
+        headers=HEADERS,
+        json={
+            "operations": [
+                {"op": "create", "task": {"title": "A", **slot}},
+                {"op": "create", "task": {"title": "B", **slot}},
+            ]
+        },
+    )
+    first, second = response.json()["results"]
+    assert [c["conflicting_task_id"] for c in second["task"]["conflicts"]] == [
+        first["task"]["id"]
+    ]
+
+    client.post(
+        "/api/v1/tasks/bulk",
+        headers=HEADERS,
+        json={"operations": [{"op": "delete", "id": first["task"]["id"]}]},
+    )
+    assert schedule_conflict_index.conflicts_in_range(
+        "u1", "2024-01-08T00:00:00+00:00", "2024-01-09T00:00:00+00:00"
+    ) == []
+
+
+@pytest.mark.parametrize(
+    "operations",
+    [
+        [],
+        [{"op": "create"}],
+        [{"op": "update", "id": "t1"}],
+        [{"op": "delete"}],
+        [{"op": "delete", "id": "t1"}, {"op": "update", "id": "t1", "changes": {}}],
+        [{"op": "delete", "id": f"t{i}"} for i in range(1000)],
+    ],
+)
+def test_malformed_requests_are_rejected(client, fake_db, operations):
+    response = client.post(
+        "/api/v1/tasks/bulk", headers=HEADERS, json={"operations": operations}
+    )
+    assert response.status_code == 422
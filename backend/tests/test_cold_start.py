@@ -0,0 +1,48 @@
+"""
+Tests for Lazy Imports and Client Construction
+"""
+import os
+from app.core.supabase import LazySupabaseClient
+from app.services.llm_provider import LLMProvider, LLMService
+from benchmarks.import_time import measure_import
+
+
+def test_importing_app_defers_sdks():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert measure_import(backend_dir)["eager_modules"] == []
+
+
+def test_llm_provider_built_on_first_use(monkeypatch):
+    built = []
+    monkeypatch.setattr(
+        LLMService, "_initialize_provider", lambda self, provider: built.append(provider) or object()
+    )
+
+    service = LLMService(provider=LLMProvider.ANTHROPIC)
+    assert built == []
+
+    first = service.provider
+    assert service.provider is first
+    assert built == [LLMProvider.ANTHROPIC]
+
+    service.switch_provider(LLMProvider.OPENAI)
+    service.provider
+    assert built == [LLMProvider.ANTHROPIC, LLMProvider.OPENAI]
+
+
+def test_supabase_client_created_once(monkeypatch):
+    created = []
+
+    class Client:
+        def table(self, name):
+            return name
+
+    monkeypatch.setattr(
+        "app.core.supabase.get_supabase_client", lambda: created.append(1) or Client()
+    )
+
+    client = LazySupabaseClient()
+    assert created == []
+    assert client.table("tasks") == "tasks"
+    assert client.table("notes") == "notes"
+    assert created == [1]
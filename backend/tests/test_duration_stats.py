@@ -0,0 +1,126 @@
+"""
+Tests for Learned Duration Estimates
+"""
+import statistics
+
+import pytest
+
+from app.services import duration_stats
+from app.services.ai_scheduler import AIScheduler
+from app.services.duration_stats import ANY, Bucket, DurationModel
+
+
+def bucket_row(priority, tag, ratios, user_id="u1"):
+    """What the trigger's Welford updates leave behind for these samples"""
+    count, mean, m2 = 0, 0.0, 0.0
+    for x in ratios:
+        count += 1
+        delta = x - mean
+        mean += delta / count
+        m2 += delta * (x - mean)
+    return {
+        "user_id": user_id,
+        "priority": priority,
+        "tag": tag,
+        "sample_count": count,
+        "mean_ratio": mean,
+        "m2": m2,
+    }
+
+
+def task(priority="high", tags=(), estimated_duration=60):
+    return {
+        "id": "t1",
+        "title": "Write report",
+        "priority": priority,
+        "tags": list(tags),
+        "estimated_duration": estimated_duration,
+    }
+
+
+def test_running_statistics_match_the_samples():
+    ratios = [1.0, 1.5, 2.0, 1.25, 1.75]
+    row = bucket_row("high", ANY, ratios)
+    bucket = Bucket(row["sample_count"], row["mean_ratio"], row["m2"])
+
+    assert bucket.mean_ratio == pytest.approx(statistics.mean(ratios))
+    assert bucket.variance == pytest.approx(statistics.variance(ratios))
+
+
+def test_most_specific_bucket_with_enough_samples_wins():
+    model = DurationModel(
+        [
+            bucket_row(ANY, ANY, [1.1] * 20),
+            bucket_row("high", ANY, [1.5] * 10),
+            bucket_row("high", "writing", [2.0] * 2),
+            bucket_row(ANY, "writing", [1.8] * 8),
+        ],
+        min_samples=5,
+    )
+
+    # Too few high-priority writing tasks: fall back to the priority
+    assert model.ratio(task("high", ["writing"])) == pytest.approx(1.5)
+    assert model.expected_duration(task("high", ["writing"])) == 90
+    # No low-priority bucket: the tag, then everything
+    assert model.ratio(task("low", ["writing"])) == pytest.approx(1.8)
+    assert model.ratio(task("low")) == pytest.approx(1.1)
+    # A new user's estimates are used as they are
+    assert DurationModel().expected_duration(task(estimated_duration=45)) == 45
+
+
+def test_the_most_consistent_tag_wins():
+    model = DurationModel(
+        [
+            bucket_row("high", "email", [0.5, 3.0, 1.0, 2.5, 0.8, 2.2]),
+            bucket_row("high", "writing", [1.9, 2.1, 2.0, 2.0, 1.95, 2.05]),
+        ],
+        min_samples=5,
+    )
+
+    assert model.ratio(task("high", ["email", "writing"])) == pytest.approx(2.0)
+
+
+def test_load_many_groups_rows_by_user(fake_db):
+    fake_db.table("task_duration_stats").insert(
+        [
+            bucket_row(ANY, ANY, [2.0] * 5, user_id="u1"),
+            bucket_row(ANY, ANY, [0.5] * 5, user_id="u2"),
+        ]
+    ).execute()
+
+    models = duration_stats.load_many(["u1", "u2", "u3"])
+
+    assert set(models) == {"u1", "u2"}
+    assert models["u2"].expected_duration(task()) == 30
+    assert duration_stats.load("u3").expected_duration(task()) == 60
+
+
+def test_load_many_reads_past_the_row_cap(fake_db):
+    fake_db.table("task_duration_stats").insert(
+        [
+            bucket_row("high", f"tag-{i}", [2.0] * 5, user_id=f"u{i % 3}")
+            for i in range(fake_db.max_rows + 1)
+        ]
+    ).execute()
+
+    models = duration_stats.load_many(["u0", "u1", "u2"])
+
+    assert sum(len(model._buckets) for model in models.values()) == (
+        fake_db.max_rows + 1
+    )
+
+
+def test_schedules_use_corrected_durations():
+    model = DurationModel([bucket_row(ANY, ANY, [1.5] * 5)], min_samples=5)
+    scheduler = AIScheduler("u1", model)
+    tasks = [task(estimated_duration=40), {**task(), "id": "t2"}]
+
+    prompt = scheduler.schedule_prompt(tasks, {}, "2024-01-08")
+    assert '"estimated_duration": 60' in prompt
+    assert '"estimated_duration": 90' in prompt
+
+    first, second = scheduler._create_fallback_schedule(tasks, "09:00")
+    assert (first["start_time"], first["end_time"]) == ("09:00", "10:00")
+    assert (second["start_time"], second["end_time"]) == ("10:15", "11:45")
+    # The task itself keeps the user's estimate
+    assert first["task"]["estimated_duration"] == 40
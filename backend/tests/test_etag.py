@@ -0,0 +1,70 @@
+"""
+Tests for Conditional GET (ETag / If-None-Match)
+"""
+from app.services.schedule_cache import schedule_cache
+
+HEADERS = {"Authorization": "Bearer token-u1"}
+
+
+def get(client, url, tag=None):
+    headers = {**HEADERS, **({"If-None-Match": tag} if tag else {})}
+    return client.get(url, headers=headers)
+
+
+def test_list_tasks_revalidates_until_a_write(client, fake_db):
+    fake_db.table("tasks").insert({"user_id": "u1", "title": "First"}).execute()
+
+    first = get(client, "/api/v1/tasks")
+    tag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    cached = get(client, "/api/v1/tasks", tag)
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert get(client, "/api/v1/tasks", f"W/{tag}, \"other\"").status_code == 304
+
+    # Different filters or pages are different representations
+    assert get(client, "/api/v1/tasks?limit=10", tag).status_code == 200
+
+    # Inserts, updates and deletes all change the tag
+    second = {"user_id": "u1", "title": "Second"}
+    row = fake_db.table("tasks").insert(second).execute().data[0]
+    assert get(client, "/api/v1/tasks", tag).status_code == 200
+    tag = get(client, "/api/v1/tasks").headers["etag"]
+
+    fake_db.table("tasks").update({"updated_at": "2999-01-01T00:00:00"}).eq(
+        "id", row["id"]
+    ).execute()
+    assert get(client, "/api/v1/tasks", tag).status_code == 200
+    tag = get(client, "/api/v1/tasks").headers["etag"]
+
+    fake_db.table("tasks").delete().eq("id", row["id"]).execute()
+    assert get(client, "/api/v1/tasks", tag).status_code == 200
+
+
+def test_other_users_writes_do_not_invalidate(client, fake_db):
+    fake_db.table("notes").insert({"user_id": "u1", "content": "mine"}).execute()
+    tag = get(client, "/api/v1/notes").headers["etag"]
+
+    fake_db.table("notes").insert({"user_id": "u2", "content": "theirs"}).execute()
+    assert get(client, "/api/v1/notes", tag).status_code == 304
+
+
+def test_schedule_etag(client, fake_db):
+    row = (
+        fake_db.table("schedules")
+        .insert({"user_id": "u1", "date": "2024-01-08"})
+        .execute()
+        .data[0]
+    )
+
+    tag = get(client, "/api/v1/schedule/2024-01-08").headers["etag"]
+    assert get(client, "/api/v1/schedule/2024-01-08", tag).status_code == 304
+
+    fake_db.table("schedules").update({"updated_at": "2999-01-01T00:00:00"}).eq(
+        "id", row["id"]
+    ).execute()
+    schedule_cache.clear()  # the app invalidates on its own writes
+    assert get(client, "/api/v1/schedule/2024-01-08", tag).status_code == 200
+    assert get(client, "/api/v1/schedule/2024-01-09").status_code == 404
@@ -0,0 +1,89 @@
+"""
+Tests for Batch Text Ingestion
+"""
+import json
+
+import pytest
+
+from app.api.v1.endpoints import ingestion as ingestion_endpoints
+from app.services import ingestion, task_similarity
+from app.services.ingestion import IngestionService
+from benchmarks.stand_ins import FakeLLMProvider, InMemorySupabase, LatencyModel
+
+HEADERS = {"Authorization": "Bearer token-u1"}
+
+
+class ReorderingDatabase(InMemorySupabase):
+    """Returns inserted rows in reverse, which PostgREST does not promise against"""
+
+    def _insert(self, query):
+        response = super()._insert(query)
+        response.data.reverse()
+        return response
+
+
+@pytest.fixture
+def fake_db_class():
+    return ReorderingDatabase
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    monkeypatch.setattr(ingestion.settings, "TASK_DEDUP_MODE", "off")
+    yield
+    task_similarity.task_similarity_index.evict("u1")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = ingestion_endpoints.ingestion_service
+    monkeypatch.setattr(
+        service.llm_service, "_provider", FakeLLMProvider(LatencyModel("fixed:0"))
+    )
+    return service
+
+
+def test_short_notes_are_packed_and_long_notes_go_alone(monkeypatch):
+    monkeypatch.setattr(ingestion.settings, "INGEST_MICROBATCH_SIZE", 3)
+    monkeypatch.setattr(ingestion.settings, "INGEST_MICROBATCH_MAX_CHARS", 100)
+    notes = [{"content": "x" * length} for length in (10, 10, 10, 10, 150, 60, 50, 10)]
+
+    groups = IngestionService()._plan_text_groups(notes)
+
+    assert groups == [[0, 1, 2], [4], [3, 5], [6, 7]]
+
+
+@pytest.mark.asyncio
+async def test_tasks_are_split_back_out_per_note(fake_db, service):
+    notes = [{"content": f"Note {i}", "title": f"Title {i}"} for i in range(3)]
+
+    results = [result async for result in service.process_text_batch("u1", notes)]
+
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    note_rows = {row["id"]: row for row in fake_db.rows("notes")}
+    task_rows = {row["id"]: row for row in fake_db.rows("tasks")}
+    for result in results:
+        # Each note gets the tasks extracted from it, despite the reordered rows
+        note = note_rows[result["note_id"]]
+        assert note["title"] == f"Title {result['index']}"
+        [created] = result["created_tasks"]
+        assert created == task_rows[created["id"]]
+        assert created["title"] == result["extracted_tasks"][0]["title"]
+    assert len(task_rows) == 3
+
+
+def test_batch_endpoint_streams_one_line_per_note(client, fake_db, service):
+    notes = [{"content": "Call the bank"}, {"content": "x" * 3000}]
+
+    response = client.post(
+        "/api/v1/ingestion/text/batch", json={"notes": notes}, headers=HEADERS
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+    assert all(line["status"] == "completed" for line in lines)
+    long_note = next(line for line in lines if line["index"] == 1)
+    # A note extracted on its own gets the provider's whole answer
+    assert len(long_note["created_tasks"]) == 2
@@ -0,0 +1,122 @@
+"""
+Tests for the Task Interval Index
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.services.interval_index import (
+    IntervalTree,
+    ScheduleConflictIndex,
+    overlapping_pairs,
+    user_zone,
+)
+
+BASE = datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def at(minutes: int) -> datetime:
+    return BASE + timedelta(minutes=minutes)
+
+
+def test_overlapping_half_open():
+    """Adjacent slots do not overlap"""
+    tree = IntervalTree()
+    tree.insert("a", at(0), at(60))
+    tree.insert("b", at(60), at(90))
+    tree.insert("c", at(30), at(45))
+
+    assert sorted(k for k, _, _ in tree.overlapping(at(50), at(70))) == ["a", "b"]
+    assert tree.overlapping(at(90), at(120)) == []
+
+
+def test_insert_replaces_and_remove():
+    """Re-inserting a key moves its interval"""
+    tree = IntervalTree()
+    tree.insert("a", at(0), at(60))
+    tree.insert("a", at(120), at(180))
+
+    assert len(tree) == 1
+    assert tree.overlapping(at(0), at(60)) == []
+    assert tree.remove("a")
+    assert not tree.remove("a")
+    assert tree.overlapping(at(0), at(600)) == []
+
+
+def test_matches_brute_force():
+    """Tree queries agree with a linear scan"""
+    rng = random.Random(7)
+    tree = IntervalTree()
+    spans = {}
+    for i in range(300):
+        start = rng.randint(0, 5000)
+        spans[i] = (at(start), at(start + rng.randint(1, 240)))
+        tree.insert(i, *spans[i])
+    for i in range(0, 300, 3):
+        tree.remove(i)
+        del spans[i]
+
+    for _ in range(100):
+        start = rng.randint(0, 5000)
+        q_start, q_end = at(start), at(start + rng.randint(1, 300))
+        expected = {k for k, (s, e) in spans.items() if s < q_end and e > q_start}
+        assert {k for k, _, _ in tree.overlapping(q_start, q_end)} == expected
+
+
+def test_overlapping_pairs():
+    """Sweep reports each overlapping pair once"""
+    pairs = overlapping_pairs(
+        [("a", at(0), at(60)), ("b", at(30), at(90)), ("c", at(90), at(100))]
+    )
+
+    assert len(pairs) == 1
+    assert {pairs[0]["task_id"], pairs[0]["conflicting_task_id"]} == {"a", "b"}
+    assert pairs[0]["overlap_start"] == at(30)
+    assert pairs[0]["overlap_end"] == at(60)
+
+
+def test_slot_times_are_in_the_users_zone(fake_db):
+    fake_db.table("tasks").insert(
+        {
+            "user_id": "u1",
+            "status": "pending",
+            "scheduled_start": "2024-01-08T14:00:00+00:00",
+            "scheduled_end": "2024-01-08T15:00:00+00:00",
+        }
+    ).execute()
+    index = ScheduleConflictIndex()
+    slots = [{"task_id": "s1", "start_time": "09:00", "end_time": "10:00"}]
+
+    # 09:00 in New York is 14:00 UTC in January
+    [conflict] = index.slot_conflicts(
+        "u1", "2024-01-08", slots, user_zone("America/New_York")
+    )
+    assert conflict["overlap_start"] == datetime(2024, 1, 8, 14, tzinfo=timezone.utc)
+    assert index.slot_conflicts("u1", "2024-01-08", slots) == []
+    assert user_zone("Not/AZone") == timezone.utc
+
+
+def test_least_recently_used_trees_are_dropped(fake_db):
+    index = ScheduleConflictIndex(max_users=2)
+
+    for user_id in ("u1", "u2", "u1", "u3"):
+        index.find_conflicts(user_id, at(0), at(60))
+
+    assert list(index._trees) == ["u1", "u3"]
+
+
+def test_trees_load_past_the_row_cap(fake_db):
+    fake_db.table("tasks").insert(
+        [
+            {
+                "user_id": "u1",
+                "status": "pending",
+                "scheduled_start": at(i).isoformat(),
+                "scheduled_end": at(i + 1).isoformat(),
+            }
+            for i in range(fake_db.max_rows + 1)
+        ]
+    ).execute()
+
+    conflicts = ScheduleConflictIndex().find_conflicts("u1", at(0), at(2000))
+
+    assert len(conflicts) == fake_db.max_rows + 1
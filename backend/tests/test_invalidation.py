@@ -0,0 +1,148 @@
+"""
+Tests for the Cache Invalidation Bus
+"""
+import json
+
+import pytest
+
+from app.core.invalidation import InvalidationBus
+from app.services import cache_invalidation
+from app.services import schedule_cache as schedule_cache_module
+from app.services.interval_index import schedule_conflict_index
+from app.services.schedule_cache import schedule_cache
+from app.services.task_graph import task_dependency_index
+from app.services.task_similarity import fingerprint, task_similarity_index
+
+RANGE = ("2024-01-08T00:00:00+00:00", "2024-01-09T00:00:00+00:00")
+
+
+@pytest.fixture(autouse=True)
+def drop_cached_indexes():
+    yield
+    cache_invalidation.drop_all()
+
+
+@pytest.fixture
+def bus():
+    bus = InvalidationBus("")
+    cache_invalidation.register(bus)
+    return bus
+
+
+def task_event(task, op="UPDATE"):
+    """The payload notify_cache_invalidation sends for a task row"""
+    return json.dumps(
+        {
+            "table": "tasks",
+            "op": op,
+            "user_id": task["user_id"],
+            "id": task["id"],
+            "status": task["status"],
+            "scheduled_start": task.get("scheduled_start"),
+            "scheduled_end": task.get("scheduled_end"),
+            "fingerprint": fingerprint(
+                task["title"], task.get("description"), task["priority"]
+            ),
+        }
+    )
+
+
+def add_task(db, **values):
+    row = {"user_id": "u1", "title": "Write report", "status": "pending", **values}
+    return db.table("tasks").insert(row).execute().data[0]
+
+
+def test_dispatch_survives_bad_payloads_and_handlers():
+    bus, seen = InvalidationBus(""), []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    bus.subscribe("notes", broken)
+    bus.subscribe("notes", seen.append)
+    bus.subscribe("notes", seen.append)  # registering twice is a no-op
+
+    bus.dispatch("not json")
+    bus.dispatch(json.dumps({"op": "INSERT"}))
+    bus.dispatch(json.dumps({"table": "notes", "op": "INSERT", "user_id": "u1"}))
+
+    assert seen == [{"table": "notes", "op": "INSERT", "user_id": "u1"}]
+
+
+def test_remote_slot_changes_patch_the_conflict_index(fake_db, bus):
+    task = add_task(
+        fake_db,
+        scheduled_start="2024-01-08T09:00:00+00:00",
+        scheduled_end="2024-01-08T10:00:00+00:00",
+    )
+    assert schedule_conflict_index.conflicts_in_range("u1", *RANGE) == []
+
+    # Another worker schedules an overlapping task
+    other = {
+        **add_task(fake_db, title="Call"),
+        "scheduled_start": "2024-01-08T09:30:00+00:00",
+        "scheduled_end": "2024-01-08T10:30:00+00:00",
+    }
+    bus.dispatch(task_event(other, op="INSERT"))
+    [conflict] = schedule_conflict_index.conflicts_in_range("u1", *RANGE)
+    assert {conflict["task_id"], conflict["conflicting_task_id"]} == {
+        task["id"],
+        other["id"],
+    }
+
+    bus.dispatch(task_event(other, op="DELETE"))
+    assert schedule_conflict_index.conflicts_in_range("u1", *RANGE) == []
+
+
+def test_similarity_index_reloads_only_on_unseen_content(fake_db, bus):
+    task = add_task(fake_db)
+    task_similarity_index.match("u1", [])  # load
+
+    # Our own write: the index already holds this content
+    bus.dispatch(task_event(task))
+    assert "u1" in task_similarity_index._indexes
+
+    bus.dispatch(task_event({**task, "title": "Write the annual report"}))
+    assert "u1" not in task_similarity_index._indexes
+
+    task_similarity_index.match("u1", [])
+    bus.dispatch(task_event({**task, "status": "completed"}))
+    assert task["id"] not in task_similarity_index._indexes["u1"]
+
+
+@pytest.mark.asyncio
+async def test_schedule_and_dependency_changes(fake_db, bus, monkeypatch):
+    async def no_redis():
+        return None
+
+    async def load():
+        return {"id": "s1", "tasks": []}
+
+    monkeypatch.setattr(schedule_cache_module, "get_redis", no_redis)
+    await schedule_cache.get_or_load("u1", "2024-01-08", load)
+    change = {"table": "schedules", "op": "UPDATE", "user_id": "u1"}
+    bus.dispatch(json.dumps({**change, "date": "2024-01-08"}))
+    assert ("u1", "2024-01-08") not in schedule_cache._local
+
+    graph = task_dependency_index.graph("u1")
+    edge = {
+        "table": "task_dependencies",
+        "user_id": "u1",
+        "task_id": "b",
+        "depends_on_id": "a",
+    }
+    bus.dispatch(json.dumps({**edge, "op": "INSERT"}))
+    assert graph.predecessors("b") == {"a"}
+    bus.dispatch(json.dumps({**edge, "op": "DELETE"}))
+    assert graph.predecessors("b") == set()
+
+
+def test_connecting_drops_everything_cached(fake_db, bus):
+    add_task(fake_db)
+    task_similarity_index.match("u1", [])
+    task_dependency_index.graph("u1")
+
+    bus._connected()
+
+    assert task_similarity_index._indexes == {}
+    assert task_dependency_index._graphs == {}
@@ -0,0 +1,117 @@
+"""
+Tests for the LLM Gateway
+"""
+import asyncio
+
+import pytest
+
+from app.services.llm_gateway import LLMGateway, LLMGatewayError, RequestPriority
+
+
+def make_gateway(**overrides) -> LLMGateway:
+    options = dict(
+        global_limit=1,
+        provider_limits={"anthropic": 1, "openai": 1},
+        user_rate_per_minute=600,
+        user_burst=100,
+        max_queue=10,
+        queue_timeout=5,
+        weights={RequestPriority.INTERACTIVE: 4, RequestPriority.BACKGROUND: 1},
+    )
+    options.update(overrides)
+    return LLMGateway(**options)
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_are_rate_limited_per_user():
+    """A user's burst is admitted, then further calls get a fast 429"""
+    gateway = make_gateway(global_limit=5, user_rate_per_minute=1, user_burst=2)
+
+    async def call():
+        return "ok"
+
+    assert await gateway.run("anthropic", call, user_id="u1") == "ok"
+    assert await gateway.run("anthropic", call, user_id="u1") == "ok"
+    with pytest.raises(LLMGatewayError) as exc:
+        await gateway.run("anthropic", call, user_id="u1")
+
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after > 0
+    assert await gateway.run("anthropic", call, user_id="u2") == "ok"
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_shed():
+    """Once the queue is full new work is rejected with 503"""
+    gateway = make_gateway(max_queue=1)
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+
+    running = asyncio.create_task(gateway.run("anthropic", slow))
+    queued = asyncio.create_task(gateway.run("anthropic", slow))
+    await asyncio.sleep(0)
+
+    with pytest.raises(LLMGatewayError) as exc:
+        await gateway.run("anthropic", slow)
+    assert exc.value.status_code == 503
+
+    release.set()
+    await asyncio.gather(running, queued)
+    assert gateway.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_weighted_fair_queue_prefers_interactive():
+    """Interactive waiters overtake background waiters queued earlier"""
+    gateway = make_gateway()
+    release = asyncio.Event()
+    order = []
+
+    async def blocker():
+        await release.wait()
+
+    def job(name):
+        async def call():
+            order.append(name)
+
+        return call
+
+    first = asyncio.create_task(gateway.run("anthropic", blocker))
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.create_task(
+            gateway.run("anthropic", job(f"bg{i}"), priority=RequestPriority.BACKGROUND)
+        )
+        for i in range(3)
+    ] + [asyncio.create_task(gateway.run("anthropic", job(f"int{i}"))) for i in range(3)]
+    await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(first, *waiters)
+
+    assert order[:3] == ["int0", "int1", "int2"]
+    assert sorted(order[3:]) == ["bg0", "bg1", "bg2"]
+
+
+@pytest.mark.asyncio
+async def test_saturated_provider_does_not_block_others():
+    """A waiter for a free provider is admitted past a saturated one"""
+    gateway = make_gateway(global_limit=3)
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+
+    async def fast():
+        return "openai"
+
+    busy = asyncio.create_task(gateway.run("anthropic", slow))
+    blocked = asyncio.create_task(gateway.run("anthropic", slow))
+    await asyncio.sleep(0)
+
+    assert await asyncio.wait_for(gateway.run("openai", fast), 1) == "openai"
+
+    release.set()
+    await asyncio.gather(busy, blocked)
@@ -1,8 +1,9 @@
 """
 Tests for LLM Provider
 """
+import json
 import pytest
-from app.services.llm_provider import LLMService, LLMProvider, Message
+from app.services.llm_provider import LLMService, LLMProvider, Message, ProviderRegistry
 
 
 @pytest.mark.skip(reason="Requires API keys")
@@ -38,3 +39,216 @@ async def test_switch_provider():
     # Note: This would fail without proper API keys
     # service.switch_provider(LLMProvider.OPENAI)
     # assert service.provider_type == LLMProvider.OPENAI
+
+
+@pytest.mark.asyncio
+async def test_provider_clients_are_shared():
+    """Test services reuse one pooled client per provider"""
+    registry = ProviderRegistry()
+    first = registry.get(LLMProvider.ANTHROPIC)
+    assert registry.get(LLMProvider.ANTHROPIC) is first
+
+    await registry.aclose()
+    assert first.client.is_closed()
+    assert registry.get(LLMProvider.ANTHROPIC) is not first
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_anthropic_system_prompt_is_cached():
+    """Test static instructions are sent as a cached system block and usage counted"""
+    from types import SimpleNamespace
+    from app.core.metrics import metrics
+    from app.services.llm_provider import AnthropicProvider
+
+    captured = {}
+
+    async def create(**kwargs):
+        captured.update(kwargs)
+        return SimpleNamespace(
+            content=[SimpleNamespace(text="[]")],
+            usage=SimpleNamespace(
+                input_tokens=20,
+                output_tokens=5,
+                cache_read_input_tokens=1200,
+                cache_creation_input_tokens=0,
+            ),
+        )
+
+    provider = AnthropicProvider(api_key="test")
+    provider.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    cached_before = metrics.get("llm.anthropic.cached_input_tokens")
+
+    await provider.generate([Message(role="user", content="Text: call Bob")], system="Extract tasks")
+
+    assert captured["system"] == [
+        {
+            "type": "text",
+            "text": "Extract tasks",
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+    assert captured["messages"] == [{"role": "user", "content": "Text: call Bob"}]
+    assert metrics.get("llm.anthropic.cached_input_tokens") - cached_before == 1200
+
+
+def test_anthropic_schema_is_cached_before_breakpoint(monkeypatch):
+    """Test the tool schema sits in the cached prefix, and caching can be disabled"""
+    from app.core.config import settings
+    from app.models.llm_output import TaskExtractionOutput
+    from app.services.llm_provider import AnthropicProvider
+
+    provider = AnthropicProvider(api_key="test")
+    messages = [Message(role="user", content="Text: call Bob")]
+
+    params = provider.request_params(
+        messages, 100, 0.3, system="Extract tasks", schema=TaskExtractionOutput
+    )
+    assert params["system"] == [
+        {
+            "type": "text",
+            "text": "Extract tasks",
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+    assert [tool["name"] for tool in params["tools"]] == ["TaskExtractionOutput"]
+    assert "cache_control" not in params["tools"][0]
+
+    params = provider.request_params(messages, 100, 0.3, schema=TaskExtractionOutput)
+    assert "system" not in params
+    assert params["tools"][0]["cache_control"] == {"type": "ephemeral"}
+
+    monkeypatch.setattr(settings, "LLM_PROMPT_CACHING", False)
+    params = provider.request_params(
+        messages, 100, 0.3, system="Extract tasks", schema=TaskExtractionOutput
+    )
+    assert params["system"] == [{"type": "text", "text": "Extract tasks"}]
+    assert "cache_control" not in params["tools"][0]
+
+
+class ScriptedProvider:
+    """Returns canned structured replies in order"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.conversations = []
+
+    async def generate_structured(self, messages, schema, max_tokens, temperature, system=None):
+        self.conversations.append(messages)
+        return self.replies.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_structured_output_is_repaired_once():
+    """Test invalid structured output is sent back for one repair"""
+    from app.core.metrics import metrics
+    from app.models.llm_output import TaskExtractionOutput
+
+    service = LLMService(provider=LLMProvider.ANTHROPIC)
+    service.provider = ScriptedProvider(
+        [{"tasks": [{"title": ""}]}, {"tasks": [{"title": "Call Bob", "priority": "high"}]}]
+    )
+    repaired_before = metrics.get("llm.structured.TaskExtractionOutput.repaired")
+
+    output = await service.generate_structured(
+        [Message(role="user", content="Text: call Bob")], TaskExtractionOutput, repair_attempts=1
+    )
+
+    assert output.tasks[0].title == "Call Bob"
+    repair_turns = service.provider.conversations[1]
+    assert [m.role for m in repair_turns] == ["user", "assistant", "user"]
+    assert "invalid" in repair_turns[-1].content
+    assert metrics.get("llm.structured.TaskExtractionOutput.repaired") - repaired_before == 1
+
+
+@pytest.mark.asyncio
+async def test_structured_output_gives_up_after_repairs():
+    """Test repairs are bounded"""
+    from app.models.llm_output import ScheduleOutput
+    from app.services.llm_provider import StructuredOutputError
+
+    service = LLMService(provider=LLMProvider.ANTHROPIC)
+    service.provider = ScriptedProvider([{"slots": "none"}, {"slots": "still none"}])
+
+    with pytest.raises(StructuredOutputError):
+        await service.generate_structured(
+            [Message(role="user", content="schedule")], ScheduleOutput, repair_attempts=1
+        )
+    assert service.provider.replies == []
+
+
+def test_anthropic_structured_request_forces_tool():
+    """Test a schema becomes a single forced tool"""
+    from app.models.llm_output import ScheduleOutput
+    from app.services.llm_provider import AnthropicProvider
+
+    params = AnthropicProvider(api_key="test").request_params(
+        [Message(role="user", content="schedule")], 100, 0.3, schema=ScheduleOutput
+    )
+
+    assert params["tool_choice"] == {"type": "tool", "name": "ScheduleOutput"}
+    assert params["tools"][0]["input_schema"]["required"] == ["slots"]
+
+
+def test_openai_structured_request_matches_the_model():
+    """Test the default model gets Structured Outputs and older ones JSON mode"""
+    from app.models.llm_output import ScheduleOutput
+    from app.services.llm_provider import OpenAIProvider
+
+    provider = OpenAIProvider(api_key="test")
+    messages = [Message(role="user", content="schedule")]
+
+    params = provider.request_params(
+        messages, 100, 0.3, system="Plan the day", schema=ScheduleOutput
+    )
+    assert params["model"] == "gpt-4o-2024-08-06"
+    assert params["response_format"]["type"] == "json_schema"
+    json_schema = params["response_format"]["json_schema"]
+    assert json_schema["name"] == "ScheduleOutput"
+    assert json_schema["strict"] is True
+    slot = json_schema["schema"]["$defs"]["ScheduleSlot"]
+    assert slot["required"] == ["task_id", "start_time", "end_time", "order"]
+    assert slot["additionalProperties"] is False
+    assert slot["properties"]["start_time"] == {
+        "description": "HH:MM",
+        "title": "Start Time",
+        "type": "string",
+    }
+    assert params["messages"][0] == {"role": "system", "content": "Plan the day"}
+
+    params = provider.request_params(
+        messages, 100, 0.3, "Plan the day", "gpt-4-turbo-preview", ScheduleOutput
+    )
+    assert params["response_format"] == {"type": "json_object"}
+    system = params["messages"][0]["content"]
+    assert system.startswith("Plan the day\n\nRespond with ONLY a JSON object")
+    assert '"slots"' in system
+
+
+def test_strict_schemas_require_everything_and_allow_null_instead():
+    """Test extraction schemas fit OpenAI strict mode and still validate"""
+    from app.models.llm_output import ExtractedTask, TaskExtractionOutput
+    from app.services.llm_provider import strict_json_schema
+
+    schema = strict_json_schema(TaskExtractionOutput)
+    task = schema["$defs"]["ExtractedTask"]
+
+    assert schema["additionalProperties"] is False
+    assert task["additionalProperties"] is False
+    assert task["required"] == [
+        "title",
+        "description",
+        "priority",
+        "estimated_duration",
+    ]
+    assert task["properties"]["title"] == {"title": "Title", "type": "string"}
+    assert task["properties"]["priority"] == {
+        "anyOf": [{"$ref": "#/$defs/Priority"}, {"type": "null"}]
+    }
+    assert "default" not in json.dumps(schema) and "minimum" not in json.dumps(schema)
+
+    # The nulls strict mode answers with still validate
+    extracted = ExtractedTask.model_validate(
+        dict.fromkeys(task["required"], None) | {"title": "Call"}
+    )
+    assert extracted.priority == "medium"
@@ -0,0 +1,62 @@
+"""
+Smoke Test for the Offline Load-Testing Harness
+"""
+import asyncio
+from benchmarks.loadtest import (
+    LoadTestConfig,
+    boot_app,
+    compare,
+    percentile,
+    run_load_test,
+)
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.5) == 51.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.95) == 0.0
+
+
+def test_compare_flags_regressions():
+    baseline = {"routes": {"GET /tasks": {"p95_ms": 10.0, "rps": 100.0}}}
+    report = {"routes": {"GET /tasks": {"p95_ms": 13.0, "rps": 95.0}}}
+    assert compare(report, baseline, 0.2) == ["GET /tasks: p95 10.0ms -> 13.0ms"]
+    assert compare(report, baseline, 0.5) == []
+
+
+def test_short_run_covers_all_routes_without_errors():
+    config = LoadTestConfig(
+        duration=1.0, concurrency=4, users=2, tasks_per_user=5, llm_latency="fixed:1"
+    )
+    report = asyncio.run(run_load_test(config))
+
+    assert report["requests"] > 0
+    assert report["llm_calls"] > 0
+    for route, stats in report["routes"].items():
+        assert stats["errors"] == 0, route
+
+
+def test_boot_app_restores_what_it_patches():
+    from app.api.v1.endpoints import ingestion, tasks
+    from app.services.llm_gateway import llm_gateway
+    from app.services.llm_provider import LLMService
+
+    client = tasks.supabase_client
+    initialize = LLMService.__dict__["_initialize_provider"]
+    def limits():
+        return llm_gateway.user_rate, llm_gateway.user_burst, llm_gateway.max_queue
+
+    before = limits()
+    ingestion_provider = ingestion.ingestion_service.llm_service._provider
+
+    with boot_app("fixed:1") as (app, db, provider):
+        assert limits() != before
+        assert tasks.supabase_client is db
+        assert LLMService().provider is provider
+        assert ingestion.ingestion_service.llm_service.provider is provider
+
+    assert tasks.supabase_client is client
+    assert LLMService.__dict__["_initialize_provider"] is initialize
+    assert limits() == before
+    assert ingestion.ingestion_service.llm_service._provider is ingestion_provider
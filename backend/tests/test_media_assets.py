@@ -0,0 +1,132 @@
+"""
+Tests for Upload and Image Deduplication
+"""
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image, ImageDraw
+
+from app.core.workers import shutdown_process_pool
+from app.services import media_assets
+from app.services.ingestion import IngestionService
+from app.services.media_assets import MediaAssetStore, content_hash
+from app.services.vision import hamming_distance, prepare_image
+
+
+def nearest_image_asset(db, params):
+    """The nearest_image_asset function, over the in-memory table"""
+    matches = [
+        (hamming_distance(row["perceptual_hash"], params["p_hash"]), row)
+        for row in db.rows("media_assets")
+        if row["user_id"] == params["p_user_id"] and row["perceptual_hash"] is not None
+    ]
+    matches = [m for m in matches if m[0] <= params["p_max_distance"]]
+    matches.sort(key=lambda m: m[1]["created_at"], reverse=True)
+    matches.sort(key=lambda m: m[0])
+    return [row for _, row in matches[:1]]
+
+
+@pytest.fixture(autouse=True)
+def uploads(fake_db, monkeypatch, tmp_path):
+    fake_db.functions["nearest_image_asset"] = nearest_image_asset
+    monkeypatch.setattr(media_assets.settings, "UPLOAD_DIR", str(tmp_path))
+
+
+def _photo(size=(800, 600), quality=90, shapes=((100, 100, 400, 300),)) -> bytes:
+    image = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((500, 50, 750, 550), "gray")
+    for box in shapes:
+        draw.rectangle(box, "black")
+    buffer = io.BytesIO()
+    image.resize(size).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _hash(data: bytes) -> int:
+    return prepare_image(data, 1600, 256)["perceptual_hash"]
+
+
+def test_perceptual_hashes_survive_reencoding_but_not_new_content():
+    original = _hash(_photo())
+
+    assert -(1 << 63) <= original < (1 << 63)
+    assert hamming_distance(original, _hash(_photo(size=(640, 480), quality=40))) <= 6
+    moved = _hash(_photo(shapes=((450, 350, 780, 580),)))
+    assert hamming_distance(original, moved) > 6
+
+    assert hamming_distance(0, -1) == 64
+    assert hamming_distance(5, 5) == 0
+
+
+def test_nearest_image_wins_then_most_recent(fake_db):
+    store = MediaAssetStore()
+    for asset_id, phash, created_at in (
+        ("far", 0b1111, "2024-01-03"),
+        ("near-old", 0b0001, "2024-01-01"),
+        ("near-new", 0b0010, "2024-01-02"),
+        ("unhashed", None, "2024-01-04"),
+    ):
+        fake_db.table("media_assets").insert(
+            {
+                "id": asset_id,
+                "user_id": "u1",
+                "perceptual_hash": phash,
+                "created_at": created_at,
+            }
+        ).execute()
+
+    assert store.find_similar_image("u1", 0, 2)["id"] == "near-new"
+    assert store.find_similar_image("u1", 0b1110, 1)["id"] == "far"
+    assert store.find_similar_image("u1", 0b0100_0000, 0) is None
+    assert store.find_similar_image("u2", 0, 64) is None
+
+
+@pytest.mark.asyncio
+async def test_duplicate_uploads_reuse_the_earlier_extraction(fake_db, tmp_path):
+    original = _photo()
+    note = fake_db.table("notes").insert({"user_id": "u1", "content": "Buy milk"})
+    note_id = note.execute().data[0]["id"]
+    previous = {"note_id": note_id, "extracted_text": "Buy milk", "extracted_tasks": []}
+    MediaAssetStore().record(
+        "u1",
+        "first.jpg",
+        "image",
+        original,
+        content_hash(original),
+        str(tmp_path / "first.jpg"),
+        note_id,
+        previous,
+        _hash(original),
+    )
+    service = IngestionService()
+
+    exact = await service.process_image(
+        "u1", UploadFile(io.BytesIO(original), filename="again.jpg")
+    )
+    assert exact["duplicate_match"] == "exact"
+    assert exact["extracted_text"] == "Buy milk"
+    assert len(fake_db.rows("media_assets")) == 1
+
+    resized = _photo(size=(640, 480), quality=40)
+    try:
+        near = await service.process_image(
+            "u1", UploadFile(io.BytesIO(resized), filename="resized.jpg")
+        )
+    finally:
+        shutdown_process_pool()
+    assert near["duplicate_match"] == "near"
+    assert near["duplicate_of"] == note_id
+    assert near["created_tasks"] == []
+    assert len(fake_db.rows("notes")) == 1
+
+    # The new upload's own bytes are stored and recorded
+    asset = fake_db.rows("media_assets")[-1]
+    assert asset["content_hash"] == content_hash(resized)
+    assert asset["storage_path"] == str(tmp_path / f"{content_hash(resized)}.jpg")
+    with open(asset["storage_path"], "rb") as f:
+        assert f.read() == resized
+    assert asset["note_id"] == note_id
+    assert sorted(os.listdir(tmp_path)) == [f"{content_hash(resized)}.jpg"]
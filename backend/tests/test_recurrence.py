@@ -0,0 +1,185 @@
+"""
+Tests for Recurring Task Expansion
+"""
+import pytest
+from datetime import date, datetime, time, timezone
+from dateutil.rrule import rrulestr
+from pydantic import ValidationError
+from app.jobs import pregenerate_schedules as job
+from app.models.task import TaskCreate
+from app.services import recurrence
+from app.services.llm_batch import LocalBatchBackend
+from app.services.llm_provider import LLMService
+from benchmarks.stand_ins import FakeLLMProvider, LatencyModel
+
+MONDAY = date(2024, 1, 8)
+
+
+def standup(db, **values):
+    return (
+        db.table("tasks")
+        .insert(
+            {
+                "user_id": "u1",
+                "title": "Standup",
+                "recurrence_rule": "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+                "scheduled_start": "2024-01-01T09:00:00+00:00",
+                "scheduled_end": "2024-01-01T09:15:00+00:00",
+                **values,
+            }
+        )
+        .execute()
+        .data[0]
+    )
+
+
+def test_expands_only_the_requested_window(fake_db):
+    template = standup(fake_db)
+
+    occurrences = recurrence.occurrences("u1", MONDAY, date(2024, 1, 14))
+
+    assert [o["occurrence_date"] for o in occurrences] == [
+        "2024-01-08",
+        "2024-01-10",
+        "2024-01-12",
+    ]
+    first = occurrences[0]
+    assert first["id"] == f"{template['id']}:2024-01-08"
+    assert first["series_id"] == template["id"]
+    assert first["scheduled_start"] == "2024-01-08T09:00:00+00:00"
+    assert first["scheduled_end"] == "2024-01-08T09:15:00+00:00"
+
+    # Far-future windows cost the same and need no stored rows
+    far = recurrence.occurrences("u1", date(2054, 1, 5), date(2054, 1, 11))
+    assert len(far) == 3
+    assert fake_db.rows("task_occurrences") == []
+
+
+def test_series_follow_the_users_local_days_and_clock(fake_db):
+    fake_db.table("user_preferences").insert(
+        {"user_id": "u1", "timezone": "America/Los_Angeles"}
+    ).execute()
+    # Mondays at 18:00 in Los Angeles, which is Tuesday in UTC
+    standup(
+        fake_db,
+        recurrence_rule="FREQ=WEEKLY;BYDAY=MO",
+        scheduled_start="2024-01-02T02:00:00+00:00",
+        scheduled_end="2024-01-02T03:00:00+00:00",
+    )
+
+    # Daylight saving time starts on March 10th
+    occurrences = recurrence.occurrences("u1", date(2024, 3, 4), date(2024, 3, 17))
+
+    assert [
+        (o["occurrence_date"], o["scheduled_start"], o["scheduled_end"])
+        for o in occurrences
+    ] == [
+        ("2024-03-04", "2024-03-05T02:00:00+00:00", "2024-03-05T03:00:00+00:00"),
+        ("2024-03-11", "2024-03-12T01:00:00+00:00", "2024-03-12T02:00:00+00:00"),
+    ]
+
+
+def test_templates_load_past_the_row_cap(fake_db):
+    for _ in range(fake_db.max_rows + 1):
+        standup(fake_db)
+    standup(fake_db, recurrence_rule=None)
+
+    assert len(recurrence.load_templates("u1")) == fake_db.max_rows + 1
+
+
+def test_overrides_and_completions_are_sparse(fake_db):
+    template = standup(fake_db)
+    fake_db.table("task_occurrences").insert(
+        [
+            {
+                "task_id": template["id"],
+                "user_id": "u1",
+                "occurrence_date": "2024-01-08",
+                "status": "completed",
+            },
+            {
+                "task_id": template["id"],
+                "user_id": "u1",
+                "occurrence_date": "2024-01-10",
+                "title": "Standup (demo day)",
+            },
+        ]
+    ).execute()
+
+    open_occurrences = recurrence.occurrences(
+        "u1", MONDAY, date(2024, 1, 12), ["pending", "in_progress"]
+    )
+
+    assert [(o["occurrence_date"], o["title"]) for o in open_occurrences] == [
+        ("2024-01-10", "Standup (demo day)"),
+        ("2024-01-12", "Standup"),
+    ]
+
+
+def test_window_is_bounded(fake_db):
+    with pytest.raises(ValueError):
+        recurrence.occurrences("u1", date(2024, 1, 1), date(2025, 1, 1))
+
+
+def test_recurrence_rule_is_validated():
+    assert TaskCreate(title="t", recurrence_rule="RRULE:FREQ=DAILY").recurrence_rule == (
+        "FREQ=DAILY"
+    )
+    with pytest.raises(ValidationError):
+        TaskCreate(title="t", recurrence_rule="FREQ=SOMETIMES")
+    with pytest.raises(ValidationError, match="at most daily"):
+        TaskCreate(title="t", recurrence_rule="FREQ=MINUTELY;INTERVAL=1")
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        "FREQ=DAILY;INTERVAL=3",
+        "FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,SU;WKST=SU",
+        "FREQ=MONTHLY;BYSETPOS=-1;BYDAY=FR",
+        "FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=29",
+        "FREQ=DAILY;COUNT=40",
+    ],
+)
+def test_long_running_series_expand_from_near_the_window(rule):
+    # Started on the 31st of a month, a Wednesday, years before the window
+    template = {
+        "recurrence_rule": rule,
+        "scheduled_start": "2003-12-31T23:30:00+00:00",
+    }
+    start, end = date(2052, 1, 25), date(2052, 4, 5)
+    dtstart = recurrence.series_start(template)
+
+    moved = recurrence.expansion_start(rule, dtstart, start)
+    expected = [
+        instant.date()
+        for instant in rrulestr(rule, dtstart=dtstart).between(
+            datetime.combine(start, time.min, tzinfo=timezone.utc),
+            datetime.combine(end, time.max, tzinfo=timezone.utc),
+            inc=True,
+        )
+    ]
+
+    assert recurrence.occurrence_dates(template, start, end) == expected
+    assert (moved == dtstart) == ("COUNT" in rule)
+    assert moved.timetz() == dtstart.timetz()
+
+
+@pytest.mark.asyncio
+async def test_pregeneration_schedules_the_days_occurrence(fake_db):
+    fake_db.table("user_preferences").insert(
+        {"user_id": "u1", "ai_preferences": {"auto_schedule": True}}
+    ).execute()
+    template = standup(fake_db, recurrence_rule="FREQ=WEEKLY;BYDAY=MO")
+    standup(fake_db, title="Weekly review", recurrence_rule="FREQ=WEEKLY;BYDAY=FR")
+
+    llm_service = LLMService()
+    llm_service.provider = FakeLLMProvider(LatencyModel("fixed:0"))
+    backend = LocalBatchBackend(llm_service)
+    summary = await job.pregenerate_schedules(date(2024, 1, 5), backend)
+
+    assert summary["created"] == 1
+    [schedule] = fake_db.rows("schedules")
+    assert [slot["task_id"] for slot in schedule["tasks"]] == [
+        f"{template['id']}:{MONDAY.isoformat()}"
+    ]
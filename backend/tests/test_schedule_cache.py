@@ -0,0 +1,213 @@
+"""
+Tests for the Two-Tier Schedule Cache
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.services import schedule_cache as cache_module
+from app.services.schedule_cache import ScheduleCache
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    async def execute(self):
+        for name, args in self.calls:
+            getattr(self.redis, f"_{name}")(*args)
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the cache protocol"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.published = []
+
+    async def mget(self, *keys):
+        if len(keys) == 1 and isinstance(keys[0], list):
+            keys = keys[0]
+        return [self.values.get(key) for key in keys]
+
+    async def eval(self, script, numkeys, data_key, version_key, days_key, *args):
+        version, value, ttl, day = args
+        if self.values.get(version_key, "") != version:
+            return 0
+        self.values[data_key] = value
+        self.sets.setdefault(days_key, set()).add(day)
+        return 1
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def _delete(self, key):
+        self.values.pop(key, None)
+
+    def _incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+
+    def _expire(self, key, ttl):
+        pass
+
+    def _srem(self, key, member):
+        self.sets.get(key, set()).discard(member)
+
+    def _publish(self, channel, message):
+        self.published.append(json.loads(message))
+
+
+def use_redis(monkeypatch, client):
+    async def get_redis():
+        return client
+
+    monkeypatch.setattr(cache_module, "get_redis", get_redis)
+
+
+def loader(value):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return value
+
+    return load, calls
+
+
+def schedule(*task_ids):
+    return {"id": "s1", "tasks": [{"task_id": task_id} for task_id in task_ids]}
+
+
+@pytest.mark.asyncio
+async def test_local_tier_serves_repeat_reads(monkeypatch):
+    use_redis(monkeypatch, None)
+    cache = ScheduleCache(ttl=60, local_ttl=60, max_entries=10)
+    load, calls = loader(schedule("t1"))
+
+    for _ in range(3):
+        assert await cache.get_or_load("u1", "2024-01-08", load) == schedule("t1")
+    assert len(calls) == 1
+
+    # Absent schedules are cached as well
+    load_none, none_calls = loader(None)
+    assert await cache.get_or_load("u1", "2024-01-09", load_none) is None
+    assert await cache.get_or_load("u1", "2024-01-09", load_none) is None
+    assert len(none_calls) == 1
+
+    await cache.invalidate("u1", "2024-01-08")
+    await cache.get_or_load("u1", "2024-01-08", load)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_local_tier_is_bounded(monkeypatch):
+    use_redis(monkeypatch, None)
+    cache = ScheduleCache(ttl=60, local_ttl=60, max_entries=2)
+    load, calls = loader(None)
+
+    for day in ("2024-01-01", "2024-01-02", "2024-01-03"):
+        await cache.get_or_load("u1", day, load)
+
+    assert list(cache._local) == [("u1", "2024-01-02"), ("u1", "2024-01-03")]
+    assert cache._user_days == {"u1": {"2024-01-02", "2024-01-03"}}
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_a_load_is_not_overwritten(monkeypatch):
+    redis = FakeRedis()
+    use_redis(monkeypatch, redis)
+    cache = ScheduleCache(ttl=60, local_ttl=60, max_entries=10)
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_load():
+        started.set()
+        await release.wait()
+        return schedule("stale")
+
+    reader = asyncio.create_task(cache.get_or_load("u1", "2024-01-08", slow_load))
+    await started.wait()
+    await cache.invalidate("u1", "2024-01-08")
+    release.set()
+    assert await reader == schedule("stale")
+
+    # Neither tier kept the row read before the write
+    assert cache._local == {}
+    assert "schedule:u1:2024-01-08" not in redis.values
+    load, calls = loader(schedule("fresh"))
+    assert await cache.get_or_load("u1", "2024-01-08", load) == schedule("fresh")
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_a_load_outlives_the_pruning_of_its_invalidation(monkeypatch):
+    use_redis(monkeypatch, None)
+    cache = ScheduleCache(ttl=60, local_ttl=60, max_entries=1)
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_load():
+        started.set()
+        await release.wait()
+        return schedule("stale")
+
+    reader = asyncio.create_task(cache.get_or_load("u1", "2024-01-08", slow_load))
+    await started.wait()
+    await cache.invalidate("u1", "2024-01-08")
+    # Enough evictions of other days to prune the recorded ones
+    for day in range(1, 5):
+        cache.evict_local("u2", f"2024-02-0{day}")
+    release.set()
+    await reader
+
+    assert cache._local == {}
+
+
+@pytest.mark.asyncio
+async def test_workers_share_the_redis_tier(monkeypatch):
+    redis = FakeRedis()
+    use_redis(monkeypatch, redis)
+    first = ScheduleCache(ttl=60, local_ttl=60, max_entries=10)
+    second = ScheduleCache(ttl=60, local_ttl=60, max_entries=10)
+    load, calls = loader(schedule("t1"))
+
+    await first.get_or_load("u1", "2024-01-08", load)
+    assert await second.get_or_load("u1", "2024-01-08", load) == schedule("t1")
+    assert len(calls) == 1
+
+    await first.invalidate("u1", "2024-01-08")
+    assert redis.published == [["u1", "2024-01-08"]]
+    # What the listener does with the broadcast
+    second.evict_local("u1", "2024-01-08")
+    await second.get_or_load("u1", "2024-01-08", load)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_task_writes_invalidate_the_days_listing_the_task(monkeypatch):
+    redis = FakeRedis()
+    use_redis(monkeypatch, redis)
+    cache = ScheduleCache(ttl=60, local_ttl=60, max_entries=10)
+    days = {"2024-01-08": schedule("t1"), "2024-01-09": schedule("t2")}
+    for day, value in days.items():
+        await cache.get_or_load("u1", day, loader(value)[0])
+    await cache.get_or_load("u1", "2024-01-10", loader(None)[0])
+
+    await cache.invalidate_task("u1", "t1", ["2024-01-10"])
+
+    assert sorted(day for _, day in cache._local) == ["2024-01-09"]
+    assert sorted(day for _, day in redis.published) == ["2024-01-08", "2024-01-10"]
+    assert redis.sets["schedule:days:u1"] == {"2024-01-09"}
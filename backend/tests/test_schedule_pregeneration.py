@@ -0,0 +1,118 @@
+"""
+Tests for Nightly Schedule Pre-Generation
+"""
+import pytest
+from datetime import date, datetime, timezone
+from app.jobs import pregenerate_schedules as job
+from app.services.llm_batch import LocalBatchBackend
+from app.services.llm_provider import LLMService
+from benchmarks.stand_ins import FakeLLMProvider, LatencyModel
+
+FRIDAY = date(2024, 1, 5)
+MONDAY = date(2024, 1, 8)
+
+
+def test_next_work_day():
+    assert job.next_work_day(FRIDAY, [1, 2, 3, 4, 5]) == MONDAY
+    assert job.next_work_day(FRIDAY, [6]) == date(2024, 1, 6)
+    assert job.next_work_day(FRIDAY, [0]) == date(2024, 1, 7)
+    assert job.next_work_day(FRIDAY, None) == MONDAY
+
+
+@pytest.mark.asyncio
+async def test_pregenerates_missing_schedules_in_one_batch(fake_db):
+    fake_db.table("user_preferences").insert(
+        [
+            {"user_id": "auto", "ai_preferences": None},
+            {"user_id": "opted-out", "ai_preferences": {"auto_schedule": False}},
+            {"user_id": "has-schedule", "ai_preferences": {"auto_schedule": True}},
+            {"user_id": "no-tasks", "ai_preferences": {"auto_schedule": True}},
+        ]
+    ).execute()
+    fake_db.table("tasks").insert(
+        [
+            {"user_id": user_id, "title": f"Task for {user_id}", "estimated_duration": 30}
+            for user_id in ("auto", "opted-out", "has-schedule")
+        ]
+    ).execute()
+    fake_db.table("schedules").insert(
+        {"user_id": "has-schedule", "date": str(MONDAY)}
+    ).execute()
+
+    llm_service = LLMService()
+    llm_service.provider = provider = FakeLLMProvider(LatencyModel("fixed:0"))
+
+    summary = await job.pregenerate_schedules(FRIDAY, LocalBatchBackend(llm_service))
+
+    assert summary == {"candidates": 3, "submitted": 1, "created": 1, "failed": 0}
+    assert provider.calls == 1
+
+    created = [row for row in fake_db.rows("schedules") if row["user_id"] == "auto"]
+    assert len(created) == 1
+    assert created[0]["date"] == str(MONDAY)
+    assert created[0]["metadata"]["pregenerated"] is True
+    assert created[0]["tasks"][0]["task"]["title"] == "Task for auto"
+
+
+@pytest.mark.asyncio
+async def test_each_user_gets_their_local_next_work_day(fake_db):
+    fake_db.table("user_preferences").insert(
+        [
+            {"user_id": "london", "timezone": "Europe/London"},
+            {"user_id": "tokyo", "timezone": "Asia/Tokyo"},
+            {"user_id": "honolulu", "timezone": "Pacific/Honolulu"},
+        ]
+    ).execute()
+    fake_db.table("tasks").insert(
+        [
+            {"user_id": user_id, "title": "Plan", "estimated_duration": 30}
+            for user_id in ("london", "tokyo", "honolulu")
+        ]
+    ).execute()
+    llm_service = LLMService()
+    llm_service.provider = FakeLLMProvider(LatencyModel("fixed:0"))
+
+    # Thursday evening in London is already Friday in Tokyo
+    await job.pregenerate_schedules(
+        backend=LocalBatchBackend(llm_service),
+        now=datetime(2024, 1, 4, 20, 30, tzinfo=timezone.utc),
+    )
+
+    assert {row["user_id"]: row["date"] for row in fake_db.rows("schedules")} == {
+        "london": str(FRIDAY),
+        "tokyo": str(MONDAY),
+        "honolulu": str(FRIDAY),
+    }
+
+
+STATUSES = ["pending", "in_progress", "completed", "pending"]
+
+
+def test_candidates_are_read_past_the_row_cap(fake_db, monkeypatch):
+    fake_db.max_rows = 2
+    monkeypatch.setattr(job, "PAGE_SIZE", 2)
+    fake_db.table("user_preferences").insert(
+        [
+            {"user_id": "unset", "ai_preferences": None},
+            {"user_id": "empty", "ai_preferences": {}},
+            {"user_id": "on", "ai_preferences": {"auto_schedule": True}},
+            {"user_id": "off", "ai_preferences": {"auto_schedule": False}},
+            {"user_id": "other", "ai_preferences": {"tone": "brief"}},
+        ]
+    ).execute()
+    fake_db.table("tasks").insert(
+        [
+            {"user_id": user_id, "title": f"{user_id} {i}", "status": status}
+            for user_id in ("on", "empty")
+            for i, status in enumerate(STATUSES)
+        ]
+    ).execute()
+
+    preferences = job._auto_schedule_preferences()
+    tasks = job._pending_tasks(["on", "empty"])
+
+    assert [row["user_id"] for row in preferences] == ["empty", "on", "other", "unset"]
+    assert {user_id: len(rows) for user_id, rows in tasks.items()} == {
+        "on": 3,
+        "empty": 3,
+    }
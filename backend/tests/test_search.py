@@ -0,0 +1,64 @@
+"""
+Tests for Full-Text Search Pagination
+"""
+import pytest
+from app.services import search as search_service
+
+
+def fake_search_tasks(db, params):
+    """Mimics search_tasks: filter, order by (rank, id) desc, keyset, limit"""
+    rows = [
+        row
+        for row in db.rows("tasks")
+        if row["user_id"] == params["p_user_id"] and params["p_query"] in row["title"].lower()
+    ]
+    rows.sort(key=lambda row: (row["rank"], row["id"]), reverse=True)
+    if params.get("p_after_rank") is not None:
+        after = (params["p_after_rank"], params["p_after_id"])
+        rows = [row for row in rows if (row["rank"], row["id"]) < after]
+    return rows[: params["p_limit"]]
+
+
+@pytest.fixture(autouse=True)
+def search_functions(fake_db):
+    fake_db.functions["search_tasks"] = fake_search_tasks
+
+
+def test_keyset_pages_cover_all_matches_once(fake_db):
+    fake_db.table("tasks").insert(
+        [
+            # Equal ranks are ordered by id, so ties never repeat or vanish
+            {"user_id": "u1", "title": f"review report {i}", "rank": float(i % 3)}
+            for i in range(7)
+        ]
+        + [{"user_id": "u2", "title": "review other", "rank": 9.0}]
+    ).execute()
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = search_service.search("search_tasks", "u1", "review", 3, cursor)
+        seen.extend(row["id"] for row in page)
+        if cursor is None:
+            break
+
+    expected = sorted(
+        (row for row in fake_db.rows("tasks") if row["user_id"] == "u1"),
+        key=lambda row: (row["rank"], row["id"]),
+        reverse=True,
+    )
+    assert seen == [row["id"] for row in expected]
+
+
+def test_last_page_has_no_cursor(fake_db):
+    fake_db.table("tasks").insert(
+        {"user_id": "u1", "title": "review", "rank": 1.0}
+    ).execute()
+
+    page, cursor = search_service.search("search_tasks", "u1", "review", 3)
+    assert len(page) == 1
+    assert cursor is None
+
+
+def test_invalid_cursor_rejected():
+    with pytest.raises(ValueError):
+        search_service.decode_cursor("not-a-cursor")
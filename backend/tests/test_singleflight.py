@@ -0,0 +1,140 @@
+"""
+Tests for Single-Flight Coalescing
+"""
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.core import singleflight
+from app.core.singleflight import SingleFlight
+from app.services.ai_scheduler import AIScheduler, schedule_generations
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the lock protocol"""
+
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.values)
+
+    async def eval(self, script, numkeys, key, token):
+        if self.values.get(key) == token:
+            del self.values[key]
+            return 1
+        return 0
+
+
+def use_redis(monkeypatch, client):
+    async def get_redis():
+        return client
+
+    monkeypatch.setattr(singleflight, "get_redis", get_redis)
+
+
+@pytest.mark.asyncio
+async def test_local_callers_share_one_computation(monkeypatch):
+    """Concurrent callers in one process await a single computation"""
+    use_redis(monkeypatch, None)
+    flight = SingleFlight("test", lock_ttl=5, wait_timeout=4)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": "schedule-1"}
+
+    async def fetch():
+        return None
+
+    results = await asyncio.gather(*(flight.do("u:2024-01-01", compute, fetch) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert all(result == {"id": "schedule-1"} for result in results)
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_callers(monkeypatch):
+    """A failed computation fails every waiter and is not cached"""
+    use_redis(monkeypatch, None)
+    flight = SingleFlight("test", lock_ttl=5, wait_timeout=4)
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def fetch():
+        return None
+
+    results = await asyncio.gather(
+        *(flight.do("k", compute, fetch) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_remote_follower_reads_leader_result(monkeypatch):
+    """A second node waits for the lock and reads the persisted result"""
+    use_redis(monkeypatch, FakeRedis())
+    node_a = SingleFlight("test", lock_ttl=5, wait_timeout=4, poll_interval=0.005)
+    node_b = SingleFlight("test", lock_ttl=5, wait_timeout=4, poll_interval=0.005)
+    stored = {}
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        stored["k"] = {"id": "schedule-1"}
+        return stored["k"]
+
+    async def fetch():
+        return stored.get("k")
+
+    leader = asyncio.create_task(node_a.do("k", compute, fetch))
+    await asyncio.sleep(0)
+    follower = await node_b.do("k", compute, fetch)
+
+    assert await leader == follower == {"id": "schedule-1"}
+    assert len(calls) == 1
+
+
+def test_followers_give_up_before_the_lock_expires():
+    with pytest.raises(ValueError, match="shorter"):
+        SingleFlight("test", lock_ttl=5, wait_timeout=5)
+    assert schedule_generations.wait_timeout < schedule_generations.lock_ttl
+
+
+@pytest.mark.asyncio
+async def test_leader_rechecks_for_a_saved_schedule(monkeypatch):
+    """A schedule saved between the first check and taking the lock is reused"""
+    use_redis(monkeypatch, None)
+    scheduler = AIScheduler("u1")
+    saved = {"id": "schedule-1"}
+    lookups = iter([None, saved])
+    generated = []
+
+    async def get_schedule(date):
+        return next(lookups)
+
+    async def generate_and_save(target_date):
+        generated.append(target_date)
+        return {"id": "schedule-2"}
+
+    monkeypatch.setattr(scheduler, "get_schedule", get_schedule)
+    monkeypatch.setattr(scheduler, "_generate_and_save", generate_and_save)
+
+    assert await scheduler.generate_schedule(date(2024, 1, 1)) == saved
+    assert generated == []
+
+    # Forced regeneration does not look
+    forced = await scheduler.generate_schedule(date(2024, 1, 1), force_regenerate=True)
+    assert forced == {"id": "schedule-2"}
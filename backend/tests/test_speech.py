@@ -0,0 +1,79 @@
+"""
+Tests for the Speech-to-Text Pipeline
+"""
+import io
+
+import pytest
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from app.core.workers import shutdown_process_pool
+from app.services.speech import (
+    SpeechTranscriber,
+    _plan_chunks,
+    prepare_audio,
+    register_engine,
+)
+
+
+def _length_engine(recognizer, audio, language: str) -> str:
+    """Offline engine that 'transcribes' a chunk as its length in seconds"""
+    seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+    return f"{round(seconds)}s"
+
+
+register_engine("length", _length_engine)
+
+
+def _memo(*parts: int) -> bytes:
+    """Build a stereo 44.1 kHz WAV alternating tone and silence"""
+    audio = AudioSegment.silent(duration=0, frame_rate=44100)
+    for i, duration in enumerate(parts):
+        if i % 2 == 0:
+            audio += Sine(440).to_audio_segment(duration=duration).set_frame_rate(44100)
+        else:
+            audio += AudioSegment.silent(duration=duration, frame_rate=44100)
+    buffer = io.BytesIO()
+    audio.set_channels(2).export(buffer, format="wav")
+    return buffer.getvalue()
+
+
+def test_plan_chunks_cuts_at_pauses():
+    """Ranges are grouped up to the chunk length and long speech is split"""
+    assert _plan_chunks([(0, 1000), (2000, 3000), (4000, 5000)], 3000) == [
+        (0, 3000),
+        (4000, 5000),
+    ]
+    assert _plan_chunks([(0, 7000)], 3000) == [(0, 3000), (3000, 6000), (6000, 7000)]
+
+
+def test_prepare_audio_normalizes_and_trims():
+    """Chunks are mono 16 kHz and leading/trailing silence is dropped"""
+    chunks = prepare_audio(_memo(0, 2000, 1000, 2000), "wav", 30000)
+
+    assert len(chunks) == 1
+    chunk = AudioSegment.from_file(io.BytesIO(chunks[0]), format="wav")
+    assert chunk.channels == 1
+    assert chunk.frame_rate == 16000
+    assert len(chunk) < 2000
+
+
+def test_prepare_audio_silence():
+    """Pure silence yields no chunks"""
+    buffer = io.BytesIO()
+    AudioSegment.silent(duration=1000).export(buffer, format="wav")
+    assert prepare_audio(buffer.getvalue(), "wav", 30000) == []
+
+
+@pytest.mark.asyncio
+async def test_transcribe_stitches_chunks_in_order():
+    """Chunks are transcribed in the pool and joined in order"""
+    transcriber = SpeechTranscriber(engine="length", chunk_seconds=2)
+    try:
+        text = await transcriber.transcribe(
+            _memo(1000, 1000, 1000, 1000, 3000), "wav"
+        )
+    finally:
+        shutdown_process_pool()
+
+    assert text == "1s 1s 2s 1s"
@@ -0,0 +1,106 @@
+"""
+Tests for Delta Sync
+"""
+import pytest
+
+HEADERS = {"Authorization": "Bearer token-u1"}
+
+
+class ChangeLog:
+    """Stands in for the change_seq triggers on an InMemorySupabase"""
+
+    def __init__(self, db):
+        self.db = db
+        self.seq = 0
+
+    def _next(self, user_id="u1"):
+        self.seq += 1
+        counters = self.db.table("user_change_counters")
+        counters.upsert(
+            {"user_id": user_id, "last_seq": self.seq, "pruned_seq": 0},
+            on_conflict="user_id",
+        ).execute()
+        return self.seq
+
+    def write(self, table, user_id="u1", **values):
+        row = {"user_id": user_id, "change_seq": self._next(user_id), **values}
+        if "id" in values:
+            return self.db.table(table).upsert(row, on_conflict="id").execute().data[0]
+        return self.db.table(table).insert(row).execute().data[0]
+
+    def delete(self, table, row, user_id="u1"):
+        self.db.table(table).delete().eq("id", row["id"]).execute()
+        self.db.table("sync_tombstones").insert(
+            {
+                "user_id": user_id,
+                "table_name": table,
+                "row_id": row["id"],
+                "change_seq": self._next(user_id),
+            }
+        ).execute()
+
+
+@pytest.fixture
+def log(fake_db):
+    return ChangeLog(fake_db)
+
+
+def changes(client, since=0, limit=500):
+    response = client.get(
+        f"/api/v1/sync/changes?since={since}&limit={limit}", headers=HEADERS
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_returns_only_what_changed_since_the_cursor(client, log):
+    task = log.write("tasks", title="Draft")
+    log.write("notes", content="idea")
+    full = changes(client)
+    assert [t["title"] for t in full["tasks"]] == ["Draft"]
+    assert len(full["notes"]) == 1
+    assert full["cursor"] == 2 and not full["has_more"]
+
+    log.write("tasks", id=task["id"], title="Final")
+    doomed = log.write("schedules", date="2024-01-08")
+    log.delete("schedules", doomed)
+    log.write("tasks", user_id="u2", title="Theirs")
+
+    delta = changes(client, full["cursor"])
+    assert [t["title"] for t in delta["tasks"]] == ["Final"]
+    assert delta["notes"] == [] and delta["schedules"] == []
+    assert delta["deleted"] == [
+        {"table": "schedules", "id": doomed["id"], "change_seq": 5}
+    ]
+    assert delta["cursor"] == 5
+
+    # Nothing new: an empty page at the same cursor
+    assert changes(client, delta["cursor"])["cursor"] == 5
+
+
+def test_pages_follow_change_order_across_tables(client, log):
+    for i in range(3):
+        log.write("tasks", title=f"task {i}")
+        log.write("notes", content=f"note {i}")
+
+    seen, cursor = [], 0
+    while True:
+        page = changes(client, cursor, limit=4)
+        seen += [row["change_seq"] for row in page["tasks"] + page["notes"]]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+
+    assert sorted(seen) == list(range(1, 7))
+
+
+def test_pruned_cursor_must_relist(client, log):
+    log.write("tasks", title="Old")
+    log.db.table("user_change_counters").update({"pruned_seq": 10}).eq(
+        "user_id", "u1"
+    ).execute()
+
+    response = client.get("/api/v1/sync/changes?since=3", headers=HEADERS)
+    assert response.status_code == 410
+    # A fresh sync needs no tombstones
+    assert changes(client)["tasks"][0]["title"] == "Old"
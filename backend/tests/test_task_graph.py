@@ -0,0 +1,172 @@
+"""
+Tests for Task Dependency Graphs
+"""
+import random
+import pytest
+from app.services.ai_scheduler import AIScheduler
+from app.services.task_graph import (
+    DependencyCycleError,
+    DependencyGraph,
+    TaskDependencyIndex,
+)
+
+HEADERS = {"Authorization": "Bearer token-u1"}
+
+
+def assert_order_respects_edges(graph: DependencyGraph):
+    order = graph.topological_order(node for edge in graph.edges() for node in edge)
+    position = {node: i for i, node in enumerate(order)}
+    for before, after in graph.edges():
+        assert position[before] < position[after]
+
+
+def test_back_edge_reorders_and_cycles_are_rejected():
+    graph = DependencyGraph()
+    graph.add_edge("b", "c")
+    graph.add_edge("a", "b")  # a was added after b, so it must move ahead
+
+    assert graph.topological_order(["c", "b", "a"]) == ["a", "b", "c"]
+    with pytest.raises(DependencyCycleError):
+        graph.add_edge("c", "a")
+    with pytest.raises(DependencyCycleError):
+        graph.add_edge("a", "a")
+    assert ("c", "a") not in graph.edges()
+
+
+def test_incremental_order_matches_acyclicity():
+    """Random edges are accepted exactly when they keep the graph acyclic"""
+    rng = random.Random(11)
+    graph = DependencyGraph()
+    reachable = {n: {n} for n in range(40)}
+    for n in range(40):
+        graph.add_node(n)
+
+    for _ in range(300):
+        before, after = rng.randrange(40), rng.randrange(40)
+        creates_cycle = before in reachable[after]
+        try:
+            graph.add_edge(before, after)
+        except DependencyCycleError:
+            assert creates_cycle
+            continue
+        assert not creates_cycle
+        for node, descendants in reachable.items():
+            if before in descendants:
+                descendants |= reachable[after]
+        assert_order_respects_edges(graph)
+
+
+def test_order_by_preference_pulls_prerequisites_forward():
+    graph = DependencyGraph()
+    graph.add_edge("write", "review")
+    graph.add_edge("review", "ship")
+
+    assert graph.order_by_preference(["ship", "email", "review", "write"]) == [
+        "write",
+        "review",
+        "ship",
+        "email",
+    ]
+    # Prerequisites outside the list are ignored
+    assert graph.order_by_preference(["ship", "email"]) == ["ship", "email"]
+
+
+def test_critical_path():
+    graph = DependencyGraph()
+    graph.add_edge("design", "build")
+    graph.add_edge("build", "test")
+    graph.add_edge("design", "docs")
+
+    path, total = graph.critical_path(
+        {"design": 60, "build": 240, "test": 30, "docs": 120, "solo": 300}
+    )
+    assert path == ["design", "build", "test"]
+    assert total == 330
+
+    path, total = graph.critical_path({"docs": 120, "solo": 300})
+    assert (path, total) == (["solo"], 300)
+
+
+@pytest.fixture
+def index(monkeypatch, fake_db):
+    index = TaskDependencyIndex()
+    monkeypatch.setattr("app.services.ai_scheduler.task_dependency_index", index)
+    fake_db.table("task_dependencies").insert(
+        [
+            {"user_id": "u1", "task_id": "review", "depends_on_id": "write"},
+            {"user_id": "u1", "task_id": "ship", "depends_on_id": "review"},
+        ]
+    ).execute()
+    return index
+
+
+def test_schedule_order_drops_blocked_tasks(index):
+    open_ids = {"write", "review", "ship", "email"}
+
+    assert index.schedule_order("u1", ["ship", "email", "review"], open_ids) == [
+        "email"
+    ]
+    # A finished prerequisite no longer blocks
+    open_ids.discard("write")
+    assert index.schedule_order("u1", ["ship", "email", "review"], open_ids) == [
+        "review",
+        "ship",
+        "email",
+    ]
+
+
+def test_scheduler_reorders_slots_and_keeps_gaps(index):
+    tasks = [{"id": task_id} for task_id in ("write", "review", "email")]
+    slots = [
+        {"task_id": "review", "start_time": "09:00", "end_time": "10:00", "order": 1},
+        {"task_id": "email", "start_time": "10:15", "end_time": "10:30", "order": 2},
+        {"task_id": "write", "start_time": "10:45", "end_time": "12:45", "order": 3},
+    ]
+
+    scheduled = AIScheduler("u1")._honor_dependencies(slots, tasks)
+
+    assert [
+        (slot["task_id"], slot["start_time"], slot["end_time"], slot["order"])
+        for slot in scheduled
+    ] == [
+        ("write", "09:00", "11:00", 1),
+        ("review", "11:15", "12:15", 2),
+        ("email", "12:30", "12:45", 3),
+    ]
+    # Already consistent schedules are returned untouched
+    assert AIScheduler("u1")._honor_dependencies(scheduled, tasks) is scheduled
+
+
+def test_graphs_load_past_the_row_cap_and_keep_recent_users(fake_db):
+    fake_db.table("task_dependencies").insert(
+        [
+            {"user_id": "u1", "task_id": f"t{i + 1}", "depends_on_id": f"t{i}"}
+            for i in range(fake_db.max_rows + 1)
+        ]
+        + [
+            {"user_id": user, "task_id": "b", "depends_on_id": "a"}
+            for user in ("u2", "u3")
+        ]
+    ).execute()
+    index = TaskDependencyIndex(max_users=2)
+
+    assert len(index.graph("u1").edges()) == fake_db.max_rows + 1
+    index.graph("u2")
+    index.graph("u1")
+    index.graph("u3")
+
+    assert list(index._graphs) == ["u1", "u3"]
+
+
+def test_critical_path_reads_open_tasks_past_the_row_cap(client, fake_db):
+    fake_db.table("tasks").insert(
+        [
+            {"user_id": "u1", "title": f"Task {i}", "estimated_duration": i + 1}
+            for i in range(fake_db.max_rows + 1)
+        ]
+    ).execute()
+
+    response = client.get("/api/v1/tasks/critical-path", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.json()["total_duration"] == fake_db.max_rows + 1
@@ -0,0 +1,190 @@
+"""
+Tests for Near-Duplicate Task Detection
+"""
+import pytest
+from app.core.config import settings
+from app.services import ingestion
+from app.services import schedule_cache as schedule_cache_module
+from app.services.audit import audit_log
+from app.services.ingestion import IngestionService
+from app.services.schedule_cache import schedule_cache
+from app.services.task_similarity import (
+    MinHasher,
+    SimilarityIndex,
+    TaskSimilarityIndex,
+    jaccard,
+    shingles,
+)
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles("Call Mom!") == shingles("call   mom")
+    assert shingles("") == set()
+    assert shingles("a") == {" a "}
+
+
+def test_signature_agreement_tracks_jaccard():
+    """Signature positions agree at roughly the sets' Jaccard similarity"""
+    hasher = MinHasher(num_perm=256)
+    a = shingles("prepare the quarterly budget review deck")
+    b = shingles("prepare quarterly budget review slides")
+    agreement = sum(
+        x == y for x, y in zip(hasher.signature(a), hasher.signature(b))
+    ) / hasher.num_perm
+    assert abs(agreement - jaccard(a, b)) < 0.12
+
+
+def test_best_match_scores_exactly():
+    index = SimilarityIndex(MinHasher())
+    index.add("invoice", "Send the invoice to the client")
+    index.add("report", "Write quarterly report")
+
+    key, score = index.best_match("Send invoice to client", None, 0.6)
+    assert key == "invoice"
+    assert score == pytest.approx(
+        jaccard(shingles("Send invoice to client"), shingles("Send the invoice to the client"))
+    )
+    assert index.best_match("Review report", None, 0.6) is None
+
+    assert index.remove("invoice")
+    assert index.best_match("Send invoice to client", None, 0.6) is None
+    assert len(index) == 1
+
+
+def test_descriptions_weigh_into_the_score():
+    index = SimilarityIndex(MinHasher())
+    index.add("a", "Call the bank", "ask about the mortgage rate")
+
+    assert index.best_match("Call the bank", "ask about mortgage rate", 0.9)
+    assert index.best_match("Call the bank", "dispute a card charge", 0.9) is None
+
+
+@pytest.fixture(autouse=True)
+def similarity_index(monkeypatch):
+    monkeypatch.setattr(
+        ingestion, "task_similarity_index", TaskSimilarityIndex(threshold=0.6)
+    )
+
+
+def open_task(db, title, priority="medium", status="pending"):
+    return (
+        db.table("tasks")
+        .insert({"user_id": "u1", "title": title, "priority": priority, "status": status})
+        .execute()
+        .data[0]
+    )
+
+
+@pytest.mark.asyncio
+async def test_merge_skips_duplicates_and_raises_priority(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "TASK_DEDUP_MODE", "merge")
+    existing = open_task(fake_db, "Send the invoice to the client")
+    open_task(fake_db, "Book dentist appointment", status="completed")
+
+    rows, duplicates = await IngestionService()._create_tasks_from_extraction(
+        "u1",
+        [
+            {"title": "Send invoice to client", "priority": "urgent"},
+            {"title": "Book dentist appointment"},
+            {"title": "Book the dentist appointment", "priority": "high"},
+        ],
+    )
+
+    assert rows[0] is None and rows[2] is None
+    assert rows[1]["title"] == "Book dentist appointment"
+    assert rows[1]["priority"] == "high"
+    assert [(d["extracted_index"], d["duplicate_of"], d["action"]) for d in duplicates] == [
+        (0, existing["id"], "merged"),
+        (2, rows[1]["id"], "merged"),
+    ]
+    assert len(fake_db.rows("tasks")) == 3
+    assert fake_db.rows("tasks")[0]["priority"] == "urgent"
+
+    # Created tasks are indexed for the next ingestion
+    rows, duplicates = await IngestionService()._create_tasks_from_extraction(
+        "u1", [{"title": "book dentist appointment"}]
+    )
+    assert rows == [None]
+    assert duplicates[0]["similarity"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_merged_priority_is_audited_and_invalidates_schedules(
+    fake_db, monkeypatch
+):
+    async def no_redis():
+        return None
+
+    async def load():
+        return {"id": "s1", "tasks": []}
+
+    monkeypatch.setattr(settings, "TASK_DEDUP_MODE", "merge")
+    monkeypatch.setattr(schedule_cache_module, "get_redis", no_redis)
+    existing = open_task(fake_db, "Send the invoice to the client")
+    fake_db.table("tasks").update(
+        {
+            "scheduled_start": "2024-01-08T09:00:00+00:00",
+            "scheduled_end": "2024-01-08T10:00:00+00:00",
+        }
+    ).eq("id", existing["id"]).execute()
+    await schedule_cache.get_or_load("u1", "2024-01-08", load)
+
+    await IngestionService()._create_tasks_from_extraction(
+        "u1", [{"title": "Send invoice to client", "priority": "urgent"}]
+    )
+
+    assert ("u1", "2024-01-08") not in schedule_cache._local
+    [event] = audit_log._buffer
+    assert (event["action"], event["entity_id"], event["changes"]) == (
+        "update",
+        existing["id"],
+        {"priority": "urgent"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_flag_mode_creates_and_reports(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "TASK_DEDUP_MODE", "flag")
+    existing = open_task(fake_db, "Send the invoice to the client")
+
+    rows, duplicates = await IngestionService()._create_tasks_from_extraction(
+        "u1", [{"title": "Send invoice to client"}, {"title": "Send invoice to client!"}]
+    )
+
+    assert all(rows)
+    assert [(d["duplicate_of"], d["action"]) for d in duplicates] == [
+        (existing["id"], "flagged"),
+        (rows[0]["id"], "flagged"),
+    ]
+    assert len(fake_db.rows("tasks")) == 3
+
+
+@pytest.mark.asyncio
+async def test_off_mode_inserts_everything(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "TASK_DEDUP_MODE", "off")
+    open_task(fake_db, "Send invoice to client")
+
+    rows, duplicates = await IngestionService()._create_tasks_from_extraction(
+        "u1", [{"title": "Send invoice to client"}]
+    )
+
+    assert rows[0]["title"] == "Send invoice to client"
+    assert duplicates == []
+
+
+def test_index_loads_past_the_row_cap_and_keeps_recent_users(fake_db):
+    fake_db.table("tasks").insert(
+        [
+            {"user_id": "u1", "title": f"Task {i}", "status": "pending"}
+            for i in range(fake_db.max_rows + 1)
+        ]
+        + [{"user_id": user, "title": "Water plants"} for user in ("u2", "u3")]
+    ).execute()
+    index = TaskSimilarityIndex(threshold=0.6, max_users=2)
+
+    assert len(index._index("u1")) == fake_db.max_rows + 1
+    index._index("u2")
+    index._index("u1")
+    index._index("u3")
+
+    assert list(index._indexes) == ["u1", "u3"]
@@ -0,0 +1,96 @@
+"""
+Tests for the Image Preprocessing Pipeline
+"""
+import io
+
+import pytest
+from PIL import Image, ImageDraw, UnidentifiedImageError
+from PIL.JpegImagePlugin import JpegImageFile
+
+from app.core.workers import shutdown_process_pool
+from app.services import vision
+from app.services.ingestion import IngestionService
+from app.services.vision import ImageTextExtractor, prepare_image
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    """A photo-sized JPEG with a few lines of 'text'"""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(1, 6):
+        y = row * height // 7
+        draw.rectangle((width // 10, y, width * 8 // 10, y + height // 40), "black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def test_decompression_bombs_are_refused_before_decoding():
+    # 8000 x 7000 is 56 MP, though the file is a few kilobytes
+    buffer = io.BytesIO()
+    Image.new("1", (8000, 7000)).save(buffer, format="PNG")
+    with pytest.raises(ValueError, match="too large"):
+        prepare_image(buffer.getvalue(), 1600, 256)
+
+
+def test_jpegs_are_decoded_at_reduced_scale(monkeypatch):
+    decoded_sizes = []
+    original_draft = JpegImageFile.draft
+
+    def spy(self, mode, size):
+        result = original_draft(self, mode, size)
+        decoded_sizes.append(self.size)
+        return result
+
+    monkeypatch.setattr(JpegImageFile, "draft", spy)
+
+    prepared = prepare_image(_jpeg(4000, 3000), 1600, 256)
+
+    # The decoder scaled by 1/2, the largest step that stays above 1600
+    assert decoded_sizes == [(2000, 1500)]
+    assert prepared["original_size"] == (4000, 3000)
+    assert prepared["size"] == (1600, 1200)
+    processed = Image.open(io.BytesIO(prepared["image"]))
+    assert (processed.format, processed.mode) == ("PNG", "L")
+
+
+def test_thumbnail_is_a_small_jpeg():
+    prepared = prepare_image(_jpeg(1200, 800), 1600, 256)
+
+    thumbnail = Image.open(io.BytesIO(prepared["thumbnail"]))
+    assert thumbnail.format == "JPEG"
+    assert thumbnail.size == (256, 171)
+    # Small images are not upscaled
+    assert prepared["size"] == (1200, 800)
+
+
+def test_malformed_images_are_rejected():
+    with pytest.raises(UnidentifiedImageError):
+        prepare_image(b"definitely not an image", 1600, 256)
+    with pytest.raises(OSError):
+        prepare_image(_jpeg(400, 300)[:200], 1600, 256)
+
+
+@pytest.mark.asyncio
+async def test_extractor_prepares_in_the_pool_and_saves_the_thumbnail(
+    monkeypatch, tmp_path
+):
+    monkeypatch.setattr(vision.settings, "IMAGE_MAX_DIMENSION", 800)
+    monkeypatch.setattr(vision.settings, "THUMBNAIL_SIZE", 128)
+    extractor = ImageTextExtractor(llm_service=None, engine="vision")
+    try:
+        prepared = await extractor.prepare(_jpeg(1600, 1200))
+    finally:
+        shutdown_process_pool()
+    assert prepared["size"] == (800, 600)
+
+    upload = tmp_path / "note.jpg"
+    path = await IngestionService()._save_thumbnail(str(upload), prepared["thumbnail"])
+
+    assert path == str(tmp_path / "note_thumb.jpg")
+    assert Image.open(path).size == (128, 96)
+
+
+def test_unknown_engines_are_refused():
+    with pytest.raises(ValueError, match="Unsupported image text engine"):
+        ImageTextExtractor(llm_service=None, engine="magic")
@@ -0,0 +1,23 @@
+-- Time ranges for scheduled tasks (overlap / conflict detection)
+
+-- Enable btree_gist so user_id can share a GiST index with the range
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Half-open [scheduled_start, scheduled_end) range, NULL when unscheduled
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS scheduled_range TSTZRANGE
+    GENERATED ALWAYS AS (
+        CASE
+            WHEN scheduled_start IS NOT NULL
+                AND scheduled_end IS NOT NULL
+                AND scheduled_end > scheduled_start
+            THEN tstzrange(scheduled_start, scheduled_end, '[)')
+        END
+    ) STORED;
+
+-- Create index for overlap queries (range && range)
+-- Overlaps are reported to the client rather than rejected, so this is a
+-- plain GiST index instead of an EXCLUDE constraint.
+CREATE INDEX IF NOT EXISTS idx_tasks_user_scheduled_range
+    ON tasks USING GIST (user_id, scheduled_range)
+    WHERE status IN ('pending', 'in_progress');
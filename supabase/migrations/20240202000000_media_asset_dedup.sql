@@ -0,0 +1,17 @@
+-- Content-addressed media assets (upload and ingestion deduplication)
+
+ALTER TABLE media_assets
+    ADD COLUMN IF NOT EXISTS content_hash TEXT,          -- SHA-256 of the uploaded bytes
+    ADD COLUMN IF NOT EXISTS perceptual_hash BIGINT,     -- 64-bit dHash, images only
+    ADD COLUMN IF NOT EXISTS note_id UUID REFERENCES notes(id) ON DELETE SET NULL;
+
+-- Create indexes for deduplication lookups
+CREATE UNIQUE INDEX IF NOT EXISTS idx_media_assets_user_content_hash
+    ON media_assets(user_id, content_hash);
+CREATE INDEX IF NOT EXISTS idx_media_assets_user_perceptual_hash
+    ON media_assets(user_id, created_at DESC)
+    WHERE perceptual_hash IS NOT NULL;
+
+-- Media assets are upserted on (user_id, content_hash)
+CREATE POLICY "Users can update their own media" ON media_assets
+    FOR UPDATE USING (auth.uid() = user_id);
@@ -0,0 +1,172 @@
+-- Full-text search over tasks and notes
+
+-- pg_trgm for typo-tolerant title matching; btree_gin so user_id can share
+-- a GIN index with the search vector
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+-- Weighted search vectors: titles rank above bodies
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+
+ALTER TABLE notes
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(transcription, '')), 'C')
+    ) STORED;
+
+-- Create indexes for search
+CREATE INDEX IF NOT EXISTS idx_tasks_search ON tasks USING GIN (user_id, search_vector);
+CREATE INDEX IF NOT EXISTS idx_notes_search ON notes USING GIN (user_id, search_vector);
+CREATE INDEX IF NOT EXISTS idx_tasks_title_trgm ON tasks USING GIN (user_id, title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_notes_title_trgm ON notes USING GIN (user_id, title gin_trgm_ops);
+
+-- Every word of the user's query as a prefix term: "proj rev" -> proj:* & rev:*
+CREATE OR REPLACE FUNCTION search_tsquery(p_query TEXT)
+RETURNS TSQUERY
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT to_tsquery(
+        'english',
+        coalesce(
+            nullif(
+                array_to_string(
+                    ARRAY(
+                        SELECT quote_literal(word) || ':*'
+                        FROM regexp_split_to_table(
+                            lower(regexp_replace(p_query, '[^[:alnum:]]+', ' ', 'g')),
+                            '\s+'
+                        ) AS word
+                        WHERE word <> ''
+                    ),
+                    ' & '
+                ),
+                ''
+            ),
+            ''
+        )
+    );
+$$;
+
+-- Ranked, highlighted, keyset-paginated task search.
+-- Pages are ordered by (rank DESC, id DESC); pass the last row's rank and id
+-- to get the next page. Headlines are computed for the returned page only.
+CREATE OR REPLACE FUNCTION search_tasks(
+    p_user_id UUID,
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_after_rank DOUBLE PRECISION DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    description TEXT,
+    priority TEXT,
+    status TEXT,
+    scheduled_start TIMESTAMPTZ,
+    created_at TIMESTAMPTZ,
+    rank DOUBLE PRECISION,
+    highlight TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH query AS (
+        SELECT search_tsquery(p_query) AS tsq
+    ),
+    matches AS (
+        SELECT
+            t.*,
+            (ts_rank_cd(t.search_vector, q.tsq) + similarity(t.title, p_query))::DOUBLE PRECISION AS rank
+        FROM tasks t, query q
+        WHERE t.user_id = p_user_id
+            AND (t.search_vector @@ q.tsq OR t.title % p_query)
+    ),
+    page AS (
+        SELECT *
+        FROM matches m
+        WHERE p_after_rank IS NULL
+            OR (m.rank, m.id) < (p_after_rank, p_after_id)
+        ORDER BY m.rank DESC, m.id DESC
+        LIMIT p_limit
+    )
+    SELECT
+        p.id,
+        p.title,
+        p.description,
+        p.priority,
+        p.status,
+        p.scheduled_start,
+        p.created_at,
+        p.rank,
+        ts_headline(
+            'english',
+            p.title || ' — ' || coalesce(p.description, ''),
+            q.tsq,
+            'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5'
+        ) AS highlight
+    FROM page p, query q
+    ORDER BY p.rank DESC, p.id DESC;
+$$;
+
+-- Ranked, highlighted, keyset-paginated note search (see search_tasks)
+CREATE OR REPLACE FUNCTION search_notes(
+    p_user_id UUID,
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_after_rank DOUBLE PRECISION DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    source_type TEXT,
+    created_at TIMESTAMPTZ,
+    rank DOUBLE PRECISION,
+    highlight TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH query AS (
+        SELECT search_tsquery(p_query) AS tsq
+    ),
+    matches AS (
+        SELECT
+            n.*,
+            (ts_rank_cd(n.search_vector, q.tsq) + similarity(coalesce(n.title, ''), p_query))::DOUBLE PRECISION AS rank
+        FROM notes n, query q
+        WHERE n.user_id = p_user_id
+            AND (n.search_vector @@ q.tsq OR n.title % p_query)
+    ),
+    page AS (
+        SELECT *
+        FROM matches m
+        WHERE p_after_rank IS NULL
+            OR (m.rank, m.id) < (p_after_rank, p_after_id)
+        ORDER BY m.rank DESC, m.id DESC
+        LIMIT p_limit
+    )
+    SELECT
+        p.id,
+        p.title,
+        p.source_type,
+        p.created_at,
+        p.rank,
+        ts_headline(
+            'english',
+            coalesce(p.title || ' — ', '') || p.content || coalesce(' ' || p.transcription, ''),
+            q.tsq,
+            'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5'
+        ) AS highlight
+    FROM page p, query q
+    ORDER BY p.rank DESC, p.id DESC;
+$$;
@@ -0,0 +1,53 @@
+-- Task dependencies ("task_id runs after depends_on_id")
+
+CREATE TABLE IF NOT EXISTS task_dependencies (
+    task_id UUID NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    depends_on_id UUID NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (task_id, depends_on_id),
+    CHECK (task_id <> depends_on_id)
+);
+
+-- Per-user graph loads and reverse lookups
+CREATE INDEX IF NOT EXISTS idx_task_dependencies_user_id ON task_dependencies(user_id);
+CREATE INDEX IF NOT EXISTS idx_task_dependencies_depends_on_id ON task_dependencies(depends_on_id);
+
+-- Reject edges that would close a cycle. The API checks first against its
+-- in-memory topological order; this catches writes racing across workers.
+CREATE OR REPLACE FUNCTION reject_task_dependency_cycle()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Serialize edge inserts per user so two halves of a cycle cannot pass together
+    PERFORM pg_advisory_xact_lock(hashtext(NEW.user_id::text));
+
+    IF EXISTS (
+        WITH RECURSIVE upstream(id) AS (
+            SELECT NEW.depends_on_id
+            UNION
+            SELECT d.depends_on_id
+            FROM task_dependencies d
+            JOIN upstream u ON d.task_id = u.id
+        )
+        SELECT 1 FROM upstream WHERE id = NEW.task_id
+    ) THEN
+        RAISE EXCEPTION 'Dependency would create a cycle'
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER reject_task_dependency_cycle BEFORE INSERT ON task_dependencies
+    FOR EACH ROW EXECUTE FUNCTION reject_task_dependency_cycle();
+
+ALTER TABLE task_dependencies ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own task dependencies" ON task_dependencies
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert their own task dependencies" ON task_dependencies
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete their own task dependencies" ON task_dependencies
+    FOR DELETE USING (auth.uid() = user_id);
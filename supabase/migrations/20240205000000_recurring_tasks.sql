@@ -0,0 +1,45 @@
+-- Recurring tasks: one template row per series, sparse per-occurrence rows
+
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS recurrence_rule TEXT;  -- RFC 5545 RRULE; the row is the series template
+
+CREATE INDEX IF NOT EXISTS idx_tasks_user_recurring
+    ON tasks(user_id)
+    WHERE recurrence_rule IS NOT NULL;
+
+-- Only occurrences that differ from their template are stored. NULL columns
+-- inherit the template's value.
+CREATE TABLE IF NOT EXISTS task_occurrences (
+    task_id UUID NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    occurrence_date DATE NOT NULL,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    status TEXT CHECK (status IN ('pending', 'in_progress', 'completed', 'cancelled')),
+    title TEXT,
+    description TEXT,
+    priority TEXT CHECK (priority IN ('low', 'medium', 'high', 'urgent')),
+    estimated_duration INTEGER, -- in minutes
+    scheduled_start TIMESTAMPTZ,
+    scheduled_end TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (task_id, occurrence_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_occurrences_user_id ON task_occurrences(user_id);
+
+CREATE TRIGGER update_task_occurrences_updated_at BEFORE UPDATE ON task_occurrences
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+ALTER TABLE task_occurrences ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own task occurrences" ON task_occurrences
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert their own task occurrences" ON task_occurrences
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update their own task occurrences" ON task_occurrences
+    FOR UPDATE USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete their own task occurrences" ON task_occurrences
+    FOR DELETE USING (auth.uid() = user_id);
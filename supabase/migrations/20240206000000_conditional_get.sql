@@ -0,0 +1,6 @@
+-- Conditional GET: list ETags are derived from count(*) and max(updated_at)
+-- of a user's rows, so both must be answerable from an index
+
+CREATE INDEX IF NOT EXISTS idx_tasks_user_updated_at ON tasks(user_id, updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_notes_user_updated_at ON notes(user_id, updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_schedules_user_date ON schedules(user_id, date, created_at DESC);
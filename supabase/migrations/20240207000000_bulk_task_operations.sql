@@ -0,0 +1,119 @@
+-- Bulk task writes: many creates, updates and deletes in one call and one transaction
+
+-- p_operations is a JSON array of {"op": "create", "data": {...}},
+-- {"op": "update", "id": ..., "data": {...}} and {"op": "delete", "id": ...}.
+-- Each kind runs as one set-based statement. Updates change only the keys
+-- present in data. Returns one row per operation, in input order; updates and
+-- deletes of tasks the user does not own report 'not_found'.
+CREATE OR REPLACE FUNCTION bulk_task_operations(
+    p_user_id UUID,
+    p_operations JSONB
+)
+RETURNS TABLE (
+    item INTEGER,
+    op TEXT,
+    outcome TEXT,
+    task JSONB
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    -- Two statements touching one row in a single query is undefined
+    IF EXISTS (
+        SELECT 1
+        FROM jsonb_array_elements(p_operations) o
+        WHERE o->>'id' IS NOT NULL
+        GROUP BY o->>'id'
+        HAVING count(*) > 1
+    ) THEN
+        RAISE EXCEPTION 'Each task may appear in at most one operation'
+            USING ERRCODE = 'invalid_parameter_value';
+    END IF;
+
+    RETURN QUERY
+    WITH ops AS MATERIALIZED (
+        SELECT
+            (o.ordinality - 1)::INTEGER AS item,
+            o.value->>'op' AS op,
+            CASE
+                WHEN o.value->>'op' = 'create' THEN uuid_generate_v4()
+                ELSE (o.value->>'id')::UUID
+            END AS id,
+            coalesce(o.value->'data', '{}'::JSONB) AS data
+        FROM jsonb_array_elements(p_operations) WITH ORDINALITY AS o
+    ),
+    created AS (
+        INSERT INTO tasks (
+            id, user_id, title, description, priority, status, estimated_duration,
+            scheduled_start, scheduled_end, tags, metadata, recurrence_rule
+        )
+        SELECT
+            c.id,
+            p_user_id,
+            r.title,
+            r.description,
+            coalesce(r.priority, 'medium'),
+            coalesce(r.status, 'pending'),
+            r.estimated_duration,
+            r.scheduled_start,
+            r.scheduled_end,
+            r.tags,
+            coalesce(r.metadata, '{}'::JSONB),
+            r.recurrence_rule
+        FROM ops c
+        CROSS JOIN LATERAL jsonb_populate_record(NULL::tasks, c.data) r
+        WHERE c.op = 'create'
+        RETURNING tasks.*
+    ),
+    updated AS (
+        UPDATE tasks t SET
+            title = CASE WHEN u.data ? 'title' THEN r.title ELSE t.title END,
+            description = CASE WHEN u.data ? 'description' THEN r.description ELSE t.description END,
+            priority = CASE WHEN u.data ? 'priority' THEN r.priority ELSE t.priority END,
+            status = CASE WHEN u.data ? 'status' THEN r.status ELSE t.status END,
+            estimated_duration = CASE WHEN u.data ? 'estimated_duration' THEN r.estimated_duration ELSE t.estimated_duration END,
+            scheduled_start = CASE WHEN u.data ? 'scheduled_start' THEN r.scheduled_start ELSE t.scheduled_start END,
+            scheduled_end = CASE WHEN u.data ? 'scheduled_end' THEN r.scheduled_end ELSE t.scheduled_end END,
+            actual_start = CASE WHEN u.data ? 'actual_start' THEN r.actual_start ELSE t.actual_start END,
+            actual_end = CASE WHEN u.data ? 'actual_end' THEN r.actual_end ELSE t.actual_end END,
+            tags = CASE WHEN u.data ? 'tags' THEN r.tags ELSE t.tags END,
+            metadata = CASE WHEN u.data ? 'metadata' THEN r.metadata ELSE t.metadata END,
+            recurrence_rule = CASE WHEN u.data ? 'recurrence_rule' THEN r.recurrence_rule ELSE t.recurrence_rule END
+        FROM ops u
+        CROSS JOIN LATERAL jsonb_populate_record(NULL::tasks, u.data) r
+        WHERE u.op = 'update'
+            AND t.id = u.id
+            AND t.user_id = p_user_id
+        RETURNING t.*
+    ),
+    deleted AS (
+        DELETE FROM tasks t
+        USING ops d
+        WHERE d.op = 'delete'
+            AND t.id = d.id
+            AND t.user_id = p_user_id
+        RETURNING t.*
+    ),
+    written AS (
+        SELECT w.id, to_jsonb(w) - 'search_vector' AS task FROM created w
+        UNION ALL
+        SELECT w.id, to_jsonb(w) - 'search_vector' FROM updated w
+        UNION ALL
+        SELECT w.id, to_jsonb(w) - 'search_vector' FROM deleted w
+    )
+    SELECT
+        o.item,
+        o.op,
+        CASE
+            WHEN w.task IS NULL THEN 'not_found'
+            WHEN o.op = 'create' THEN 'created'
+            WHEN o.op = 'update' THEN 'updated'
+            ELSE 'deleted'
+        END,
+        w.task
+    FROM ops o
+    LEFT JOIN written w ON w.id = o.id
+    ORDER BY o.item;
+END;
+$$;
@@ -0,0 +1,166 @@
+-- Delta sync: a per-user change sequence on synced rows, tombstones for deletes
+
+-- One counter row per user. Allocating a sequence number locks the row until
+-- commit, so one user's writes commit in sequence order and a client never
+-- skips a number that commits late.
+CREATE TABLE IF NOT EXISTS user_change_counters (
+    user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+    last_seq BIGINT NOT NULL DEFAULT 0,
+    pruned_seq BIGINT NOT NULL DEFAULT 0 -- tombstones at or below this are gone
+);
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    row_id UUID NOT NULL,
+    change_seq BIGINT NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, change_seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_deleted_at ON sync_tombstones(deleted_at);
+
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+
+-- Number existing rows per user in modification order
+CREATE TEMP TABLE sync_backfill ON COMMIT DROP AS
+SELECT
+    source,
+    id,
+    user_id,
+    row_number() OVER (PARTITION BY user_id ORDER BY modified_at, id) AS change_seq
+FROM (
+    SELECT 'tasks' AS source, id, user_id, updated_at AS modified_at FROM tasks
+    UNION ALL
+    SELECT 'notes', id, user_id, updated_at FROM notes
+    UNION ALL
+    SELECT 'schedules', id, user_id, updated_at FROM schedules
+    UNION ALL
+    SELECT 'notifications', id, user_id, created_at FROM notifications
+) synced;
+
+-- Keep updated_at (and with it ETags) unchanged by the backfill
+ALTER TABLE tasks DISABLE TRIGGER update_tasks_updated_at;
+ALTER TABLE notes DISABLE TRIGGER update_notes_updated_at;
+ALTER TABLE schedules DISABLE TRIGGER update_schedules_updated_at;
+
+UPDATE tasks t SET change_seq = b.change_seq
+FROM sync_backfill b WHERE b.source = 'tasks' AND b.id = t.id;
+UPDATE notes n SET change_seq = b.change_seq
+FROM sync_backfill b WHERE b.source = 'notes' AND b.id = n.id;
+UPDATE schedules s SET change_seq = b.change_seq
+FROM sync_backfill b WHERE b.source = 'schedules' AND b.id = s.id;
+UPDATE notifications n SET change_seq = b.change_seq
+FROM sync_backfill b WHERE b.source = 'notifications' AND b.id = n.id;
+
+ALTER TABLE tasks ENABLE TRIGGER update_tasks_updated_at;
+ALTER TABLE notes ENABLE TRIGGER update_notes_updated_at;
+ALTER TABLE schedules ENABLE TRIGGER update_schedules_updated_at;
+
+INSERT INTO user_change_counters (user_id, last_seq)
+SELECT user_id, max(change_seq) FROM sync_backfill GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET last_seq = EXCLUDED.last_seq;
+
+ALTER TABLE tasks ALTER COLUMN change_seq SET NOT NULL;
+ALTER TABLE notes ALTER COLUMN change_seq SET NOT NULL;
+ALTER TABLE schedules ALTER COLUMN change_seq SET NOT NULL;
+ALTER TABLE notifications ALTER COLUMN change_seq SET NOT NULL;
+
+-- "Changed since" scans
+CREATE INDEX IF NOT EXISTS idx_tasks_user_change_seq ON tasks(user_id, change_seq);
+CREATE INDEX IF NOT EXISTS idx_notes_user_change_seq ON notes(user_id, change_seq);
+CREATE INDEX IF NOT EXISTS idx_schedules_user_change_seq ON schedules(user_id, change_seq);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_change_seq ON notifications(user_id, change_seq);
+
+-- SECURITY DEFINER: writes under RLS may not touch counters or tombstones directly
+CREATE OR REPLACE FUNCTION next_change_seq(p_user_id UUID)
+RETURNS BIGINT
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    INSERT INTO user_change_counters (user_id, last_seq)
+    VALUES (p_user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET last_seq = user_change_counters.last_seq + 1
+    RETURNING last_seq;
+$$;
+
+CREATE OR REPLACE FUNCTION stamp_change_seq()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.change_seq := next_change_seq(NEW.user_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_sync_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Rows removed because their user was deleted need no tombstone
+    IF EXISTS (SELECT 1 FROM auth.users WHERE id = OLD.user_id) THEN
+        INSERT INTO sync_tombstones (user_id, table_name, row_id, change_seq)
+        VALUES (OLD.user_id, TG_TABLE_NAME, OLD.id, next_change_seq(OLD.user_id));
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER stamp_tasks_change_seq BEFORE INSERT OR UPDATE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION stamp_change_seq();
+CREATE TRIGGER stamp_notes_change_seq BEFORE INSERT OR UPDATE ON notes
+    FOR EACH ROW EXECUTE FUNCTION stamp_change_seq();
+CREATE TRIGGER stamp_schedules_change_seq BEFORE INSERT OR UPDATE ON schedules
+    FOR EACH ROW EXECUTE FUNCTION stamp_change_seq();
+CREATE TRIGGER stamp_notifications_change_seq BEFORE INSERT OR UPDATE ON notifications
+    FOR EACH ROW EXECUTE FUNCTION stamp_change_seq();
+
+CREATE TRIGGER tombstone_tasks AFTER DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+CREATE TRIGGER tombstone_notes AFTER DELETE ON notes
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+CREATE TRIGGER tombstone_schedules AFTER DELETE ON schedules
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+CREATE TRIGGER tombstone_notifications AFTER DELETE ON notifications
+    FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+
+-- Drop old tombstones (e.g. daily from pg_cron). Clients whose cursor falls
+-- below a user's pruned_seq must relist from scratch.
+CREATE OR REPLACE FUNCTION prune_sync_tombstones(p_older_than INTERVAL DEFAULT '30 days')
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    pruned INTEGER;
+BEGIN
+    WITH gone AS (
+        DELETE FROM sync_tombstones
+        WHERE deleted_at < NOW() - p_older_than
+        RETURNING user_id, change_seq
+    ),
+    per_user AS (
+        SELECT user_id, max(change_seq) AS through_seq, count(*) AS n
+        FROM gone
+        GROUP BY user_id
+    ),
+    marked AS (
+        UPDATE user_change_counters c
+        SET pruned_seq = GREATEST(c.pruned_seq, p.through_seq)
+        FROM per_user p
+        WHERE c.user_id = p.user_id
+    )
+    SELECT coalesce(sum(n), 0) INTO pruned FROM per_user;
+    RETURN pruned;
+END;
+$$;
+
+ALTER TABLE user_change_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE sync_tombstones ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own change counter" ON user_change_counters
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view their own tombstones" ON sync_tombstones
+    FOR SELECT USING (auth.uid() = user_id);
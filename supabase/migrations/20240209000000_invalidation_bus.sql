@@ -0,0 +1,56 @@
+-- Cache invalidation bus: one compact NOTIFY per changed row on 'cache_invalidation'
+
+-- Payloads carry what in-process caches need to evict or patch themselves
+-- without a read: tasks their slot, status and a fingerprint of the fields
+-- the similarity index keeps (mirrors task_similarity.fingerprint). NOTIFY is
+-- delivered on commit, and identical payloads in one transaction fold.
+CREATE OR REPLACE FUNCTION notify_cache_invalidation()
+RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+    payload JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        r := OLD;
+    ELSE
+        r := NEW;
+    END IF;
+
+    payload := jsonb_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'user_id', r.user_id);
+    IF TG_TABLE_NAME = 'tasks' THEN
+        payload := payload || jsonb_build_object(
+            'id', r.id,
+            'status', r.status,
+            'scheduled_start', r.scheduled_start,
+            'scheduled_end', r.scheduled_end,
+            'fingerprint', left(md5(
+                coalesce(r.title, '') || chr(31) || coalesce(r.description, '') || chr(31) || r.priority
+            ), 16)
+        );
+    ELSIF TG_TABLE_NAME = 'schedules' THEN
+        payload := payload || jsonb_build_object('id', r.id, 'date', r.date);
+    ELSIF TG_TABLE_NAME = 'task_dependencies' THEN
+        payload := payload || jsonb_build_object(
+            'task_id', r.task_id,
+            'depends_on_id', r.depends_on_id
+        );
+    END IF;
+
+    PERFORM pg_notify('cache_invalidation', payload::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notify_tasks_invalidation AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER notify_schedules_invalidation AFTER INSERT OR UPDATE OR DELETE ON schedules
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER notify_task_dependencies_invalidation AFTER INSERT OR DELETE ON task_dependencies
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
+
+-- Preferences are read per request today; the event is there for whichever
+-- cache holds them next
+CREATE TRIGGER notify_user_preferences_invalidation AFTER INSERT OR UPDATE OR DELETE ON user_preferences
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation();
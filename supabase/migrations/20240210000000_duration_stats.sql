@@ -0,0 +1,101 @@
+-- Learned duration estimates: running statistics of actual / estimated time
+
+-- One row per user and bucket. tag = '' is the bucket of all the user's
+-- tasks of that priority, priority = '' the bucket of all priorities, so a
+-- task with few samples in its own buckets falls back to broader ones.
+-- mean_ratio and m2 are maintained with Welford's update: m2 is the sum of
+-- squared deviations from the mean, variance = m2 / (sample_count - 1).
+CREATE TABLE IF NOT EXISTS task_duration_stats (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    priority TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    sample_count BIGINT NOT NULL DEFAULT 0,
+    mean_ratio DOUBLE PRECISION NOT NULL DEFAULT 0,
+    m2 DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, priority, tag)
+);
+
+-- actual / estimated for a completed task, NULL if it is not a usable sample.
+-- Ratios outside [0.1, 10] are almost always a timer left running or a task
+-- ticked off long after it was done, and would swamp the mean.
+CREATE OR REPLACE FUNCTION task_duration_ratio(t tasks)
+RETURNS DOUBLE PRECISION
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT ratio
+    FROM (
+        SELECT EXTRACT(EPOCH FROM t.actual_end - t.actual_start) / 60.0
+            / t.estimated_duration AS ratio
+        WHERE t.status = 'completed'
+            AND t.estimated_duration > 0
+            AND t.actual_end > t.actual_start
+    ) sample
+    WHERE ratio BETWEEN 0.1 AND 10;
+$$;
+
+-- The buckets a task's samples count towards
+CREATE OR REPLACE FUNCTION task_duration_buckets(p_priority TEXT, p_tags TEXT[])
+RETURNS TABLE (priority TEXT, tag TEXT)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT DISTINCT p.priority, g.tag
+    FROM unnest(ARRAY[p_priority, '']) AS p(priority)
+    CROSS JOIN unnest(ARRAY[''] || coalesce(p_tags, '{}')) AS g(tag);
+$$;
+
+-- SECURITY DEFINER: users may only read their statistics
+CREATE OR REPLACE FUNCTION record_task_duration()
+RETURNS TRIGGER AS $$
+DECLARE
+    x DOUBLE PRECISION;
+BEGIN
+    -- Count a task once, when it first becomes a usable sample: completing
+    -- it, or filling in its times afterwards. Later edits are not re-counted.
+    x := task_duration_ratio(NEW);
+    IF x IS NULL OR (TG_OP = 'UPDATE' AND task_duration_ratio(OLD) IS NOT NULL) THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO task_duration_stats AS s (user_id, priority, tag, sample_count, mean_ratio, m2)
+    SELECT NEW.user_id, b.priority, b.tag, 1, x, 0
+    FROM task_duration_buckets(NEW.priority, NEW.tags) b
+    ON CONFLICT (user_id, priority, tag) DO UPDATE SET
+        sample_count = s.sample_count + 1,
+        mean_ratio = s.mean_ratio + (x - s.mean_ratio) / (s.sample_count + 1),
+        m2 = s.m2 + (x - s.mean_ratio)
+            * (x - (s.mean_ratio + (x - s.mean_ratio) / (s.sample_count + 1))),
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER record_tasks_duration
+    AFTER INSERT OR UPDATE OF status, estimated_duration, actual_start, actual_end ON tasks
+    FOR EACH ROW
+    WHEN (NEW.status = 'completed')
+    EXECUTE FUNCTION record_task_duration();
+
+-- Backfill from tasks completed so far
+INSERT INTO task_duration_stats (user_id, priority, tag, sample_count, mean_ratio, m2)
+SELECT
+    t.user_id,
+    b.priority,
+    b.tag,
+    count(*),
+    avg(t.ratio),
+    coalesce(var_pop(t.ratio) * count(*), 0)
+FROM (
+    SELECT user_id, priority, tags, task_duration_ratio(tasks) AS ratio FROM tasks
+) t
+CROSS JOIN LATERAL task_duration_buckets(t.priority, t.tags) b
+WHERE t.ratio IS NOT NULL
+GROUP BY t.user_id, b.priority, b.tag
+ON CONFLICT (user_id, priority, tag) DO NOTHING;
+
+ALTER TABLE task_duration_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own duration statistics" ON task_duration_stats
+    FOR SELECT USING (auth.uid() = user_id);
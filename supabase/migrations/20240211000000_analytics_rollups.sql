@@ -0,0 +1,190 @@
+-- Analytics rollups: per-user daily aggregates kept current by triggers
+
+-- When a task was completed. updated_at moves with every later edit, so
+-- completions are dated by this instead.
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS completed_at TIMESTAMPTZ;
+
+CREATE OR REPLACE FUNCTION stamp_completed_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status <> 'completed' THEN
+        NEW.completed_at := NULL;
+    ELSIF TG_OP = 'INSERT' OR OLD.status <> 'completed' THEN
+        NEW.completed_at := coalesce(NEW.actual_end, NOW());
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER stamp_tasks_completed_at BEFORE INSERT OR UPDATE OF status ON tasks
+    FOR EACH ROW EXECUTE FUNCTION stamp_completed_at();
+
+-- The backfill changes nothing clients or caches look at: keep updated_at
+-- (and with it ETags) and change_seq as they are, and notify no one
+ALTER TABLE tasks DISABLE TRIGGER update_tasks_updated_at;
+ALTER TABLE tasks DISABLE TRIGGER stamp_tasks_change_seq;
+ALTER TABLE tasks DISABLE TRIGGER notify_tasks_invalidation;
+UPDATE tasks SET completed_at = coalesce(actual_end, updated_at)
+WHERE status = 'completed' AND completed_at IS NULL;
+ALTER TABLE tasks ENABLE TRIGGER update_tasks_updated_at;
+ALTER TABLE tasks ENABLE TRIGGER stamp_tasks_change_seq;
+ALTER TABLE tasks ENABLE TRIGGER notify_tasks_invalidation;
+
+-- Completed tasks and time spent on them, per UTC day of completion
+CREATE TABLE IF NOT EXISTS task_daily_rollups (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    priority TEXT NOT NULL,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    minutes_spent DOUBLE PRECISION NOT NULL DEFAULT 0, -- actual_end - actual_start
+    PRIMARY KEY (user_id, day, priority)
+);
+
+-- Scheduled slots and how they went, per UTC day of the slot's start
+CREATE TABLE IF NOT EXISTS schedule_daily_rollups (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    scheduled_count INTEGER NOT NULL DEFAULT 0,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    started_count INTEGER NOT NULL DEFAULT 0,
+    on_time_count INTEGER NOT NULL DEFAULT 0, -- started within 10 minutes
+    start_delay_minutes DOUBLE PRECISION NOT NULL DEFAULT 0, -- summed over started slots
+    PRIMARY KEY (user_id, day)
+);
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one row's contribution
+CREATE OR REPLACE FUNCTION apply_task_rollup(t tasks, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO task_daily_rollups AS r (user_id, day, priority, completed_count, minutes_spent)
+    SELECT
+        t.user_id,
+        (t.completed_at AT TIME ZONE 'UTC')::date,
+        t.priority,
+        p_sign,
+        p_sign * coalesce(
+            GREATEST(EXTRACT(EPOCH FROM t.actual_end - t.actual_start) / 60.0, 0), 0
+        )
+    WHERE t.status = 'completed' AND t.completed_at IS NOT NULL
+    ON CONFLICT (user_id, day, priority) DO UPDATE SET
+        completed_count = r.completed_count + EXCLUDED.completed_count,
+        minutes_spent = r.minutes_spent + EXCLUDED.minutes_spent;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_schedule_rollup(h scheduling_history, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO schedule_daily_rollups AS r (
+        user_id, day, scheduled_count, completed_count, started_count,
+        on_time_count, start_delay_minutes
+    )
+    SELECT
+        h.user_id,
+        (h.scheduled_start AT TIME ZONE 'UTC')::date,
+        p_sign,
+        p_sign * coalesce(h.completed, FALSE)::int,
+        p_sign * (h.actual_start IS NOT NULL)::int,
+        p_sign * coalesce(h.actual_start <= h.scheduled_start + INTERVAL '10 minutes', FALSE)::int,
+        p_sign * coalesce(
+            GREATEST(EXTRACT(EPOCH FROM h.actual_start - h.scheduled_start) / 60.0, 0), 0
+        )
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        scheduled_count = r.scheduled_count + EXCLUDED.scheduled_count,
+        completed_count = r.completed_count + EXCLUDED.completed_count,
+        started_count = r.started_count + EXCLUDED.started_count,
+        on_time_count = r.on_time_count + EXCLUDED.on_time_count,
+        start_delay_minutes = r.start_delay_minutes + EXCLUDED.start_delay_minutes;
+$$;
+
+-- SECURITY DEFINER: users may only read their rollups
+CREATE OR REPLACE FUNCTION maintain_task_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        -- Rows removed because their user was deleted need no update
+        IF TG_OP = 'DELETE'
+            AND NOT EXISTS (SELECT 1 FROM auth.users WHERE id = OLD.user_id) THEN
+            RETURN NULL;
+        END IF;
+        PERFORM apply_task_rollup(OLD, -1);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM apply_task_rollup(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION maintain_schedule_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        IF TG_OP = 'DELETE'
+            AND NOT EXISTS (SELECT 1 FROM auth.users WHERE id = OLD.user_id) THEN
+            RETURN NULL;
+        END IF;
+        PERFORM apply_schedule_rollup(OLD, -1);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM apply_schedule_rollup(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only changes that move a row between buckets or change its measures
+CREATE TRIGGER maintain_tasks_rollups_insert_delete AFTER INSERT OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION maintain_task_rollups();
+CREATE TRIGGER maintain_tasks_rollups_update AFTER UPDATE ON tasks
+    FOR EACH ROW
+    WHEN (
+        (OLD.status = 'completed' OR NEW.status = 'completed')
+        AND (OLD.status, OLD.completed_at, OLD.priority, OLD.actual_start, OLD.actual_end)
+            IS DISTINCT FROM
+            (NEW.status, NEW.completed_at, NEW.priority, NEW.actual_start, NEW.actual_end)
+    )
+    EXECUTE FUNCTION maintain_task_rollups();
+
+CREATE TRIGGER maintain_scheduling_history_rollups
+    AFTER INSERT OR UPDATE OR DELETE ON scheduling_history
+    FOR EACH ROW EXECUTE FUNCTION maintain_schedule_rollups();
+
+-- Backfill
+INSERT INTO task_daily_rollups (user_id, day, priority, completed_count, minutes_spent)
+SELECT
+    user_id,
+    (completed_at AT TIME ZONE 'UTC')::date,
+    priority,
+    count(*),
+    sum(coalesce(GREATEST(EXTRACT(EPOCH FROM actual_end - actual_start) / 60.0, 0), 0))
+FROM tasks
+WHERE status = 'completed' AND completed_at IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (user_id, day, priority) DO NOTHING;
+
+INSERT INTO schedule_daily_rollups (
+    user_id, day, scheduled_count, completed_count, started_count,
+    on_time_count, start_delay_minutes
+)
+SELECT
+    user_id,
+    (scheduled_start AT TIME ZONE 'UTC')::date,
+    count(*),
+    count(*) FILTER (WHERE completed),
+    count(actual_start),
+    count(*) FILTER (WHERE actual_start <= scheduled_start + INTERVAL '10 minutes'),
+    sum(coalesce(GREATEST(EXTRACT(EPOCH FROM actual_start - scheduled_start) / 60.0, 0), 0))
+FROM scheduling_history
+GROUP BY 1, 2
+ON CONFLICT (user_id, day) DO NOTHING;
+
+ALTER TABLE task_daily_rollups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE schedule_daily_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own task rollups" ON task_daily_rollups
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view their own schedule rollups" ON schedule_daily_rollups
+    FOR SELECT USING (auth.uid() = user_id);
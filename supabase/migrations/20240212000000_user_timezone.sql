@@ -0,0 +1,3 @@
+-- The zone a user's work hours and schedule slot times (HH:MM) are in
+
+ALTER TABLE user_preferences ADD COLUMN IF NOT EXISTS timezone TEXT NOT NULL DEFAULT 'UTC';
@@ -0,0 +1,26 @@
+-- Near-duplicate image lookup over all of a user's perceptual hashes
+
+-- The user's closest image within p_max_distance differing bits, most
+-- recent first on ties. The partial index on (user_id, created_at) narrows
+-- the scan to the user's hashed images; comparing them here instead of in
+-- the application avoids shipping every hash over the wire.
+CREATE OR REPLACE FUNCTION nearest_image_asset(
+    p_user_id UUID,
+    p_hash BIGINT,
+    p_max_distance INTEGER
+)
+RETURNS SETOF media_assets
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT m.*
+    FROM media_assets m
+    CROSS JOIN LATERAL (
+        SELECT bit_count((m.perceptual_hash # p_hash)::bit(64)) AS distance
+    ) d
+    WHERE m.user_id = p_user_id
+        AND m.perceptual_hash IS NOT NULL
+        AND d.distance <= p_max_distance
+    ORDER BY d.distance, m.created_at DESC
+    LIMIT 1;
+$$;
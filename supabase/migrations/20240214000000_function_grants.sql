@@ -0,0 +1,20 @@
+-- Keep SECURITY DEFINER functions out of reach of API clients
+
+-- Functions are executable by PUBLIC by default, and Supabase grants anon
+-- and authenticated EXECUTE on new functions in public besides, so any
+-- client could call next_change_seq over RPC and bump another user's
+-- sequence. Only triggers call it; they now run as the owner to do so.
+ALTER FUNCTION stamp_change_seq() SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION next_change_seq(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION prune_sync_tombstones(INTERVAL)
+    FROM PUBLIC, anon, authenticated;
+
+-- Trigger functions cannot be called directly, but need no grant either:
+-- privileges are checked when the trigger is created, not when it fires
+REVOKE EXECUTE ON FUNCTION stamp_change_seq() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION record_sync_tombstone() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION record_task_duration() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION maintain_task_rollups() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION maintain_schedule_rollups()
+    FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,164 @@
+-- Scheduling history: a row per slot of each day's schedule in effect, kept
+-- current by triggers as schedules are generated or adjusted and as the
+-- scheduled tasks are started and completed. The adherence rollups count it.
+
+-- The instant an HH:MM slot time on p_day stands for in p_zone, NULL if the
+-- time is malformed
+CREATE OR REPLACE FUNCTION slot_instant(p_day DATE, p_time TEXT, p_zone TEXT)
+RETURNS TIMESTAMPTZ
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT (p_day + substring(p_time FROM '^(?:[01]?\d|2[0-3]):[0-5]\d')::time)
+        AT TIME ZONE p_zone;
+$$;
+
+-- Rebuild a day's history from the user's schedule in effect for it, the
+-- latest created, taking progress so far from the tasks. Slots that name no
+-- task of the user's, or do not end after they start, are left out.
+-- Occurrences of recurring tasks ("<series id>:<date>") count against their
+-- series and are completed when their stored occurrence is.
+CREATE OR REPLACE FUNCTION refresh_scheduling_history(p_user_id UUID, p_day DATE)
+RETURNS VOID AS $$
+DECLARE
+    current_schedule schedules;
+    zone TEXT;
+BEGIN
+    DELETE FROM scheduling_history h
+    USING schedules s
+    WHERE h.schedule_id = s.id AND s.user_id = p_user_id AND s.date = p_day;
+
+    SELECT * INTO current_schedule
+    FROM schedules
+    WHERE user_id = p_user_id AND date = p_day
+    ORDER BY created_at DESC
+    LIMIT 1;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    zone := coalesce(
+        (SELECT timezone FROM user_preferences WHERE user_id = p_user_id), 'UTC'
+    );
+    BEGIN
+        PERFORM NOW() AT TIME ZONE zone;
+    EXCEPTION WHEN invalid_parameter_value THEN
+        zone := 'UTC';
+    END;
+
+    INSERT INTO scheduling_history (
+        user_id, schedule_id, task_id, scheduled_start, scheduled_end,
+        actual_start, actual_end, completed
+    )
+    SELECT
+        p_user_id,
+        current_schedule.id,
+        t.id,
+        slot.scheduled_start,
+        slot.scheduled_end,
+        CASE WHEN t.recurrence_rule IS NULL THEN t.actual_start END,
+        CASE WHEN t.recurrence_rule IS NULL THEN t.actual_end END,
+        CASE
+            WHEN t.recurrence_rule IS NULL THEN t.status = 'completed'
+            ELSE coalesce(o.status = 'completed', FALSE)
+        END
+    FROM (
+        SELECT
+            CASE
+                WHEN split_part(value->>'task_id', ':', 1)
+                    ~* '^[0-9a-f]{8}-([0-9a-f]{4}-){3}[0-9a-f]{12}$'
+                THEN split_part(value->>'task_id', ':', 1)::uuid
+            END AS task_id,
+            slot_instant(p_day, value->>'start_time', zone) AS scheduled_start,
+            slot_instant(p_day, value->>'end_time', zone) AS scheduled_end
+        FROM jsonb_array_elements(current_schedule.tasks)
+    ) slot
+    JOIN tasks t ON t.id = slot.task_id AND t.user_id = p_user_id
+    LEFT JOIN task_occurrences o ON o.task_id = t.id AND o.occurrence_date = p_day
+    WHERE slot.scheduled_end > slot.scheduled_start;
+END;
+$$ LANGUAGE plpgsql;
+
+-- SECURITY DEFINER: users may not update or delete their history
+CREATE OR REPLACE FUNCTION maintain_scheduling_history()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- Rows removed because their user was deleted need no history
+        IF EXISTS (SELECT 1 FROM auth.users WHERE id = OLD.user_id) THEN
+            PERFORM refresh_scheduling_history(OLD.user_id, OLD.date);
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' AND (OLD.user_id, OLD.date) <> (NEW.user_id, NEW.date) THEN
+        PERFORM refresh_scheduling_history(OLD.user_id, OLD.date);
+    END IF;
+    PERFORM refresh_scheduling_history(NEW.user_id, NEW.date);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION record_task_progress()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE scheduling_history
+    SET actual_start = NEW.actual_start,
+        actual_end = NEW.actual_end,
+        completed = NEW.status = 'completed'
+    WHERE task_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION record_occurrence_progress()
+RETURNS TRIGGER AS $$
+DECLARE
+    occurrence task_occurrences;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        occurrence := OLD;
+    ELSE
+        occurrence := NEW;
+    END IF;
+    -- A deleted occurrence is back to its series' (open) status
+    UPDATE scheduling_history h
+    SET completed = TG_OP <> 'DELETE' AND coalesce(occurrence.status = 'completed', FALSE)
+    FROM schedules s
+    WHERE h.schedule_id = s.id
+        AND h.task_id = occurrence.task_id
+        AND s.date = occurrence.occurrence_date;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER maintain_schedules_history AFTER INSERT OR DELETE ON schedules
+    FOR EACH ROW EXECUTE FUNCTION maintain_scheduling_history();
+CREATE TRIGGER maintain_schedules_history_update
+    AFTER UPDATE OF user_id, date, tasks ON schedules
+    FOR EACH ROW EXECUTE FUNCTION maintain_scheduling_history();
+
+CREATE TRIGGER record_tasks_progress
+    AFTER UPDATE OF status, actual_start, actual_end ON tasks
+    FOR EACH ROW
+    WHEN (
+        NEW.recurrence_rule IS NULL
+        AND (OLD.status, OLD.actual_start, OLD.actual_end)
+            IS DISTINCT FROM (NEW.status, NEW.actual_start, NEW.actual_end)
+    )
+    EXECUTE FUNCTION record_task_progress();
+
+CREATE TRIGGER record_task_occurrences_progress
+    AFTER INSERT OR UPDATE OF status OR DELETE ON task_occurrences
+    FOR EACH ROW EXECUTE FUNCTION record_occurrence_progress();
+
+REVOKE EXECUTE ON FUNCTION refresh_scheduling_history(UUID, DATE)
+    FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION maintain_scheduling_history()
+    FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION record_task_progress() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION record_occurrence_progress()
+    FROM PUBLIC, anon, authenticated;
+
+-- Backfill from the schedules so far; the rollup triggers count the rows
+SELECT refresh_scheduling_history(user_id, date)
+FROM (SELECT DISTINCT user_id, date FROM schedules) days;
@@ -0,0 +1,130 @@
+-- Analytics rollups by the user's local day
+
+-- Schedules, and with them scheduling_history, are built for a day in the
+-- user's zone, so rollups keyed by the UTC day counted a 19:00 slot in New
+-- York under the next day, and completions likewise. Rollups are now keyed
+-- by the day in user_preferences.timezone, and rebuilt when it changes.
+
+-- The user's zone, UTC if unset or unknown to the server
+CREATE OR REPLACE FUNCTION user_zone_name(p_user_id UUID)
+RETURNS TEXT AS $$
+DECLARE
+    zone TEXT;
+BEGIN
+    SELECT timezone INTO zone FROM user_preferences WHERE user_id = p_user_id;
+    zone := coalesce(zone, 'UTC');
+    PERFORM NOW() AT TIME ZONE zone;
+    RETURN zone;
+EXCEPTION WHEN invalid_parameter_value THEN
+    RETURN 'UTC';
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION apply_task_rollup(t tasks, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO task_daily_rollups AS r (user_id, day, priority, completed_count, minutes_spent)
+    SELECT
+        t.user_id,
+        (t.completed_at AT TIME ZONE user_zone_name(t.user_id))::date,
+        t.priority,
+        p_sign,
+        p_sign * coalesce(
+            GREATEST(EXTRACT(EPOCH FROM t.actual_end - t.actual_start) / 60.0, 0), 0
+        )
+    WHERE t.status = 'completed' AND t.completed_at IS NOT NULL
+    ON CONFLICT (user_id, day, priority) DO UPDATE SET
+        completed_count = r.completed_count + EXCLUDED.completed_count,
+        minutes_spent = r.minutes_spent + EXCLUDED.minutes_spent;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_schedule_rollup(h scheduling_history, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO schedule_daily_rollups AS r (
+        user_id, day, scheduled_count, completed_count, started_count,
+        on_time_count, start_delay_minutes
+    )
+    SELECT
+        h.user_id,
+        (h.scheduled_start AT TIME ZONE user_zone_name(h.user_id))::date,
+        p_sign,
+        p_sign * coalesce(h.completed, FALSE)::int,
+        p_sign * (h.actual_start IS NOT NULL)::int,
+        p_sign * coalesce(h.actual_start <= h.scheduled_start + INTERVAL '10 minutes', FALSE)::int,
+        p_sign * coalesce(
+            GREATEST(EXTRACT(EPOCH FROM h.actual_start - h.scheduled_start) / 60.0, 0), 0
+        )
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        scheduled_count = r.scheduled_count + EXCLUDED.scheduled_count,
+        completed_count = r.completed_count + EXCLUDED.completed_count,
+        started_count = r.started_count + EXCLUDED.started_count,
+        on_time_count = r.on_time_count + EXCLUDED.on_time_count,
+        start_delay_minutes = r.start_delay_minutes + EXCLUDED.start_delay_minutes;
+$$;
+
+-- Recount a user's rollups from their tasks and history, in their zone
+CREATE OR REPLACE FUNCTION rebuild_user_rollups(p_user_id UUID)
+RETURNS VOID AS $$
+DECLARE
+    zone TEXT := user_zone_name(p_user_id);
+BEGIN
+    DELETE FROM task_daily_rollups WHERE user_id = p_user_id;
+    DELETE FROM schedule_daily_rollups WHERE user_id = p_user_id;
+
+    INSERT INTO task_daily_rollups (user_id, day, priority, completed_count, minutes_spent)
+    SELECT
+        user_id,
+        (completed_at AT TIME ZONE zone)::date,
+        priority,
+        count(*),
+        sum(coalesce(GREATEST(EXTRACT(EPOCH FROM actual_end - actual_start) / 60.0, 0), 0))
+    FROM tasks
+    WHERE user_id = p_user_id AND status = 'completed' AND completed_at IS NOT NULL
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO schedule_daily_rollups (
+        user_id, day, scheduled_count, completed_count, started_count,
+        on_time_count, start_delay_minutes
+    )
+    SELECT
+        user_id,
+        (scheduled_start AT TIME ZONE zone)::date,
+        count(*),
+        count(*) FILTER (WHERE completed),
+        count(actual_start),
+        count(*) FILTER (WHERE actual_start <= scheduled_start + INTERVAL '10 minutes'),
+        sum(coalesce(GREATEST(EXTRACT(EPOCH FROM actual_start - scheduled_start) / 60.0, 0), 0))
+    FROM scheduling_history
+    WHERE user_id = p_user_id
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+-- SECURITY DEFINER: users may only read their rollups
+CREATE OR REPLACE FUNCTION rebuild_rollups_for_timezone()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rebuild_user_rollups(NEW.user_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER rebuild_user_preferences_rollups_insert AFTER INSERT ON user_preferences
+    FOR EACH ROW
+    WHEN (NEW.timezone <> 'UTC')
+    EXECUTE FUNCTION rebuild_rollups_for_timezone();
+CREATE TRIGGER rebuild_user_preferences_rollups_update
+    AFTER UPDATE OF timezone ON user_preferences
+    FOR EACH ROW
+    WHEN (OLD.timezone IS DISTINCT FROM NEW.timezone)
+    EXECUTE FUNCTION rebuild_rollups_for_timezone();
+
+REVOKE EXECUTE ON FUNCTION rebuild_user_rollups(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION rebuild_rollups_for_timezone()
+    FROM PUBLIC, anon, authenticated;
+
+-- Rollups counted so far are by UTC day, which only UTC users keep
+SELECT rebuild_user_rollups(user_id) FROM user_preferences WHERE timezone <> 'UTC';